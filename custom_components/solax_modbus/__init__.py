@@ -1,13 +1,15 @@
 """The SolaX Modbus Integration."""
 
 import asyncio
+from contextlib import contextmanager, nullcontext
 from datetime import timedelta
 
 # import importlib.util, sys
 import importlib
 import json
 import logging
-from time import time
+import os
+from time import perf_counter, time
 from types import ModuleType, SimpleNamespace
 from typing import Any, Optional
 from weakref import ref as WeakRef
@@ -19,14 +21,18 @@ from homeassistant.const import (
     CONF_HOST,
     CONF_NAME,
     CONF_PORT,
+    CONF_SCAN_INTERVAL,
     EVENT_HOMEASSISTANT_STARTED,
     Platform,
 )
 from homeassistant.core import HomeAssistant, callback
 import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
 from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.device_registry import DeviceInfo
+import homeassistant.util.dt as dt_util
 try:
     from homeassistant.components.modbus import ModbusHub as CoreModbusHub, get_hub as get_core_hub
 except ImportError:
@@ -35,7 +41,11 @@ except ImportError:
         """ place holder dummy """
 
 
-from .sensor import SolaXModbusSensor
+from .cycletrace import CycleTrace, write_trace
+from .datastore import MISSING, DataStore
+from .perfstats import HubStats
+from .prioritylock import PriorityLock
+from .sensor import SolaXModbusSensor, planBurst, replanGroups
 
 _LOGGER = logging.getLogger(__name__)
 # try: # pymodbus 3.0.x
@@ -60,24 +70,73 @@ from pymodbus.payload import BinaryPayloadBuilder, BinaryPayloadDecoder, Endian
 from pymodbus.transaction import ModbusAsciiFramer, ModbusRtuFramer
 
 from .const import (
+    AUTOREPEAT_MARGIN,
+    AUTOREPEAT_MIN_PERIOD,
+    ATTR_CYCLES,
+    ATTR_DURATION,
+    ATTR_END,
+    ATTR_ENTITIES,
+    ATTR_FILENAME,
+    ATTR_FORMAT,
+    ATTR_HUB,
+    ATTR_INTERVAL,
+    ATTR_KEYS,
+    ATTR_START,
+    ATTR_STEP,
     INVERTER_IDENT,
+    CONF_ARCHIVE,
     CONF_BAUDRATE,
+    CONF_WORKER,
+    CONF_SERIAL_THREAD,
+    CONF_TCP_SESSIONS,
     CONF_INTERFACE,
     CONF_MODBUS_ADDR,
     CONF_PLUGIN,
+    CONF_POWER_CONTROL,
+    CONF_POWER_CONTROL_KI,
+    CONF_POWER_CONTROL_KP,
+    CONF_POWER_CONTROL_RATE,
+    CONF_POWER_CONTROL_TARGET,
+    CONF_PROXY_MAX_AGE,
+    CONF_PROXY_PORT,
+    CONF_PROXY_RANGES,
+    CONF_PROXY_HOST,
+    CONF_PROXY_WRITES,
+    CONF_PUBLISH_INTERVAL_FAST,
+    CONF_PUBLISH_INTERVAL_MEDIUM,
+    CONF_SURPLUS_HYSTERESIS,
+    CONF_SURPLUS_MIN_OFF,
+    CONF_SURPLUS_MIN_ON,
+    CONF_SURPLUS_SOURCE,
     CONF_READ_DCB,
     CONF_READ_EPS,
     CONF_SERIAL_PORT,
     CONF_TCP_TYPE,
     CONF_INVERTER_NAME_SUFFIX,
     CONF_CORE_HUB,
+    CONF_SCAN_INTERVAL_MEDIUM,
+    CONF_SCAN_INTERVAL_FAST,
+    CONF_SCAN_INTERVAL_BATTERY,
+    CONF_BATTERY_PACKS_PER_CYCLE,
+    DEFAULT_SCAN_INTERVAL_BATTERY,
+    DEFAULT_BATTERY_PACKS_PER_CYCLE,
     DEFAULT_INVERTER_NAME_SUFFIX,
     DEFAULT_BAUDRATE,
     DEFAULT_INTERFACE,
     DEFAULT_MODBUS_ADDR,
     DEFAULT_NAME,
     DEFAULT_PLUGIN,
+    DEFAULT_ARCHIVE,
+    DEFAULT_WORKER,
+    DEFAULT_SERIAL_THREAD,
+    DEFAULT_TCP_SESSIONS,
     DEFAULT_PORT,
+    DEFAULT_POWER_CONTROL,
+    DEFAULT_PROXY_MAX_AGE,
+    DEFAULT_PROXY_PORT,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_WRITES,
+    DEFAULT_PUBLISH_INTERVAL,
     DEFAULT_READ_DCB,
     DEFAULT_READ_EPS,
     DEFAULT_SCAN_INTERVAL,
@@ -94,6 +153,13 @@ from .const import (
     REGISTER_ULSB16MSB16,
     REGISTER_WORDS,
     SCAN_GROUP_DEFAULT,
+    SCAN_GROUP_FAST,
+    SCAN_GROUP_MEDIUM,
+    SERVICE_BURST,
+    SERVICE_DUMP_TRACE,
+    SERVICE_EXPORT_ARCHIVE,
+    SERVICE_START_RECORDING,
+    SERVICE_STOP_RECORDING,
     # PLUGIN_PATH,
     SLEEPMODE_LASTAWAKE,
 )
@@ -103,15 +169,177 @@ PLATFORMS = [Platform.BUTTON, Platform.NUMBER, Platform.SELECT, Platform.SENSOR]
 # seriesnumber = 'unknown'
 
 
+# options that can be applied to a running hub; any other option change requires a reload of the config entry
+HOT_OPTIONS = (
+    CONF_SCAN_INTERVAL,
+    CONF_SCAN_INTERVAL_MEDIUM,
+    CONF_SCAN_INTERVAL_FAST,
+    CONF_INVERTER_NAME_SUFFIX,
+    CONF_SCAN_INTERVAL_BATTERY,
+    CONF_BATTERY_PACKS_PER_CYCLE,
+    CONF_PUBLISH_INTERVAL_MEDIUM,
+    CONF_PUBLISH_INTERVAL_FAST,
+    CONF_POWER_CONTROL,  # starts or stops the power controller, see SolaXModbusHub.set_power_control
+    CONF_POWER_CONTROL_TARGET,  # the power controller reads these on every step
+    CONF_POWER_CONTROL_KP,
+    CONF_POWER_CONTROL_KI,
+    CONF_POWER_CONTROL_RATE,
+    CONF_SURPLUS_HYSTERESIS,  # and the surplus controller these
+    CONF_SURPLUS_MIN_ON,
+    CONF_SURPLUS_MIN_OFF,
+)
+
+
 async def config_entry_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Update listener, called when the config entry options are changed."""
-    await hass.config_entries.async_reload(entry.entry_id)
+    hub = hass.data[DOMAIN].get(entry.options.get(CONF_NAME), {}).get("hub")
+    if hub is None or hub.device_info is None:  # hub not (fully) running yet
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    changed = {
+        key
+        for key in set(hub.config) | set(entry.options)
+        if hub.config.get(key) != entry.options.get(key)
+    }
+    if not changed:
+        return
+    if changed.difference(HOT_OPTIONS):
+        _LOGGER.info(f"{hub.name}: options {changed} changed, reloading")
+        await hass.config_entries.async_reload(entry.entry_id)
+    else:
+        _LOGGER.info(f"{hub.name}: applying changed options {changed} without reload")
+        hub.apply_options(entry.options, changed)
+
+
+SERVICE_HUB_SCHEMA = vol.Schema({vol.Required(ATTR_HUB): cv.string})
+
+DUMP_TRACE_SCHEMA = SERVICE_HUB_SCHEMA.extend(
+    {vol.Optional(ATTR_CYCLES): vol.All(vol.Coerce(int), vol.Range(min=1))}
+)
+
+START_RECORDING_SCHEMA = SERVICE_HUB_SCHEMA.extend(
+    {vol.Optional(ATTR_FILENAME): cv.string}
+)
+
+BURST_SCHEMA = SERVICE_HUB_SCHEMA.extend(
+    {
+        vol.Required(ATTR_ENTITIES): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_INTERVAL, default=1.0): vol.All(
+            vol.Coerce(float), vol.Range(min=0.2, max=10)
+        ),
+        vol.Optional(ATTR_DURATION, default=60): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=3600)
+        ),
+    }
+)
+
+EXPORT_ARCHIVE_SCHEMA = SERVICE_HUB_SCHEMA.extend(
+    {
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Required(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_KEYS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_STEP, default=0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(ATTR_FORMAT, default="csv"): vol.In(("csv", "json")),
+        vol.Optional(ATTR_FILENAME): cv.string,
+    }
+)
+
+
+def _service_hub(hass, call):
+    hub_name = call.data[ATTR_HUB]
+    entry = hass.data[DOMAIN].get(hub_name)
+    if entry is None:
+        raise HomeAssistantError(f"unknown {DOMAIN} hub: {hub_name}")
+    return entry["hub"]
+
+
+def _service_path(hass, filename):
+    """Path of a file written by a service: in the config directory or a directory of allowlist_external_dirs."""
+    path = os.path.realpath(hass.config.path(filename))
+    config_dir = os.path.realpath(hass.config.config_dir)
+    if os.path.commonpath((path, config_dir)) != config_dir and not hass.config.is_allowed_path(path):
+        raise HomeAssistantError(f"{filename} is outside the configuration directory and not in allowlist_external_dirs")
+    return path
+
+
+def _service_timestamp(value):
+    """Timestamp of a datetime from a service call; the datetime selector gives naive local times."""
+    return dt_util.as_local(value).timestamp()
 
 
 async def async_setup(hass, config):
     """Set up the SolaX modbus component."""
     hass.data[DOMAIN] = {}
     _LOGGER.debug("solax data %d", hass.data)
+
+    async def async_dump_trace(call):
+        hub = _service_hub(hass, call)
+        trace = hub.trace.chrome_trace(hub.name, call.data.get(ATTR_CYCLES))
+        stamp = dt_util.now().strftime("%Y%m%d_%H%M%S")
+        path = hass.config.path(f"{DOMAIN}_trace_{hub.name}_{stamp}.json")
+        await hass.async_add_executor_job(write_trace, path, trace)
+        _LOGGER.info(f"{hub.name}: wrote trace of the last polling cycles to {path}")
+
+    async def async_start_recording(call):
+        hub = _service_hub(hass, call)
+        filename = call.data.get(ATTR_FILENAME)
+        if not filename:
+            stamp = dt_util.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{DOMAIN}_{hub.name}_{stamp}.modbus"
+        path = _service_path(hass, filename)
+        await hub.async_start_recording(path)
+        _LOGGER.info(f"{hub.name}: recording modbus traffic to {path}")
+
+    async def async_stop_recording(call):
+        hub = _service_hub(hass, call)
+        recorder = await hub.async_stop_recording()
+        _LOGGER.info(
+            f"{hub.name}: recorded {recorder.records} modbus requests to {recorder.path}"
+        )
+
+    async def async_burst(call):
+        hub = _service_hub(hass, call)
+        hub.start_burst(
+            call.data[ATTR_ENTITIES], call.data[ATTR_INTERVAL], call.data[ATTR_DURATION]
+        )
+
+    async def async_export_archive(call):
+        hub = _service_hub(hass, call)
+        if hub.archive is None:
+            raise HomeAssistantError(f"{hub.name}: the archive is not enabled")
+        start = _service_timestamp(call.data[ATTR_START])
+        end = _service_timestamp(call.data[ATTR_END])
+        fmt = call.data[ATTR_FORMAT]
+        filename = call.data.get(ATTR_FILENAME)
+        if not filename:
+            stamp = dt_util.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{DOMAIN}_{hub.name}_{stamp}.{fmt}"
+        path = _service_path(hass, filename)
+        export = hub.archive.export_json if fmt == "json" else hub.archive.export_csv
+        rows = await hass.async_add_executor_job(
+            export, path, start, end, call.data.get(ATTR_KEYS), call.data[ATTR_STEP]
+        )
+        _LOGGER.info(f"{hub.name}: exported {rows} archive {'values' if fmt == 'json' else 'rows'} to {path}")
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_DUMP_TRACE, async_dump_trace, schema=DUMP_TRACE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_EXPORT_ARCHIVE, async_export_archive, schema=EXPORT_ARCHIVE_SCHEMA
+    )
+    hass.services.async_register(DOMAIN, SERVICE_BURST, async_burst, schema=BURST_SCHEMA)
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_START_RECORDING,
+        async_start_recording,
+        schema=START_RECORDING_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_STOP_RECORDING,
+        async_stop_recording,
+        schema=SERVICE_HUB_SCHEMA,
+    )
     return True
 
 
@@ -138,6 +366,22 @@ def _load_plugin(plugin_name: str) -> ModuleType:
     return plugin
 
 
+def _load_optional_modules(config):
+    """Import the optional subsystems enabled in the options; the disabled ones are never imported."""
+    enabled = {
+        "worker": config.get(CONF_WORKER, DEFAULT_WORKER),
+        "serialthread": config.get(CONF_SERIAL_THREAD, DEFAULT_SERIAL_THREAD),
+        "tcppool": config.get(CONF_TCP_SESSIONS, DEFAULT_TCP_SESSIONS) > 1,
+        "powercontrol": config.get(CONF_POWER_CONTROL, DEFAULT_POWER_CONTROL),
+        "archive": config.get(CONF_ARCHIVE, DEFAULT_ARCHIVE),
+        "surpluscontrol": bool(config.get(CONF_SURPLUS_SOURCE)),
+        "modbusproxy": bool(config.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT)),
+    }
+    for module, enable in enabled.items():
+        if enable:
+            importlib.import_module(f".{module}", __name__)
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up a SolaX mobus."""
     _LOGGER.debug(f"setup entries - data: {entry.data}, options: {entry.options}")
@@ -162,6 +406,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     # ================== dynamically load desired plugin =======================================================
 
     plugin = await hass.async_add_executor_job(_load_plugin, plugin_name)
+    await hass.async_add_executor_job(_load_optional_modules, config)  # below, their imports find them loaded
 
     # ====================== end of dynamic load ==============================================================
 
@@ -177,6 +422,16 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             plugin,
             entry,
         )
+    if config.get(CONF_WORKER, DEFAULT_WORKER):
+        if isinstance(hub, SolaXCoreModbusHub):
+            _LOGGER.warning(f"{hub.name}: a polling worker is not supported via a core modbus hub")
+        else:
+            from .worker import PollingWorker
+
+            hub.worker = PollingWorker(hub, plugin_name)
+            hub._client = hub.worker.client
+            entry.async_on_unload(hub.worker.async_stop)
+
     """Register the hub."""
     hass.data[DOMAIN][hub._name] = {
         "hub": hub,
@@ -189,6 +444,56 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     else:
         hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, hub.async_init)
 
+    hub.set_power_control(config.get(CONF_POWER_CONTROL, DEFAULT_POWER_CONTROL))
+
+    if config.get(CONF_ARCHIVE, DEFAULT_ARCHIVE):
+        from .archive import SampleArchive
+
+        hub.archive = SampleArchive(hass, hass.config.path(f"{DOMAIN}_archive", hub.name))
+        hub.dataListeners.append(hub.archive.async_data_updated)
+        entry.async_on_unload(hub.archive.async_close)
+
+    surplus_source = config.get(CONF_SURPLUS_SOURCE)
+    if surplus_source:
+        if plugin.plugin_instance.SURPLUS_CONTROL is None:
+            _LOGGER.warning(f"{hub.name}: surplus charging is not supported by this plugin")
+        else:
+            from .surpluscontrol import SurplusController
+
+            hub.surplusController = SurplusController(
+                hub, plugin.plugin_instance.SURPLUS_CONTROL, surplus_source
+            )
+            hub.surplusController.attach()  # or later: the source hub may be set up after this one
+            hub.dataListeners.append(hub.surplusController.async_charger_updated)
+            entry.async_on_unload(hub.surplusController.detach)
+
+    if hub.pool is not None:
+        from .tcppool import HEALTH_CHECK_INTERVAL
+
+        entry.async_on_unload(
+            async_track_time_interval(
+                hass, hub.pool.async_check_health, timedelta(seconds=HEALTH_CHECK_INTERVAL)
+            )
+        )
+
+    proxy_port = config.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT)
+    if proxy_port:
+        from .modbusproxy import RegisterSnapshot, async_run_proxy, parse_ranges
+
+        hub.registerSnapshot = RegisterSnapshot()
+        entry.async_create_background_task(
+            hass,
+            async_run_proxy(
+                hub,
+                config.get(CONF_PROXY_HOST, DEFAULT_PROXY_HOST),
+                proxy_port,
+                config.get(CONF_PROXY_MAX_AGE, DEFAULT_PROXY_MAX_AGE),
+                parse_ranges(config.get(CONF_PROXY_RANGES), hub.name),
+                config.get(CONF_PROXY_WRITES, DEFAULT_PROXY_WRITES),
+            ),
+            f"{hub.name} modbus proxy",
+        )
+
     entry.async_on_unload(entry.add_update_listener(config_entry_update_listener))
     return True
 
@@ -249,7 +554,13 @@ class SolaXModbusHub:
             f"solax modbushub creation with interface {interface} baudrate (only for serial): {baudrate}"
         )
         self._hass = hass
-        if interface == "serial":
+        self.stats = HubStats()  # performance statistics, see perfstats.py
+        self.serialThread = interface == "serial" and config.get(CONF_SERIAL_THREAD, DEFAULT_SERIAL_THREAD)
+        if self.serialThread:
+            from .serialthread import SerialThreadClient
+
+            self._client = SerialThreadClient(serial_port, baudrate, self.stats)
+        elif interface == "serial":
             self._client = AsyncModbusSerialClient(
                 port=serial_port,
                 baudrate=baudrate,
@@ -270,7 +581,14 @@ class SolaXModbusHub:
                 )
             else:
                 self._client = AsyncModbusTcpClient(host=host, port=port, timeout=5, retries=6)
-        self._lock = asyncio.Lock()
+        self.pool = None  # parallel read sessions, see tcppool.py
+        sessions = config.get(CONF_TCP_SESSIONS, DEFAULT_TCP_SESSIONS)
+        if interface == "tcp" and sessions > 1:
+            from .tcppool import ConnectionPool, make_tcp_client
+
+            framer = {"rtu": ModbusRtuFramer, "ascii": ModbusAsciiFramer}.get(tcp_type)
+            self.pool = ConnectionPool(self, sessions, make_tcp_client(host, port, framer))
+        self._lock = PriorityLock()  # priority lane for the autorepeat writes
         self._name = name
         self.inverterNameSuffix = config.get(CONF_INVERTER_NAME_SUFFIX)
         self._modbus_addr = modbus_addr
@@ -280,7 +598,7 @@ class SolaXModbusHub:
         self._baudrate = int(baudrate)
         self.groups = {}  # group info, below
         self.empty_interval_group = lambda: SimpleNamespace(
-            interval=0, unsub_interval_method=None, device_groups={}
+            interval=0, unsub_interval_method=None, device_groups={}, lastWake=None, lateMs=None
         )
         self.empty_device_group = lambda: SimpleNamespace(
             sensors=[],
@@ -288,25 +606,57 @@ class SolaXModbusHub:
             holdingBlocks={},
             readPreparation=None,  # function to call before read group
             readFollowUp=None,  # function to call after read group
+            roundRobin=False,  # battery pack group, only read when due by the pack scheduler
+            ageKey=None,  # key of the data age sensor of a round robin group
+            lastRead=0,  # timestamp of the last read attempt
+            lastUpdate=0,  # timestamp of the last successful read
+            readLock=None,  # lock held during the whole prepare/read/follow up sequence
         )
-        self.data = {
-            "_repeatUntil": {}
-        }  # _repeatuntil contains button autorepeat expiry times
+        self.data = DataStore(
+            {"_repeatUntil": {}}
+        )  # slots with change stamps, see datastore.py; _repeatuntil contains button autorepeat expiry times
         self.tmpdata = {}  # for WRITE_DATA_LOCAL entities with corresponding prevent_update number/sensor
         self.tmpdata_expiry = {}  # expiry timestamps for tempdata
         self.cyclecount = 0  # temporary - remove later
         self.slowdown = 1  # slow down factor when modbus is not responding: 1 : no slowdown, 10: ignore 9 out of 10 cycles
         self.computedSensors = {}
+        self.registerDescriptors = {}  # key -> RegisterDescriptor of the block plans, see sensor.py
         self.computedButtons = {}
         self.sensorEntities = {}  # all sensor entities, indexed by key
         self.numberEntities = {}  # all number entities, indexed by key
+        self.selectEntities = {}  # all select entities, indexed by key
+        self.buttonEntities = {}  # all button entities, indexed by key
         # self.preventSensors = {} # sensors with prevent_update = True
         self.writeLocals = {}  # key to description lookup dict for write_method = WRITE_DATA_LOCAL entities
         self.sleepzero = []  # sensors that will be set to zero in sleepmode
         self.sleepnone = []  # sensors that will be cleared in sleepmode
         self.writequeue = {}  # queue requests when inverter is in sleep mode
+        self.batteryDiscovery = {"state": "not started"}  # progress of the background battery pack discovery
+        self.deviceInfoPublished = {}  # device identifier -> versions last written to the device registry
+        self.statsSensors = []  # optional statistics sensors, updated after every cycle
+        self.trace = CycleTrace()  # timeline of the last polling cycles, see cycletrace.py
+        self.registerSnapshot = None  # raw registers of the last reads, only kept for the modbus proxy
+        self.fc23Supported = None  # read/write multiple registers; None: not known yet
+        self.proxyContext = None  # server context of the running modbus proxy
+        self.pollsRunning = 0  # polling cycles in progress
+        self.pollsIdle = asyncio.Event()  # set when no polling cycle runs; reads for other masters wait for it
+        self.pollsIdle.set()
+        self.burstTask = None  # running burst of fast polling, see start_burst
+        self.autorepeatTasks = {}  # button key -> task repeating its write, see start_autorepeat
+        self.dataListeners = []  # async listener(hub, group, data) called after every successful group read
+        self.powerController = None  # closed loop grid power control, see powercontrol.py
+        self.surplusController = None  # EV charger following the surplus of another hub, see surpluscontrol.py
+        self.archive = None  # archive of all decoded values, see archive.py
+        self.worker = None  # polling worker process, see worker.py
+        self.recorder = None  # RecordingClient while recording, see modbusrecorder.py
         _LOGGER.debug(f"{self.name}: ready to call plugin to determine inverter type")
         self.plugin = plugin.plugin_instance  # getPlugin(name).plugin_instance
+        # battery selection state of this hub
+        self.battery_config = (
+            self.plugin.BATTERY_CONFIG.for_hub()
+            if self.plugin.BATTERY_CONFIG is not None
+            else None
+        )
         self.wakeupButton = None
         self._invertertype = None
         self.localsUpdated = False
@@ -392,15 +742,26 @@ class SolaXModbusHub:
     def entity_group(self, sensor):
         # scan group
         g = getattr(sensor.entity_description, "scan_group", None)
+        return self.scan_group_interval(g)
+
+    def publish_interval(self, scan_group):
+        """Seconds between state writes of the sensors of a scan group; 0: after every poll."""
+        if scan_group == SCAN_GROUP_FAST:
+            return self.config.get(CONF_PUBLISH_INTERVAL_FAST, DEFAULT_PUBLISH_INTERVAL)
+        if scan_group == SCAN_GROUP_MEDIUM:
+            return self.config.get(CONF_PUBLISH_INTERVAL_MEDIUM, DEFAULT_PUBLISH_INTERVAL)
+        return DEFAULT_PUBLISH_INTERVAL
+
+    def scan_group_interval(self, g):
         if not g:
             g = SCAN_GROUP_DEFAULT
         # scan interval
-        g = self.config.get(g, None)
+        i = self.config.get(g, None)
         # when declared but not present in config, use default; this MUST exist
-        if not g:
-            g = self.config[SCAN_GROUP_DEFAULT]
+        if not i:
+            i = self.config[SCAN_GROUP_DEFAULT]
 
-        return g
+        return i
 
     def device_group_key(self, device_info: DeviceInfo):
         key = ""
@@ -414,13 +775,20 @@ class SolaXModbusHub:
     @callback
     async def async_add_solax_modbus_sensor(self, sensor: SolaXModbusSensor):
         """Listen for data updates."""
-        # This is the first sensor, set up interval.
+        self._add_to_group(sensor)
+
+    def _add_to_group(self, sensor):
         interval = self.entity_group(sensor)
         interval_group = self.groups.setdefault(interval, self.empty_interval_group())
-        if not interval_group.device_groups:
+        if interval_group.unsub_interval_method is None:
+            # This is the first sensor, set up interval.
             interval_group.interval = interval
 
             async def _refresh(_now: Optional[int] = None) -> None:
+                wake = perf_counter()
+                if interval_group.lastWake is not None:  # the timer is due interval seconds after the previous wake
+                    interval_group.lateMs = round((wake - interval_group.lastWake - interval_group.interval) * 1000, 1)
+                interval_group.lastWake = wake
                 await self._check_connection()
                 await self.async_refresh_modbus_data(interval_group, _now)
 
@@ -462,6 +830,97 @@ class SolaXModbusHub:
                 if not self.groups:
                     await self.async_close()
 
+    def apply_options(self, config, changed):
+        """Apply changed hot options to the running hub, without reloading the config entry."""
+        self.config = config
+        if CONF_INVERTER_NAME_SUFFIX in changed:
+            self._apply_inverter_name_suffix(config.get(CONF_INVERTER_NAME_SUFFIX))
+        if changed.intersection(
+            (CONF_SCAN_INTERVAL, CONF_SCAN_INTERVAL_MEDIUM, CONF_SCAN_INTERVAL_FAST)
+        ):
+            self._retime_groups()
+        if changed.intersection((CONF_PUBLISH_INTERVAL_MEDIUM, CONF_PUBLISH_INTERVAL_FAST)):
+            for sensor in self.sensorEntities.values():
+                sensor.setup_publication()
+        if CONF_POWER_CONTROL in changed:
+            self.set_power_control(config.get(CONF_POWER_CONTROL, DEFAULT_POWER_CONTROL))
+
+    def set_power_control(self, enable):
+        """Start or stop the closed loop power control, see powercontrol.py; stopped, nothing is written anymore."""
+        if not enable:
+            if self.powerController is not None:
+                self.dataListeners.remove(self.powerController.async_data_updated)
+                self.powerController = None
+                _LOGGER.info(f"{self.name}: power control stopped")
+            return
+        if self.powerController is not None:
+            return
+        if self.plugin.POWER_CONTROL is None:
+            _LOGGER.warning(f"{self.name}: power control is not supported by this plugin")
+            return
+        from .powercontrol import PowerController
+
+        self.powerController = PowerController(self, self.plugin.POWER_CONTROL)
+        self.dataListeners.append(self.powerController.async_data_updated)
+
+    def _retime_groups(self):
+        """Regroup the entities and re-plan the blocks after a scan interval change."""
+        entities = []
+        previous = {}  # device group key -> former device group
+        for interval_group in self.groups.values():
+            if interval_group.unsub_interval_method is not None:
+                interval_group.unsub_interval_method()
+            for device_key, grp in interval_group.device_groups.items():
+                entities.extend(grp.sensors)
+                previous[device_key] = grp
+        self.groups = {}
+        replanGroups(self, self._name, previous)
+        if self.worker is not None:
+            self.worker.planned = False  # the worker plans again with the new intervals
+        for entity in entities:
+            self._add_to_group(entity)
+        for interval_group in self.groups.values():
+            for device_key, grp in interval_group.device_groups.items():
+                if device_key in previous:
+                    grp.lastRead = previous[device_key].lastRead
+                    grp.lastUpdate = previous[device_key].lastUpdate
+        _LOGGER.info(f"{self.name}: scan groups retimed to {list(self.groups.keys())}")
+
+    def _apply_inverter_name_suffix(self, suffix):
+        """Rename the inverter device and its entities after a name suffix change."""
+        oldprefix = f"{self.inverterNameSuffix} " if self.inverterNameSuffix else ""
+        newprefix = f"{suffix} " if suffix else ""
+        self.inverterNameSuffix = suffix
+
+        def rename(name):
+            if oldprefix and name.startswith(oldprefix):
+                name = name[len(oldprefix) :]
+            return newprefix + name
+
+        inverter_key = self.device_group_key(self.device_info)
+        for entity in self.sensorEntities.values():
+            if self.device_group_key(entity.device_info) == inverter_key:
+                entity.entity_description.name = rename(entity.entity_description.name)
+                if entity.hass is not None:
+                    entity.async_write_ha_state()
+        for entity in (
+            *self.numberEntities.values(),
+            *self.selectEntities.values(),
+            *self.buttonEntities.values(),
+        ):
+            entity._name = rename(entity._name)  # on the entity only: the plugin descriptions are shared by all hubs
+            if entity.hass is not None:
+                entity.async_write_ha_state()
+
+        plugin_name = self.plugin.plugin_name
+        if suffix:
+            plugin_name = plugin_name + " " + suffix
+        self.device_info["name"] = plugin_name
+        dev_registry = dr.async_get(self._hass)
+        device = dev_registry.async_get_device(identifiers={(DOMAIN, self._name, INVERTER_IDENT)})
+        if device is not None:
+            dev_registry.async_update_device(device.id, name=plugin_name)
+
     async def async_refresh_modbus_data(
         self, interval_group, _now: Optional[int] = None
     ) -> None:
@@ -473,22 +932,189 @@ class SolaXModbusHub:
         if (
             self.cyclecount % self.slowdown
         ) == 0:  # only execute once every slowdown count
-            for group in interval_group.device_groups.values():
-                update_result = await self.async_read_modbus_data(group)
-                if update_result:
-                    self.slowdown = 1  # return to full polling after succesfull cycle
-                    for sensor in group.sensors:
-                        sensor.modbus_data_updated()
-                else:
-                    _LOGGER.debug(f"assuming sleep mode - slowing down by factor 10")
-                    self.slowdown = 10
-                    for i in self.sleepnone:
-                        self.data.pop(i, None)
-                    for i in self.sleepzero:
-                        self.data[i] = 0
-                    # self.data = {} # invalidate data - do we want this ??
+            with self.trace.cycle(interval_group.interval, cycle=self.cyclecount), self._polling():
+                if _now is not None and interval_group.lateMs is not None:  # scheduler wake, with the delay after the planned time
+                    self.trace.instant("wake", "scheduler", late_ms=interval_group.lateMs)
+                cycle_start = perf_counter()
+                notified = 0
+                for group in self._scheduled_device_groups(interval_group):
+                    group.lastRead = time()
+                    update_result = await self.async_read_modbus_data(group)
+                    if update_result:
+                        self.slowdown = 1  # return to full polling after succesfull cycle
+                        with self.trace.span("publish", "publish", entities=len(group.sensors)):
+                            for sensor in group.sensors:
+                                if sensor.modbus_data_updated():
+                                    notified += 1
+                    else:
+                        _LOGGER.debug(f"assuming sleep mode - slowing down by factor 10")
+                        self.stats.failed_cycles += 1
+                        self.slowdown = 10
+                        for i in self.sleepnone:
+                            self.data.pop(i, None)
+                        for i in self.sleepzero:
+                            self.data[i] = 0
+                        # self.data = {} # invalidate data - do we want this ??
+
+                    _LOGGER.debug(f"device group read done")
+                self._update_pack_ages(interval_group)
+                self.stats.add_cycle(
+                    interval_group.interval, perf_counter() - cycle_start, notified
+                )
+                for sensor in self.statsSensors:
+                    if sensor.hass is not None:
+                        sensor.async_write_ha_state()
+
+    @contextmanager
+    def _polling(self):
+        self.pollsRunning += 1
+        self.pollsIdle.clear()
+        try:
+            yield
+        finally:
+            self.pollsRunning -= 1
+            if not self.pollsRunning:
+                self.pollsIdle.set()
+
+    async def async_read_registers_queued(self, typ, address, count):
+        """Read for another master (the modbus proxy): after the running polling cycles, not between their blocks."""
+        await self.pollsIdle.wait()
+        if typ == "input":
+            return await self.async_read_input_registers(unit=self._modbus_addr, address=address, count=count)
+        return await self.async_read_holding_registers(unit=self._modbus_addr, address=address, count=count)
+
+    def start_burst(self, entities, interval, duration):
+        """Poll only the blocks of some sensors every interval seconds, for duration seconds.
+
+        entities are sensor keys or entity ids. A new burst replaces a running one;
+        the regular polling cycles continue meanwhile.
+        """
+        sensors = []
+        by_entity_id = {
+            sensor.entity_id: sensor for sensor in self.sensorEntities.values()
+        }
+        for name in entities:
+            sensor = self.sensorEntities.get(name) or by_entity_id.get(name)
+            if sensor is None:
+                raise HomeAssistantError(f"{self.name}: unknown sensor {name}")
+            sensors.append(sensor)
+        groups = planBurst(self, sensors)
+        if self.burstTask is not None:
+            self.burstTask.cancel()
+        self.burstTask = self.entry.async_create_background_task(
+            self._hass,
+            self._async_burst(groups, interval, duration),
+            f"{self.name} burst polling",
+        )
 
-                _LOGGER.debug(f"device group read done")
+    async def _async_burst(self, groups, interval, duration):
+        blocks = sum(len(g.holdingBlocks) + len(g.inputBlocks) for g in groups)
+        _LOGGER.info(
+            f"{self.name}: burst polling of {blocks} blocks every {interval}s for {duration}s"
+        )
+        end = time() + duration
+        try:
+            while time() < end:
+                start = time()
+                with self.trace.cycle(interval, burst=True):
+                    for group in groups:
+                        if await self.async_read_modbus_data(group):
+                            with self.trace.span("publish", "publish", entities=len(group.sensors)):
+                                for sensor in group.sensors:
+                                    if sensor.hass is not None:
+                                        sensor.modbus_data_updated()
+                await asyncio.sleep(max(0, interval - (time() - start)))
+        finally:
+            if self.burstTask is asyncio.current_task():
+                self.burstTask = None
+        _LOGGER.info(f"{self.name}: burst polling done")
+
+    def autorepeat_period(self, descr):
+        """Seconds between the repeats of an autorepeat button write."""
+        period = descr.autorepeat_period
+        if period is None:  # as often as the fastest polling, as before
+            period = min((g.interval for g in self.groups.values() if g.interval), default=self.scan_group_interval(SCAN_GROUP_FAST))
+        timeout = self.data.get(descr.autorepeat_timeout) if descr.autorepeat_timeout else None
+        if timeout:
+            period = min(period, timeout - AUTOREPEAT_MARGIN)
+        return max(period, AUTOREPEAT_MIN_PERIOD)
+
+    def start_autorepeat(self, key):
+        """Repeat the write of button key on its own timer until its _repeatUntil time."""
+        task = self.autorepeatTasks.get(key)
+        if task is not None and not task.done():
+            return  # the running task picks up the new _repeatUntil time
+        if self.data["_repeatUntil"].get(key, 0) <= time():
+            return
+        self.autorepeatTasks[key] = self.entry.async_create_background_task(
+            self._hass, self._async_autorepeat(key), f"{self.name} autorepeat {key}"
+        )
+
+    async def _async_autorepeat(self, key):
+        descr = self.computedButtons[key]
+        last = time()  # the button press wrote the first time
+        due = last + self.autorepeat_period(descr)
+        try:
+            while True:
+                await asyncio.sleep(max(0, due - time()))
+                now = time()
+                if now >= self.data["_repeatUntil"].get(key, 0):
+                    break
+                period = self.autorepeat_period(descr)
+                payload = descr.value_function(0, descr, self.data)
+                if payload:
+                    _LOGGER.debug(f"ready to repeat button {key} data: {payload}")
+                    try:
+                        await self.async_write_registers_multi(
+                            unit=self._modbus_addr, address=descr.register, payload=payload, priority=True
+                        )
+                    except HomeAssistantError as ex:  # retry at the next period, the deadline may still be met
+                        _LOGGER.warning(f"{self.name}: autorepeat of {key} failed: {ex}")
+                    else:
+                        written = time()
+                        self.stats.autorepeat_writes += 1
+                        self.stats.autorepeat_jitter.add(abs(written - last - period))
+                        timeout = self.data.get(descr.autorepeat_timeout) if descr.autorepeat_timeout else None
+                        if timeout and written - last > timeout:
+                            self.stats.autorepeat_misses += 1
+                            _LOGGER.warning(f"{self.name}: autorepeat of {key} came {written - last:.1f}s after the previous write, remote control may have lapsed")
+                        last = written
+                # fixed cadence; after a stall, continue from now instead of catching up
+                due = max(due + period, time())
+        finally:
+            if self.autorepeatTasks.get(key) is asyncio.current_task():
+                del self.autorepeatTasks[key]
+
+    def _scheduled_device_groups(self, interval_group):
+        """Return the device groups to read in this cycle.
+
+        Regular device groups are read in every cycle. Of the round robin (battery pack) groups,
+        at most battery_packs_per_cycle groups are read, least recently read first, and only
+        when their last read is at least scan_interval_battery seconds ago.
+        """
+        # device groups can be added while we read, e.g. by the battery pack discovery
+        groups = list(interval_group.device_groups.values())
+        scheduled = [group for group in groups if not group.roundRobin]
+        packs = [group for group in groups if group.roundRobin]
+        if packs:
+            now = time()
+            interval = self.config.get(CONF_SCAN_INTERVAL_BATTERY, DEFAULT_SCAN_INTERVAL_BATTERY)
+            per_cycle = self.config.get(CONF_BATTERY_PACKS_PER_CYCLE, DEFAULT_BATTERY_PACKS_PER_CYCLE)
+            due = [group for group in packs if now - group.lastRead >= interval]
+            due.sort(key=lambda group: group.lastRead)
+            scheduled.extend(due[: max(per_cycle, 1)])
+        return scheduled
+
+    def _update_pack_ages(self, interval_group):
+        """Publish the age of the data of every round robin group."""
+        now = time()
+        for group in list(interval_group.device_groups.values()):
+            if group.ageKey is None or not group.lastUpdate:
+                continue
+            self.data[group.ageKey] = round(now - group.lastUpdate)
+            sensor = self.sensorEntities.get(group.ageKey)
+            if sensor is not None and sensor.hass is not None:
+                sensor.modbus_data_updated()
 
     @property
     def invertertype(self):
@@ -513,8 +1139,10 @@ class SolaXModbusHub:
 
     async def async_close(self):
         """Disconnect client."""
-        if self._client.connected:
-            self._client.close()
+        if self._client.connected or self.serialThread:
+            self._client.close()  # the serial thread client also releases its port thread
+        if self.pool is not None:
+            self.pool.close()
 
     # async def async_connect(self):
     #    """Connect client."""
@@ -523,6 +1151,26 @@ class SolaXModbusHub:
     #        async with self._lock:
     #            await self._client.connect()
 
+    async def async_start_recording(self, path):
+        """Record all modbus requests of this hub to path, until async_stop_recording."""
+        from .modbusrecorder import RecordingClient
+
+        async with self._lock:
+            if self.recorder is not None:
+                raise HomeAssistantError(
+                    f"{self.name}: already recording to {self.recorder.path}"
+                )
+            self._client = self.recorder = RecordingClient(self._hass, self._client, path)
+
+    async def async_stop_recording(self):
+        async with self._lock:
+            recorder = self.recorder
+            if recorder is None:
+                raise HomeAssistantError(f"{self.name}: not recording")
+            self._client = await recorder.async_close()
+            self.recorder = None
+        return recorder
+
     async def _check_connection(self):
         if not self._client.connected:
             _LOGGER.info("Inverter is not connected, trying to connect")
@@ -554,10 +1202,19 @@ class SolaXModbusHub:
             )
         return result
 
+    def pooled(self):
+        """Reads go through the session pool; not while recording, the recorder sees the hub's own client only."""
+        return self.pool is not None and self.pool.active and self.recorder is None
+
     async def async_read_holding_registers(self, unit, address, count):
         """Read holding registers."""
         kwargs = {"slave": unit} if unit else {}
+        if self.pooled():
+            return await self.pool.read("read_holding_registers", address, count, **kwargs)
+        wait_start = perf_counter()
         async with self._lock:
+            self.stats.lock_wait.add(perf_counter() - wait_start)
+            self.trace.record("lock wait", "lock", wait_start)
             await self._check_connection()
             resp = await self._client.read_holding_registers(address, count, **kwargs)
         return resp
@@ -565,7 +1222,12 @@ class SolaXModbusHub:
     async def async_read_input_registers(self, unit, address, count):
         """Read input registers."""
         kwargs = {"slave": unit} if unit else {}
+        if self.pooled():
+            return await self.pool.read("read_input_registers", address, count, **kwargs)
+        wait_start = perf_counter()
         async with self._lock:
+            self.stats.lock_wait.add(perf_counter() - wait_start)
+            self.trace.record("lock wait", "lock", wait_start)
             await self._check_connection()
             resp = await self._client.read_input_registers(address, count, **kwargs)
         return resp
@@ -582,8 +1244,65 @@ class SolaXModbusHub:
         async with self._lock:
             await self._check_connection()
             resp = await self._client.write_register(address, payload[0], **kwargs)
+        self._invalidate_snapshot(address, 1)
+        return resp
+
+    async def async_write_raw_registers(self, unit, address, registers):
+        """Write register values as they go over the wire, e.g. for the modbus proxy."""
+        kwargs = {"slave": unit} if unit else {}
+        async with self._lock:
+            await self._check_connection()
+            if len(registers) == 1:
+                resp = await self._client.write_register(address, registers[0], **kwargs)
+            else:
+                resp = await self._client.write_registers(address, registers, **kwargs)
+        self._invalidate_snapshot(address, len(registers))
         return resp
 
+    async def async_write_read_registers(self, unit, write_address, payload, read_address, read_count):
+        """Write one 16bit register, then read holding registers: one round trip with FC23.
+
+        When the first FC23 request fails in any way (an exception response, no response at all: some
+        loggers drop unknown function codes), the write and read are sent separately, from then on
+        without trying FC23 again.
+        """
+        if self.fc23Supported is not False and hasattr(self._client, "readwrite_registers"):
+            kwargs = {"slave": unit} if unit else {}
+            builder = BinaryPayloadBuilder(
+                byteorder=self.plugin.order16, wordorder=self.plugin.order32
+            )
+            builder.add_16bit_int(payload)
+            values = builder.to_registers()
+            async with self._lock:
+                await self._check_connection()
+                try:
+                    resp = await self._client.readwrite_registers(
+                        read_address=read_address,
+                        read_count=read_count,
+                        write_address=write_address,
+                        values=values,
+                        **kwargs,
+                    )
+                except (TimeoutError, ConnectionException, ModbusIOException) as e:
+                    if self.fc23Supported:
+                        raise HomeAssistantError(
+                            f"Error writing and reading Modbus registers: {str(e)}"
+                        ) from e
+                    resp = e
+            if self.fc23Supported or not (isinstance(resp, Exception) or resp.isError()):
+                self._invalidate_snapshot(write_address, len(values))
+                self.fc23Supported = True
+                return resp
+            _LOGGER.info(f"{self.name}: FC23 failed ({resp}), writing and reading separately from now on")
+            self.fc23Supported = False
+        await self.async_write_registers_single(unit=unit, address=write_address, payload=payload)
+        return await self.async_read_holding_registers(unit=unit, address=read_address, count=read_count)
+
+    def _invalidate_snapshot(self, address, count):
+        # written holding registers must not be served from the proxy snapshot anymore
+        if self.registerSnapshot is not None:
+            self.registerSnapshot.invalidate("holding", address, count)
+
     async def async_write_register(self, unit, address, payload):
         """Write register."""
         awake = self.plugin.isAwake(self.data)
@@ -626,10 +1345,11 @@ class SolaXModbusHub:
                 raise HomeAssistantError(
                     f"Error writing single Modbus registers: {original_message}"
                 ) from e
+        self._invalidate_snapshot(address, len(payload))
         return resp
 
     async def async_write_registers_multi(
-        self, unit, address, payload
+        self, unit, address, payload, priority=False
     ):  # Needs adapting for regiater que
         """Write registers multi.
         unit is the modbus address of the device that will be writen to
@@ -641,6 +1361,7 @@ class SolaXModbusHub:
         to modbus device with address=unit
         All register descriptions referenced in the payload must be consecutive (without leaving holes)
         32bit integers will be converted to 2 modbus register values according to the endian strategy of the plugin
+        priority writes get the modbus lock before all waiting reads and normal writes
         """
         kwargs = {"slave": unit} if unit else {}
         builder = BinaryPayloadBuilder(
@@ -683,7 +1404,7 @@ class SolaXModbusHub:
             _LOGGER.debug(
                 f"Ready to write multiple registers at 0x{address:02x}: {payload}"
             )
-            async with self._lock:
+            async with self._lock.priority() if priority else self._lock:
                 await self._check_connection()
                 try:
                     resp = await self._client.write_registers(
@@ -694,6 +1415,7 @@ class SolaXModbusHub:
                     raise HomeAssistantError(
                         f"Error writing multiple Modbus registers: {original_message}"
                     ) from e
+            self._invalidate_snapshot(address, len(payload))
             return resp
         else:
             _LOGGER.error(
@@ -704,7 +1426,12 @@ class SolaXModbusHub:
     async def async_read_modbus_data(self, group):
         res = True
         try:
-            res = await self.async_read_modbus_registers_all(group)
+            async with group.readLock or nullcontext():
+                if self.worker is not None and self.worker.owns(group):
+                    res = await self.worker.async_read_group(group)
+                    if res is not None:
+                        return res
+                res = await self.async_read_modbus_registers_all(group)
         except ConnectionException as ex:
             _LOGGER.error("Reading data failed! Inverter is offline.")
             res = False
@@ -717,6 +1444,7 @@ class SolaXModbusHub:
         return res
 
     def treat_address(self, data, decoder, descr, initval=0):
+        """The value of descr decoded for data, MISSING when it is not to be stored."""
         return_value = None
         val = None
         if self.cyclecount < 5:
@@ -775,7 +1503,7 @@ class SolaXModbusHub:
         elif type(descr.scale) is dict:  # translate int to string
             return_value = descr.scale.get(val, "Unknown")
         elif callable(descr.scale):  # function to call ?
-            return_value = descr.scale(val, descr, data)
+            return_value = descr.scale(val, descr.description, data)
         else:  # apply simple numeric scaling and rounding if not a list of words
             try:
                 return_value = round(val * descr.scale, descr.rounding)
@@ -785,14 +1513,22 @@ class SolaXModbusHub:
         if (self.tmpdata_expiry.get(descr.key, 0) == 0) and (
             (descr.sleepmode != SLEEPMODE_LASTAWAKE) or self.plugin.isAwake(self.data)
         ):
-            data[descr.key] = return_value  # case prevent_update number
+            return return_value
+        return MISSING  # case prevent_update number
 
     async def async_read_modbus_block(self, data, block, typ):
+        realtime_data, errmsg = await self.async_request_modbus_block(block, typ)
+        return self.decode_modbus_block(data, block, typ, realtime_data, errmsg)
+
+    async def async_request_modbus_block(self, block, typ):
+        """Read the registers of block; returns (response, error message or None)."""
         errmsg = None
+        realtime_data = None
         if self.cyclecount < 5:
             _LOGGER.debug(
                 f"{self.name} modbus {typ} block start: 0x{block.start:x} end: 0x{block.end:x}  len: {block.end - block.start} \nregs: {block.regs}"
             )
+        request_start = perf_counter()
         try:
             if typ == "input":
                 realtime_data = await self.async_read_input_registers(
@@ -808,15 +1544,48 @@ class SolaXModbusHub:
                 )
         except Exception as ex:
             errmsg = f"exception {str(ex)} "
+            self.stats.exceptions += 1
+            if isinstance(ex, (TimeoutError, ModbusIOException)):
+                self.stats.timeouts += 1
         else:
             if realtime_data.isError():
                 errmsg = f"read_error "
+                self.stats.errors += 1
+        request_end = perf_counter()
+        self.stats.add_block(
+            typ,
+            block.start,
+            block.end - block.start,
+            request_end - request_start,
+            errmsg is None,
+        )
+        self.trace.record(
+            f"{typ} 0x{block.start:x}",
+            "request",
+            request_start,
+            request_end,
+            count=block.end - block.start,
+            error=errmsg,
+        )
+        return realtime_data, errmsg
+
+    def decode_modbus_block(self, data, block, typ, realtime_data, errmsg):
+        """Decode the response of a block read into data, a ReadBuffer; False when the read failed."""
         if errmsg == None:
+            if self.registerSnapshot is not None:
+                self.registerSnapshot.store(typ, block.start, realtime_data.registers)
+            decode_start = perf_counter()
             decoder = BinaryPayloadDecoder.fromRegisters(
                 realtime_data.registers,
                 self.plugin.order16,
                 wordorder=self.plugin.order32,
             )
+            slots = block.slots
+            if slots is None:  # first read of the block
+                slots = block.slots = self._block_slots(block)
+                data.grow()
+            values = data.values  # straight into the slots of the read buffer, see datastore.py
+            written = data.written
             prevreg = block.start
             for reg in block.regs:
                 if (reg - prevreg) > 0:
@@ -826,11 +1595,22 @@ class SolaXModbusHub:
                 descr = block.descriptions[reg]
                 if type(descr) is dict:  #  set of byte values
                     val = decoder.decode_16bit_uint()
+                    byte_slots = slots[reg]
                     for k in descr:
-                        self.treat_address(data, decoder, descr[k], val)
+                        value = self.treat_address(data, decoder, descr[k], val)
+                        if value is not MISSING:
+                            slot = byte_slots[k]
+                            if values[slot] is MISSING:
+                                written.append(slot)
+                            values[slot] = value
                     prevreg = reg + 1
                 else:  # single value
-                    self.treat_address(data, decoder, descr)
+                    value = self.treat_address(data, decoder, descr)
+                    if value is not MISSING:
+                        slot = slots[reg]
+                        if values[slot] is MISSING:
+                            written.append(slot)
+                        values[slot] = value
                     if descr.unit in (
                         REGISTER_S32,
                         REGISTER_U32,
@@ -844,14 +1624,13 @@ class SolaXModbusHub:
                         prevreg = reg + descr.wordcount
                     else:
                         prevreg = reg + 1
+            self.stats.decode_time += perf_counter() - decode_start
+            self.trace.record("decode", "decode", decode_start, block=f"0x{block.start:x}")
             return True
         else:  # block read failure
-            firstdescr = block.descriptions[
-                block.start
-            ]  # check only first item in block
             if (
-                firstdescr.ignore_readerror != False
-            ):  # ignore block read errors and return static data
+                block.ignore_readerror != False
+            ):  # of the first item in block; ignore block read errors and return static data
                 for reg in block.regs:
                     descr = block.descriptions[reg]
                     if not (type(descr) is dict):
@@ -870,37 +1649,74 @@ class SolaXModbusHub:
                     )
                 return False
 
+    def _block_slots(self, block):
+        """register -> slot in self.data of the values of block (a dict of them for byte values)."""
+        slot = self.data.slot
+        slots = {}
+        for reg in block.regs:
+            descr = block.descriptions[reg]
+            slots[reg] = {k: slot(d.key) for k, d in descr.items()} if type(descr) is dict else slot(descr.key)
+        return slots
+
     async def async_read_modbus_registers_all(self, group):
         if group.readPreparation is not None:
-            if not await group.readPreparation(self.data):
+            with self.trace.span("readPreparation", "hook"):
+                prepared = await group.readPreparation(self.data)
+            if not prepared:
                 _LOGGER.info(f"device group read cancel")
                 return True
         else:
             _LOGGER.debug(f"device group inverter")
 
-        data = {"_repeatUntil": self.data["_repeatUntil"]}
-        res = True
-        for block in group.holdingBlocks:
-            res = res and await self.async_read_modbus_block(data, block, "holding")
-        for block in group.inputBlocks:
-            res = res and await self.async_read_modbus_block(data, block, "input")
-
-        if self.localsUpdated:
-            await self._hass.async_add_executor_job(self.saveLocalData)
-            self.plugin.localDataCallback(self)
-        if not self.localsLoaded:
-            await self._hass.async_add_executor_job(self.loadLocalData)
-        for reg in self.computedSensors:
-            descr = self.computedSensors[reg]
-            data[descr.key] = descr.value_function(0, descr, data)
-
+        with self.data.buffer() as data:  # the values of this read, see datastore.py
+            data["_repeatUntil"] = self.data["_repeatUntil"]
+            res = True
+            if self.pooled():  # all blocks at once, spread over the sessions
+                blocks = [(block, "holding") for block in group.holdingBlocks] + [
+                    (block, "input") for block in group.inputBlocks
+                ]
+                responses = await asyncio.gather(
+                    *(self.async_request_modbus_block(block, typ) for block, typ in blocks)
+                )
+                # decoded in the order of the block plan, as the sequential reads: value functions may use earlier blocks
+                for (block, typ), (realtime_data, errmsg) in zip(blocks, responses):
+                    res = res and self.decode_modbus_block(data, block, typ, realtime_data, errmsg)
+            else:
+                for block in group.holdingBlocks:
+                    res = res and await self.async_read_modbus_block(data, block, "holding")
+                for block in group.inputBlocks:
+                    res = res and await self.async_read_modbus_block(data, block, "input")
+
+            if self.localsUpdated and self._hass is not None:  # no hass in the polling worker, the hub owns the local data
+                with self.trace.span("saveLocalData", "local data"):
+                    await self._hass.async_add_executor_job(self.saveLocalData)
+                self.plugin.localDataCallback(self)
+            if not self.localsLoaded and self._hass is not None:
+                with self.trace.span("loadLocalData", "local data"):
+                    await self._hass.async_add_executor_job(self.loadLocalData)
+            with self.trace.span("computed sensors", "decode", count=len(self.computedSensors)):
+                for reg in self.computedSensors:
+                    descr = self.computedSensors[reg]
+                    data[descr.key] = descr.value_function(0, descr, data)
+            return await self.async_apply_group_read(group, data, res)
+
+    async def async_apply_group_read(self, group, data, res):
+        """Follow up, store and publish the values read for group (a ReadBuffer); also for the reads of the polling worker."""
         if group.readFollowUp is not None:
-            if not await group.readFollowUp(self.data, data):
+            with self.trace.span("readFollowUp", "hook"):
+                followed_up = await group.readFollowUp(self.data, data)
+            if not followed_up:
                 _LOGGER.warning(f"device group check not success")
                 return True
 
-        for key, value in data.items():
-            self.data[key] = value
+        self.data.commit(data)  # stamps the values that changed
+        if res:
+            group.lastUpdate = time()
+            for listener in self.dataListeners:  # data holds the keys read now
+                try:
+                    await listener(self, group, data)
+                except Exception:
+                    _LOGGER.exception(f"{self.name}: data listener failed")
 
         if (
             res and self.writequeue and self.plugin.isAwake(self.data)
@@ -914,19 +1730,6 @@ class SolaXModbusHub:
                 await self.async_write_register(self._modbus_addr, addr, val)
             self.writequeue = {}  # make sure we do not write multiple times
         self.last_ts = time()
-        for (
-            k,
-            v,
-        ) in self.data["_repeatUntil"].items():
-            if self.last_ts < v:
-                buttondescr = self.computedButtons[k]
-                payload = buttondescr.value_function(0, buttondescr, self.data)
-                _LOGGER.debug(f"ready to repeat button {k} data: {payload}")
-                await self.async_write_registers_multi(
-                    unit=self._modbus_addr,
-                    address=buttondescr.register,
-                    payload=payload,
-                )
         return res
 
 class SolaXCoreModbusHub(SolaXModbusHub,CoreModbusHub):
@@ -943,6 +1746,7 @@ class SolaXCoreModbusHub(SolaXModbusHub,CoreModbusHub):
         core_hub_name = config.get(CONF_CORE_HUB,"")
         self._core_hub = core_hub_name
         self._hub = None
+        self.fc23Supported = False  # the core modbus hub only has the plain reads and writes
         _LOGGER.debug(f"solax via core modbus hub '{core_hub_name}")
 
         _LOGGER.debug("setup solax core modbus hub done %s", self.__dict__)
@@ -955,6 +1759,19 @@ class SolaXCoreModbusHub(SolaXModbusHub,CoreModbusHub):
             if self._hub:
                 self._hub = None
 
+    async def async_start_recording(self, path):
+        raise HomeAssistantError(
+            f"{self.name}: recording is not supported via a core modbus hub"
+        )
+
+    async def async_stop_recording(self):
+        raise HomeAssistantError(f"{self.name}: not recording")
+
+    async def async_write_raw_registers(self, unit, address, registers):
+        raise HomeAssistantError(
+            f"{self.name}: proxy writes are not supported via a core modbus hub"
+        )
+
     # async def async_connect(self):
     #    """Connect client."""
     #    _LOGGER.debug("connect modbus")
@@ -1143,7 +1960,7 @@ class SolaXCoreModbusHub(SolaXModbusHub,CoreModbusHub):
             ) from e
 
     async def async_write_registers_multi(
-        self, unit, address, payload
+        self, unit, address, payload, priority=False
     ):  # Needs adapting for regiater que
         """Write registers multi.
         unit is the modbus address of the device that will be writen to
@@ -1155,6 +1972,7 @@ class SolaXCoreModbusHub(SolaXModbusHub,CoreModbusHub):
         to modbus device with address=unit
         All register descriptions referenced in the payload must be consecutive (without leaving holes)
         32bit integers will be converted to 2 modbus register values according to the endian strategy of the plugin
+        priority writes get the modbus lock before all waiting reads and normal writes
         """
         kwargs = {"slave": unit} if unit else {}
         builder = BinaryPayloadBuilder(
@@ -1197,7 +2015,7 @@ class SolaXCoreModbusHub(SolaXModbusHub,CoreModbusHub):
             _LOGGER.debug(
                 f"Ready to write multiple registers at 0x{address:02x}: {payload}"
             )
-            async with self._lock:
+            async with self._lock.priority() if priority else self._lock:
                 hub = await self._check_connection()
             try:
                 if hub._config_delay:
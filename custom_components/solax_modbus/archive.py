@@ -0,0 +1,279 @@
+"""Append-only archive of the decoded values of every read, for high frequency history.
+
+One file per day (UTC). A file is a sequence of compressed chunks, each holding the rows of a batch of
+reads in columns: a timestamp column and per key the (row, value) pairs of the rows that contain the
+key, both delta and zigzag varint encoded, values as integers with a per column number of decimals.
+The event loop only appends rows to a buffer; encoding and writing run in the executor, one chunk
+at a time and in order. A chunk that cannot be written is logged and dropped.
+Reads memory map the files and only decode the columns of the requested keys. Exports are csv (one
+row per timestamp) or json with one column of times and one of values per key, for pandas and the like.
+"""
+
+import asyncio
+import csv
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime, timezone
+from time import gmtime, strftime, time
+
+_LOGGER = logging.getLogger(__name__)
+
+CHUNK_MAGIC = b"SXA1"
+CHUNK_HEADER = struct.Struct("<4sI")  # magic, length of the compressed payload
+FLUSH_ROWS = 600  # rows per chunk
+FLUSH_INTERVAL = 60  # seconds; a chunk is written at least this often
+FLOAT_DECIMALS = 3
+
+
+def _varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(out, value):
+    _varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_zigzag(buf, pos):
+    value, pos = _read_varint(buf, pos)
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1), pos
+
+
+def encode_chunk(rows):
+    """rows: [(timestamp, {key: number})] -> chunk bytes."""
+    out = bytearray()
+    _varint(out, len(rows))
+    previous = 0
+    columns = {}
+    for idx, (timestamp, values) in enumerate(rows):
+        ms = int(timestamp * 1000)
+        _zigzag(out, ms - previous)
+        previous = ms
+        for key, value in values.items():
+            columns.setdefault(key, []).append((idx, value))
+    _varint(out, len(columns))
+    for key, entries in columns.items():
+        decimals = 0 if all(isinstance(value, int) for _, value in entries) else FLOAT_DECIMALS
+        factor = 10**decimals
+        column = bytearray()
+        last_idx = last_value = 0
+        for idx, value in entries:
+            value = int(round(value * factor))
+            _varint(column, idx - last_idx)
+            _zigzag(column, value - last_value)
+            last_idx, last_value = idx, value
+        name = key.encode()
+        _varint(out, len(name))
+        out += name
+        _varint(out, decimals)
+        _varint(out, len(entries))
+        _varint(out, len(column))
+        out += column
+    payload = zlib.compress(bytes(out))
+    return CHUNK_HEADER.pack(CHUNK_MAGIC, len(payload)) + payload
+
+
+def decode_chunk(payload, keys=None):
+    """Yield (key, [(timestamp, value)]) of the columns in keys (all when None)."""
+    buf = zlib.decompress(payload)
+    count, pos = _read_varint(buf, 0)
+    timestamps = []
+    ms = 0
+    for _ in range(count):
+        delta, pos = _read_zigzag(buf, pos)
+        ms += delta
+        timestamps.append(ms / 1000)
+    columns, pos = _read_varint(buf, pos)
+    for _ in range(columns):
+        length, pos = _read_varint(buf, pos)
+        key = buf[pos : pos + length].decode()
+        pos += length
+        decimals, pos = _read_varint(buf, pos)
+        entries, pos = _read_varint(buf, pos)
+        size, pos = _read_varint(buf, pos)
+        end = pos + size
+        if keys is not None and key not in keys:
+            pos = end
+            continue
+        factor = 10**decimals
+        idx = value = 0
+        samples = []
+        for _ in range(entries):
+            delta, pos = _read_varint(buf, pos)
+            idx += delta
+            delta, pos = _read_zigzag(buf, pos)
+            value += delta
+            samples.append((timestamps[idx], value / factor if decimals else value))
+        pos = end
+        yield key, samples
+
+
+def read_file(path, keys=None):
+    """Yield (key, [(timestamp, value)]) of every chunk of a day file."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        pos = 0
+        while pos + CHUNK_HEADER.size <= len(buf):
+            magic, length = CHUNK_HEADER.unpack_from(buf, pos)
+            pos += CHUNK_HEADER.size
+            if magic != CHUNK_MAGIC or pos + length > len(buf):
+                _LOGGER.warning(f"archive {path}: damaged chunk at {pos}, ignoring the rest")
+                return
+            yield from decode_chunk(buf[pos : pos + length], keys)
+            pos += length
+
+
+def downsample(samples, step):
+    """Mean per step seconds, at the start of each step."""
+    result = []
+    bucket = None
+    total = count = 0
+    for timestamp, value in samples:
+        start = timestamp - timestamp % step
+        if start != bucket:
+            if count:
+                result.append((bucket, total / count))
+            bucket, total, count = start, 0, 0
+        total += value
+        count += 1
+    if count:
+        result.append((bucket, total / count))
+    return result
+
+
+class SampleArchive:
+    """Archive of one hub; register async_data_updated as data listener of the hub."""
+
+    def __init__(self, hass, directory):
+        self._hass = hass
+        self.directory = directory
+        self.rows = 0
+        self.chunks = 0
+        self.dropped = 0  # chunks that could not be written
+        self._buffer = []
+        self._first = None  # time of the oldest buffered row
+        self._writing = asyncio.Lock()  # one chunk at a time; waiters get it in order
+        self._flushes = set()  # flush tasks not done yet
+
+    def path(self, timestamp):
+        return os.path.join(self.directory, strftime("%Y-%m-%d", gmtime(timestamp)) + ".sxa")
+
+    async def async_data_updated(self, hub, group, data):
+        now = time()
+        values = {
+            key: value
+            for key, value in data.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and not key.startswith("_")
+        }
+        if values:
+            self.add(now, values)
+
+    def add(self, timestamp, values):
+        if self._buffer and self.path(timestamp) != self.path(self._buffer[0][0]):
+            self._flush()  # a chunk never spans two days
+        if not self._buffer:
+            self._first = timestamp
+        self._buffer.append((timestamp, values))
+        self.rows += 1
+        if len(self._buffer) >= FLUSH_ROWS or timestamp - self._first >= FLUSH_INTERVAL:
+            self._flush()
+
+    def _write(self, rows):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(rows[0][0]), "ab") as fp:
+            fp.write(encode_chunk(rows))
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        task = self._hass.async_create_task(self._async_write(rows))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _async_write(self, rows):
+        async with self._writing:  # keep the chunks in order
+            try:
+                await self._hass.async_add_executor_job(self._write, rows)
+            except Exception:  # e.g. the disk is full; the next chunks are written again
+                self.dropped += 1
+                _LOGGER.exception(f"archive {self.directory}: cannot write {len(rows)} rows, dropped")
+            else:
+                self.chunks += 1
+
+    async def async_close(self):
+        """Write the buffered rows."""
+        self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes)
+
+    def query(self, start, end, keys=None, step=None):
+        """{key: [(timestamp, value)]} between start and end, averaged per step seconds when step is set.
+
+        Blocking: run in the executor. Buffered rows that are not written yet are not included.
+        """
+        result = {}
+        day = start - start % 86400
+        while day <= end:
+            for key, samples in read_file(self.path(day), keys):
+                result.setdefault(key, []).extend(s for s in samples if start <= s[0] <= end)
+            day += 86400
+        for key, samples in result.items():
+            samples.sort()
+            if step:
+                result[key] = downsample(samples, step)
+        return result
+
+    def export_csv(self, path, start, end, keys=None, step=None):
+        """Write a query as csv, one row per timestamp and one column per key. Blocking."""
+        data = self.query(start, end, keys, step)
+        columns = sorted(data)
+        rows = {}
+        for col, key in enumerate(columns):
+            for timestamp, value in data[key]:
+                rows.setdefault(timestamp, [""] * len(columns))[col] = value
+        with open(path, "w", newline="") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(["time"] + columns)
+            for timestamp in sorted(rows):
+                writer.writerow([datetime.fromtimestamp(timestamp, timezone.utc).isoformat()] + rows[timestamp])
+        return len(rows)
+
+    def export_json(self, path, start, end, keys=None, step=None):
+        """Write a query as json columns: {key: {"time": [...], "value": [...]}}, times in unix seconds. Blocking."""
+        data = self.query(start, end, keys, step)
+        columns = {
+            key: {"time": [timestamp for timestamp, _ in samples], "value": [value for _, value in samples]}
+            for key, samples in sorted(data.items())
+        }
+        with open(path, "w") as fp:
+            json.dump({"start": start, "end": end, "step": step or 0, "columns": columns}, fp)
+        return sum(len(column["time"]) for column in columns.values())
+
+    def as_dict(self):
+        return {
+            "directory": self.directory,
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "dropped_chunks": self.dropped,
+            "buffered": len(self._buffer),
+        }
@@ -29,6 +29,7 @@ async def async_setup_entry(hass, entry, async_add_entities) -> None:
         if plugin.matchInverterWithMask(hub._invertertype, button_info.allowedtypes, hub.seriesnumber, button_info.blacklist):
             if not (button_info.name.startswith(inverter_name_suffix)): button_info.name = inverter_name_suffix + button_info.name
             button = SolaXModbusButton( hub_name, hub, modbus_addr, hub.device_info, button_info )
+            hub.buttonEntities[button_info.key] = button
             entities.append(button)
             if button_info.key == plugin.wakeupButton(): hub.wakeupButton = button_info
             if button_info.value_function: hub.computedButtons[button_info.key] = button_info
@@ -90,4 +91,6 @@ class SolaXModbusButton(ButtonEntity):
                     _LOGGER.info(f"writing {self._platform_name} button register {self._register} value {res}")
                     await self._hub.async_write_registers_multi(
                         unit=self._modbus_addr, address=self._register, payload=res
-                    )
\ No newline at end of file
+                    )
+            if self.button_info.autorepeat:
+                self._hub.start_autorepeat(self.button_info.key)
\ No newline at end of file
@@ -52,7 +52,51 @@ from .const import (
     DEFAULT_READ_BATTERY,
     PLUGIN_PATH,
     CONF_SCAN_INTERVAL_MEDIUM,
-    CONF_SCAN_INTERVAL_FAST
+    CONF_SCAN_INTERVAL_FAST,
+    CONF_SCAN_INTERVAL_BATTERY,
+    CONF_PERF_SENSORS,
+    DEFAULT_PERF_SENSORS,
+    CONF_PROXY_PORT,
+    CONF_POWER_CONTROL,
+    CONF_POWER_CONTROL_TARGET,
+    CONF_POWER_CONTROL_KP,
+    CONF_POWER_CONTROL_KI,
+    CONF_POWER_CONTROL_RATE,
+    DEFAULT_POWER_CONTROL,
+    DEFAULT_POWER_CONTROL_TARGET,
+    DEFAULT_POWER_CONTROL_KP,
+    DEFAULT_POWER_CONTROL_KI,
+    DEFAULT_POWER_CONTROL_RATE,
+    CONF_SURPLUS_SOURCE,
+    CONF_SURPLUS_HYSTERESIS,
+    CONF_SURPLUS_MIN_ON,
+    CONF_SURPLUS_MIN_OFF,
+    DEFAULT_SURPLUS_HYSTERESIS,
+    DEFAULT_SURPLUS_MIN_ON,
+    DEFAULT_SURPLUS_MIN_OFF,
+    CONF_ARCHIVE,
+    DEFAULT_ARCHIVE,
+    CONF_WORKER,
+    CONF_SERIAL_THREAD,
+    CONF_TCP_SESSIONS,
+    DEFAULT_WORKER,
+    DEFAULT_SERIAL_THREAD,
+    DEFAULT_TCP_SESSIONS,
+    MAX_TCP_SESSIONS,
+    CONF_PUBLISH_INTERVAL_MEDIUM,
+    CONF_PUBLISH_INTERVAL_FAST,
+    DEFAULT_PUBLISH_INTERVAL,
+    CONF_PROXY_MAX_AGE,
+    CONF_PROXY_RANGES,
+    CONF_PROXY_HOST,
+    CONF_PROXY_WRITES,
+    DEFAULT_PROXY_PORT,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_WRITES,
+    DEFAULT_PROXY_MAX_AGE,
+    CONF_BATTERY_PACKS_PER_CYCLE,
+    DEFAULT_SCAN_INTERVAL_BATTERY,
+    DEFAULT_BATTERY_PACKS_PER_CYCLE,
     # PLUGIN_PATH_OLDSTYLE,
 )
 
@@ -109,10 +153,29 @@ CONFIG_SCHEMA = vol.Schema( {
         vol.Required(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): int,
         vol.Optional(CONF_SCAN_INTERVAL_MEDIUM, default=DEFAULT_SCAN_INTERVAL): int,
         vol.Optional(CONF_SCAN_INTERVAL_FAST, default=DEFAULT_SCAN_INTERVAL): int,
+        vol.Optional(CONF_PUBLISH_INTERVAL_MEDIUM, default=DEFAULT_PUBLISH_INTERVAL): int,
+        vol.Optional(CONF_PUBLISH_INTERVAL_FAST, default=DEFAULT_PUBLISH_INTERVAL): int,
         vol.Optional(CONF_INVERTER_NAME_SUFFIX, description={"suggested_value": DEFAULT_INVERTER_NAME_SUFFIX}): str,
         vol.Optional(CONF_READ_EPS, default=DEFAULT_READ_EPS): bool,
         vol.Optional(CONF_READ_DCB, default=DEFAULT_READ_DCB): bool,
         vol.Optional(CONF_READ_PM, default=DEFAULT_READ_PM): bool,
+        vol.Optional(CONF_PERF_SENSORS, default=DEFAULT_PERF_SENSORS): bool,
+        vol.Optional(CONF_PROXY_PORT, default=DEFAULT_PROXY_PORT): vol.All(int, vol.Range(min=0, max=65535)),
+        vol.Optional(CONF_PROXY_HOST, default=DEFAULT_PROXY_HOST): str,
+        vol.Optional(CONF_PROXY_WRITES, default=DEFAULT_PROXY_WRITES): bool,
+        vol.Optional(CONF_PROXY_MAX_AGE, default=DEFAULT_PROXY_MAX_AGE): int,
+        vol.Optional(CONF_PROXY_RANGES): str,
+        vol.Optional(CONF_ARCHIVE, default=DEFAULT_ARCHIVE): bool,
+        vol.Optional(CONF_WORKER, default=DEFAULT_WORKER): bool,
+        vol.Optional(CONF_POWER_CONTROL, default=DEFAULT_POWER_CONTROL): bool,
+        vol.Optional(CONF_POWER_CONTROL_TARGET, default=DEFAULT_POWER_CONTROL_TARGET): int,
+        vol.Optional(CONF_POWER_CONTROL_KP, default=DEFAULT_POWER_CONTROL_KP): vol.Coerce(float),
+        vol.Optional(CONF_POWER_CONTROL_KI, default=DEFAULT_POWER_CONTROL_KI): vol.Coerce(float),
+        vol.Optional(CONF_POWER_CONTROL_RATE, default=DEFAULT_POWER_CONTROL_RATE): int,
+        vol.Optional(CONF_SURPLUS_SOURCE): str,
+        vol.Optional(CONF_SURPLUS_HYSTERESIS, default=DEFAULT_SURPLUS_HYSTERESIS): int,
+        vol.Optional(CONF_SURPLUS_MIN_ON, default=DEFAULT_SURPLUS_MIN_ON): int,
+        vol.Optional(CONF_SURPLUS_MIN_OFF, default=DEFAULT_SURPLUS_MIN_OFF): int,
     } )
 
 OPTION_SCHEMA = vol.Schema( {
@@ -122,21 +185,42 @@ OPTION_SCHEMA = vol.Schema( {
         vol.Required(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): int,
         vol.Optional(CONF_SCAN_INTERVAL_MEDIUM, default=DEFAULT_SCAN_INTERVAL): int,
         vol.Optional(CONF_SCAN_INTERVAL_FAST, default=DEFAULT_SCAN_INTERVAL): int,
+        vol.Optional(CONF_PUBLISH_INTERVAL_MEDIUM, default=DEFAULT_PUBLISH_INTERVAL): int,
+        vol.Optional(CONF_PUBLISH_INTERVAL_FAST, default=DEFAULT_PUBLISH_INTERVAL): int,
         vol.Optional(CONF_INVERTER_NAME_SUFFIX): str,
         vol.Optional(CONF_READ_EPS, default=DEFAULT_READ_EPS): bool,
         vol.Optional(CONF_READ_DCB, default=DEFAULT_READ_DCB): bool,
         vol.Optional(CONF_READ_PM, default=DEFAULT_READ_PM): bool,
+        vol.Optional(CONF_PERF_SENSORS, default=DEFAULT_PERF_SENSORS): bool,
+        vol.Optional(CONF_PROXY_PORT, default=DEFAULT_PROXY_PORT): vol.All(int, vol.Range(min=0, max=65535)),
+        vol.Optional(CONF_PROXY_HOST, default=DEFAULT_PROXY_HOST): str,
+        vol.Optional(CONF_PROXY_WRITES, default=DEFAULT_PROXY_WRITES): bool,
+        vol.Optional(CONF_PROXY_MAX_AGE, default=DEFAULT_PROXY_MAX_AGE): int,
+        vol.Optional(CONF_PROXY_RANGES): str,
+        vol.Optional(CONF_ARCHIVE, default=DEFAULT_ARCHIVE): bool,
+        vol.Optional(CONF_WORKER, default=DEFAULT_WORKER): bool,
+        vol.Optional(CONF_POWER_CONTROL, default=DEFAULT_POWER_CONTROL): bool,
+        vol.Optional(CONF_POWER_CONTROL_TARGET, default=DEFAULT_POWER_CONTROL_TARGET): int,
+        vol.Optional(CONF_POWER_CONTROL_KP, default=DEFAULT_POWER_CONTROL_KP): vol.Coerce(float),
+        vol.Optional(CONF_POWER_CONTROL_KI, default=DEFAULT_POWER_CONTROL_KI): vol.Coerce(float),
+        vol.Optional(CONF_POWER_CONTROL_RATE, default=DEFAULT_POWER_CONTROL_RATE): int,
+        vol.Optional(CONF_SURPLUS_SOURCE): str,
+        vol.Optional(CONF_SURPLUS_HYSTERESIS, default=DEFAULT_SURPLUS_HYSTERESIS): int,
+        vol.Optional(CONF_SURPLUS_MIN_ON, default=DEFAULT_SURPLUS_MIN_ON): int,
+        vol.Optional(CONF_SURPLUS_MIN_OFF, default=DEFAULT_SURPLUS_MIN_OFF): int,
     } )
 
 SERIAL_SCHEMA = vol.Schema( {
         vol.Optional(CONF_SERIAL_PORT, default=DEFAULT_SERIAL_PORT): str,
         vol.Optional(CONF_BAUDRATE, default=DEFAULT_BAUDRATE): selector.SelectSelector(selector.SelectSelectorConfig(options=BAUDRATES), ),
+        vol.Optional(CONF_SERIAL_THREAD, default=DEFAULT_SERIAL_THREAD): bool,
     } )
 
 TCP_SCHEMA = vol.Schema( {
         vol.Required(CONF_HOST): str,
         vol.Required(CONF_PORT, default=DEFAULT_PORT): int,
         vol.Required(CONF_TCP_TYPE, default=DEFAULT_TCP_TYPE): selector.SelectSelector(selector.SelectSelectorConfig(options=TCP_TYPES), ),
+        vol.Optional(CONF_TCP_SESSIONS, default=DEFAULT_TCP_SESSIONS): vol.All(int, vol.Range(min=1, max=MAX_TCP_SESSIONS)),
     } )
 
 CORE_SCHEMA = vol.Schema( {
@@ -147,6 +231,8 @@ CORE_SCHEMA = vol.Schema( {
 
 BATTERY_SCHEMA = vol.Schema( {
         vol.Optional(CONF_READ_BATTERY, default=DEFAULT_READ_BATTERY): bool,
+        vol.Optional(CONF_SCAN_INTERVAL_BATTERY, default=DEFAULT_SCAN_INTERVAL_BATTERY): int,
+        vol.Optional(CONF_BATTERY_PACKS_PER_CYCLE, default=DEFAULT_BATTERY_PACKS_PER_CYCLE): int,
     } )
 
 async def _validate_base(handler: SchemaCommonFlowHandler, user_input: dict[str, Any]) -> dict[str, Any] :
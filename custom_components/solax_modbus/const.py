@@ -1,4 +1,5 @@
 
+import asyncio
 import logging
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -87,6 +88,67 @@ SLEEPMODE_LASTAWAKE = 2 # when still responding but register must be ignored whe
 #keys for config
 CONF_SCAN_INTERVAL_MEDIUM = "scan_interval_medium"
 CONF_SCAN_INTERVAL_FAST   = "scan_interval_fast"
+CONF_SCAN_INTERVAL_BATTERY = "scan_interval_battery" # minimum time between two reads of the same battery pack
+CONF_BATTERY_PACKS_PER_CYCLE = "battery_packs_per_cycle" # max number of battery packs read in one polling cycle
+DEFAULT_SCAN_INTERVAL_BATTERY = 60
+DEFAULT_BATTERY_PACKS_PER_CYCLE = 2
+CONF_PERF_SENSORS = "perf_sensors" # expose polling statistics as diagnostic sensors
+DEFAULT_PERF_SENSORS = False
+CONF_PROXY_PORT = "proxy_port" # tcp port of the modbus proxy server, 0: no proxy
+CONF_PROXY_MAX_AGE = "proxy_max_age" # seconds a read register may be served by the proxy
+CONF_PROXY_RANGES = "proxy_ranges" # per register range max age, e.g. "0x0-0xff=5, 0x400-0x4ff=60"
+CONF_PROXY_HOST = "proxy_host" # interface the modbus proxy listens on, 0.0.0.0: all interfaces
+CONF_PROXY_WRITES = "proxy_writes" # pass writes of proxy clients to the inverter
+DEFAULT_PROXY_PORT = 0
+DEFAULT_PROXY_HOST = "127.0.0.1"
+DEFAULT_PROXY_WRITES = False
+DEFAULT_PROXY_MAX_AGE = 30
+CONF_PUBLISH_INTERVAL_MEDIUM = "publish_interval_medium" # seconds between state writes of the medium scan group, 0: every poll
+CONF_PUBLISH_INTERVAL_FAST = "publish_interval_fast"
+DEFAULT_PUBLISH_INTERVAL = 0
+CONF_POWER_CONTROL = "power_control" # closed loop grid power control inside the hub, see powercontrol.py
+CONF_POWER_CONTROL_TARGET = "power_control_target" # W, grid power to regulate to; positive: export, 0: zero export
+CONF_POWER_CONTROL_KP = "power_control_kp"
+CONF_POWER_CONTROL_KI = "power_control_ki" # per second
+CONF_POWER_CONTROL_RATE = "power_control_rate" # W/s, maximum change of the set point
+DEFAULT_POWER_CONTROL = False
+DEFAULT_POWER_CONTROL_TARGET = 0
+DEFAULT_POWER_CONTROL_KP = 0.5
+DEFAULT_POWER_CONTROL_KI = 0.2
+DEFAULT_POWER_CONTROL_RATE = 2000
+CONF_SURPLUS_SOURCE = "surplus_source_hub" # EV charger: name of the inverter hub whose PV surplus is charged, see surpluscontrol.py
+CONF_SURPLUS_HYSTERESIS = "surplus_hysteresis" # W around the minimum charge power for starting and stopping
+CONF_SURPLUS_MIN_ON = "surplus_min_on" # seconds
+CONF_SURPLUS_MIN_OFF = "surplus_min_off" # seconds
+DEFAULT_SURPLUS_HYSTERESIS = 300
+DEFAULT_SURPLUS_MIN_ON = 300
+DEFAULT_SURPLUS_MIN_OFF = 300
+CONF_ARCHIVE = "archive" # keep every decoded value in a local archive, see archive.py
+DEFAULT_ARCHIVE = False
+CONF_WORKER = "worker" # poll and decode in a separate process, see worker.py
+DEFAULT_WORKER = False
+CONF_SERIAL_THREAD = "serial_thread" # serial port i/o in a thread of its own, see serialthread.py
+DEFAULT_SERIAL_THREAD = False
+CONF_TCP_SESSIONS = "tcp_sessions" # parallel TCP sessions for reading, see tcppool.py
+DEFAULT_TCP_SESSIONS = 1
+MAX_TCP_SESSIONS = 8
+#services and their attributes
+SERVICE_DUMP_TRACE = "dump_trace"
+ATTR_HUB = "hub"
+ATTR_CYCLES = "cycles"
+SERVICE_START_RECORDING = "start_recording"
+SERVICE_STOP_RECORDING = "stop_recording"
+ATTR_FILENAME = "filename"
+SERVICE_BURST = "burst"
+ATTR_ENTITIES = "entities"
+ATTR_INTERVAL = "interval"
+ATTR_DURATION = "duration"
+SERVICE_EXPORT_ARCHIVE = "export_archive"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_KEYS = "keys"
+ATTR_STEP = "step"
+ATTR_FORMAT = "format"
 #values for scan_group attribute
 SCAN_GROUP_DEFAULT = CONF_SCAN_INTERVAL             # default scan group, slow; should always work
 SCAN_GROUP_MEDIUM  = CONF_SCAN_INTERVAL_MEDIUM      # medium speed scanning (energy, temp, soc...)
@@ -125,6 +187,39 @@ class base_battery_config:
         self.battery_sensor_type: list[SelectEntityDescription] | None = None
         self.battery_sensor_name_prefix: str | None = None
         self.battery_sensor_key_prefix: str | None = None
+        self.lock = asyncio.Lock() # held during a select/read/verify sequence of a battery pack
+
+    def for_hub(self):
+        # the plugin declares a single instance; every hub needs its own selection state and lock
+        return type(self)()
+
+@dataclass
+class power_control_config:
+    measurement: str # key of the grid power sensor; positive: export
+    button: str # key of the WRITE_MULTI_MODBUS button whose value_function builds the payload
+    setpoints: tuple # hub.data keys that receive the controller output before the payload is built
+    output_sign: int = -1 # -1: a higher set point lowers the measurement (e.g. battery charge power)
+    measurement_scale: float = 1 # to W, e.g. 1000 for a sensor in kW
+    output_limits: tuple = (-20000, 20000) # W
+    limit_keys: tuple = None # optional hub.data keys of (lower, upper) limits reported by the inverter
+    activate: dict = None # values laid over hub.data for the payload while the controller runs, e.g. the remote control mode
+    battery_power: str = None # key of the battery power, positive: charge; same unit as measurement
+
+@dataclass
+class surplus_control_config:
+    current_register: int # holding register of the charge current
+    current_scale: float # A per register unit
+    command_register: int # holding register of the start/stop command
+    start_command: int
+    stop_command: int
+    power_key: str # key of the power the charger draws now, W
+    min_current: float = 6 # A
+    max_current: float = 32 # A
+    current_step: float = 1 # A, smaller changes of the surplus do not change the charge current
+    voltage: float = 230 # V per phase
+    three_phase_mask: int = 0 # invertertype bits of three phase chargers
+    phase_key: str = None # key of the phase selection of a three phase charger
+    three_phase_value: str = None # value of phase_key when charging on three phases
 
 @dataclass
 class plugin_base:
@@ -140,6 +235,8 @@ class plugin_base:
     order16: int | None = None # Endian.BIG or Endian.LITTLE
     order32: int | None = None
     inverter_model: str = None
+    POWER_CONTROL: power_control_config | None = None # when set, the hub can run powercontrol.PowerController
+    SURPLUS_CONTROL: surplus_control_config | None = None # when set, the hub can run surpluscontrol.SurplusController
 
     def isAwake(self, datadict):
         return True # always awake by default
@@ -197,6 +294,11 @@ class BaseModbusSensorEntityDescription(SensorEntityDescription):
                                    # When simply set to True, no initial value will be returned, but the block will be considered valid
     value_series: int = None # if not None, the value is part of a series of values with similar properties
                              # The name and key must contain a placeholder {} that is replaced by the preceding number
+    publish_policy: str = None # PUBLISH_LAST, _MEAN, _MIN, _MAX or _TIME_WEIGHTED (publish.py); None: time weighted for measurements, else last
+    publish_interval: int = None # seconds between state writes; None: use the publish interval option of the scan group, 0: every poll
+    deadband: float = None # do not write the state when it changed less than this, in the unit of the entity, e.g. 5 (W)
+    deadband_relative: float = None # same, relative to the last written value, e.g. 0.01 for 1%
+    max_silence: int = None # seconds after which the state is written, even within the deadband
 
 @dataclass
 class BaseModbusButtonEntityDescription(ButtonEntityDescription):
@@ -207,6 +309,8 @@ class BaseModbusButtonEntityDescription(ButtonEntityDescription):
     write_method: int = WRITE_SINGLE_MODBUS # WRITE_SINGLE_MOBUS or WRITE_MULTI_MODBUS or WRITE_DATA_LOCAL
     value_function: callable = None #  value = function(initval, descr, datadict)
     autorepeat: str = None  # if not None: name of entity that contains autorepeat duration in seconds
+    autorepeat_period: float = None  # seconds between repeats; default the fastest scan interval
+    autorepeat_timeout: str = None  # name of entity with the device's timeout in seconds; repeats stay ahead of it
 
 @dataclass
 class BaseModbusSelectEntityDescription(SelectEntityDescription):
@@ -249,6 +353,9 @@ def autorepeat_remaining(datadict, entitykey, timestamp):
     remaining = datadict['_repeatUntil'].get(entitykey,0) - timestamp
     return int(remaining) if remaining >0 else 0
 
+AUTOREPEAT_MARGIN = 2 # seconds: a repeat is due at least this long before the device's timeout expires
+AUTOREPEAT_MIN_PERIOD = 0.5 # seconds
+
 # ================================= Computed sensor value functions  =================================================
 
 def value_function_pv_power_total(initval, descr, datadict):
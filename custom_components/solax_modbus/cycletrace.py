@@ -0,0 +1,112 @@
+"""Timeline of the most recent polling cycles of a hub, exportable as Chrome trace-event JSON."""
+
+import json
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter, time
+from types import SimpleNamespace
+
+TRACE_CYCLES = 100  # number of polling cycles kept per hub
+
+# every polling cycle runs in its own task, so the cycle being traced is task local
+_current_cycle = ContextVar("solax_modbus_trace_cycle", default=None)
+
+
+class CycleTrace:
+    """Ring buffer of polling cycles, each with the timestamped spans recorded while it ran.
+
+    Timestamps are perf_counter values; they are converted to wall clock time on export only.
+    Spans recorded outside a polling cycle (e.g. writes triggered by an entity) are dropped.
+    """
+
+    def __init__(self, maxlen=TRACE_CYCLES):
+        self.cycles = deque(maxlen=maxlen)
+        self._origin = time() - perf_counter()
+
+    @contextmanager
+    def cycle(self, interval, **args):
+        cycle = SimpleNamespace(
+            interval=interval, start=perf_counter(), end=None, spans=[], args=args
+        )
+        self.cycles.append(cycle)
+        token = _current_cycle.set(cycle)
+        try:
+            yield cycle
+        finally:
+            cycle.end = perf_counter()
+            _current_cycle.reset(token)
+
+    @contextmanager
+    def span(self, name, cat, **args):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, cat, start, **args)
+
+    def record(self, name, cat, start, end=None, **args):
+        """Record a span that started at perf_counter value start, in the current cycle."""
+        cycle = _current_cycle.get()
+        if cycle is not None:
+            if end is None:
+                end = perf_counter()
+            cycle.spans.append((name, cat, start, end - start, args))
+
+    def instant(self, name, cat, **args):
+        cycle = _current_cycle.get()
+        if cycle is not None:
+            cycle.spans.append((name, cat, perf_counter(), None, args))
+
+    def export_spans(self, cycle):
+        """The spans of cycle with wall clock start times, for the trace of another process."""
+        return [(name, cat, self._origin + start, duration, args) for name, cat, start, duration, args in cycle.spans]
+
+    def import_spans(self, spans):
+        """Add spans of export_spans (the polling worker's) to the current cycle."""
+        cycle = _current_cycle.get()
+        if cycle is not None:
+            cycle.spans.extend((name, cat, start - self._origin, duration, args) for name, cat, start, duration, args in spans)
+
+    def _ts(self, counter):
+        return round((self._origin + counter) * 1e6)  # microseconds
+
+    def chrome_trace(self, hub_name, count=None):
+        """Return the last count cycles (default all) in Chrome trace-event format."""
+        cycles = list(self.cycles)
+        if count:
+            cycles = cycles[-count:]
+        events = []
+        threads = set()
+        for cycle in cycles:
+            tid = cycle.interval
+            if tid not in threads:  # one timeline row per scan interval
+                threads.add(tid)
+                events.append(
+                    {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                     "args": {"name": f"scan interval {tid}s"}}
+                )
+            end = cycle.end if cycle.end is not None else perf_counter()
+            events.append(
+                {"name": f"cycle {tid}s", "cat": "cycle", "ph": "X", "pid": 1, "tid": tid,
+                 "ts": self._ts(cycle.start), "dur": round((end - cycle.start) * 1e6),
+                 "args": cycle.args}
+            )
+            for name, cat, start, duration, args in cycle.spans:
+                event = {"name": name, "cat": cat, "pid": 1, "tid": tid, "ts": self._ts(start), "args": args}
+                if duration is None:
+                    event.update(ph="i", s="t")
+                else:
+                    event.update(ph="X", dur=round(duration * 1e6))
+                events.append(event)
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"hub": hub_name},
+        }
+
+
+def write_trace(path, trace):
+    """Write a chrome trace to path; blocking, run in the executor."""
+    with open(path, "w") as fp:
+        json.dump(trace, fp)
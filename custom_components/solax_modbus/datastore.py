@@ -0,0 +1,252 @@
+"""hub.data: the decoded values of a hub, in slots.
+
+Keys are interned to integer slots when the entities are set up; the values live in a list with a
+change stamp per slot, so "did this value change since I last looked" is one comparison. The store
+behaves like the dict it replaces (value_function(initval, descr, datadict) and all other users keep
+working); entities and controllers that know their slot index the list directly.
+
+A group read decodes into a ReadBuffer: the block plan knows the slot of every register, so the values
+go straight into a list by slot index, and commit() moves the ones that changed into the store in one
+loop. Until then the store keeps the previous values, which readFollowUp compares against.
+tools/storebench.py measures this against the dict of a read and DataStore.update.
+"""
+
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+
+MISSING = object()  # value of a slot without value
+
+
+class DataStore(MutableMapping):
+    """Mapping of key -> value, backed by slots. version counts the changes; a slot's stamp is the version of its last change."""
+
+    __slots__ = ("_slots", "_keys", "_values", "_stamps", "_count", "_buffers", "_direct", "version", "direct")
+
+    def __init__(self, initial=None):
+        self._slots = {}  # key -> slot
+        self._keys = []  # slot -> key
+        self._values = []
+        self._stamps = []  # slot -> version of its last change
+        self._direct = []  # slot -> version of its last change not made by commit()
+        self._count = 0  # slots with a value
+        self._buffers = []  # idle read buffers
+        self.version = 0
+        self.direct = 0  # version of the last change not made by commit(): entities, sleep mode, local data
+        if initial:
+            self.update(initial)
+
+    def slot(self, key):
+        """Slot of key, interned on first use."""
+        idx = self._slots.get(key)
+        if idx is None:
+            idx = self._slots[key] = len(self._keys)
+            self._keys.append(key)
+            self._values.append(MISSING)
+            self._stamps.append(0)
+            self._direct.append(0)
+        return idx
+
+    def value(self, slot, default=None):
+        value = self._values[slot]
+        return default if value is MISSING else value
+
+    def stamp(self, key):
+        """Version of the last change of key; 0 when never set."""
+        idx = self._slots.get(key)
+        return 0 if idx is None else self._stamps[idx]
+
+    def set_directly(self, slots, version):
+        """Whether any of slots was changed after version, not by commit()."""
+        if self.direct <= version:
+            return False
+        direct = self._direct
+        return any(direct[idx] > version for idx in slots)
+
+    def changed_since(self, version):
+        """Keys changed after version."""
+        keys = self._keys
+        return [keys[idx] for idx, stamp in enumerate(self._stamps) if stamp > version]
+
+    def snapshot(self):
+        """Copy of the current values; cheap: one list copy, the slot table is shared."""
+        return DataSnapshot(self._slots, list(self._values), self._count)
+
+    @contextmanager
+    def buffer(self):
+        """An empty ReadBuffer for one group read; reused after the with block, so do not keep it."""
+        buffer = self._buffers.pop() if self._buffers else ReadBuffer(self)
+        buffer.start()
+        try:
+            yield buffer
+        finally:
+            self._buffers.append(buffer)
+
+    def commit(self, buffer):
+        """Store the values of a read buffer; the ones that changed get stamped."""
+        values = self._values
+        stamps = self._stamps
+        new_values = buffer.values
+        version = self.version
+        count = self._count
+        for idx in buffer.written:
+            new = new_values[idx]
+            old = values[idx]
+            if old is not new and old != new:  # MISSING is unequal to every value
+                if old is MISSING:
+                    count += 1
+                version += 1
+                values[idx] = new
+                stamps[idx] = version
+        self.version = version
+        self._count = count
+
+    # ---------------------------------------- dict interface ----------------------------------------
+
+    def __getitem__(self, key):
+        idx = self._slots.get(key)
+        if idx is not None:
+            value = self._values[idx]
+            if value is not MISSING:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        idx = self._slots.get(key)
+        if idx is None:
+            return default
+        value = self._values[idx]
+        return default if value is MISSING else value
+
+    def __setitem__(self, key, value):
+        idx = self._slots.get(key)
+        if idx is None:
+            idx = self.slot(key)
+        old = self._values[idx]
+        if old is MISSING or old is not value and old != value:  # an unchanged value keeps its stamp
+            if old is MISSING:
+                self._count += 1
+            self.version += 1
+            self.direct = self._direct[idx] = self.version
+            self._values[idx] = value
+            self._stamps[idx] = self.version
+
+    def __delitem__(self, key):
+        idx = self._slots.get(key)
+        if idx is None or self._values[idx] is MISSING:
+            raise KeyError(key)
+        self._count -= 1
+        self.version += 1
+        self.direct = self._direct[idx] = self.version
+        self._values[idx] = MISSING
+        self._stamps[idx] = self.version
+
+    def __contains__(self, key):
+        idx = self._slots.get(key)
+        return idx is not None and self._values[idx] is not MISSING
+
+    def __iter__(self):
+        values = self._values
+        return (key for idx, key in enumerate(self._keys) if values[idx] is not MISSING)
+
+    def __len__(self):
+        return self._count
+
+    def update(self, other=(), **kwargs):
+        setitem = self.__setitem__
+        for key, value in other.items() if hasattr(other, "items") else other:
+            setitem(key, value)
+        for key, value in kwargs.items():
+            setitem(key, value)
+
+    def __repr__(self):
+        return f"DataStore({dict(self.items())!r})"
+
+
+class DataSnapshot(Mapping):
+    """Values of a DataStore at one moment; shares the slot table, which only grows."""
+
+    __slots__ = ("_slots", "_values", "_count")
+
+    def __init__(self, slots, values, count):
+        self._slots = slots
+        self._values = values
+        self._count = count
+
+    def __getitem__(self, key):
+        idx = self._slots.get(key)
+        if idx is not None and idx < len(self._values):
+            value = self._values[idx]
+            if value is not MISSING:
+                return value
+        raise KeyError(key)
+
+    def __iter__(self):
+        values = self._values
+        return (key for key, idx in list(self._slots.items()) if idx < len(values) and values[idx] is not MISSING)
+
+    def __len__(self):
+        return self._count
+
+
+class ReadBuffer(MutableMapping):
+    """The values of one group read, by slot of the store, until DataStore.commit.
+
+    As a mapping it holds the keys written in this read only: readFollowUp, the computed sensors and
+    the data listeners get it as the data of the read. The decode of a block writes the lists itself,
+    like __setitem__ without the key lookup: a slot still MISSING goes into written, then values[slot].
+    """
+
+    __slots__ = ("_store", "values", "written")
+
+    def __init__(self, store):
+        self._store = store
+        self.values = []  # slot -> value of this read, MISSING for the slots not written
+        self.written = []  # slots written in this read, each once
+
+    def start(self):
+        """Empty the buffer for the next read: only the slots of the previous read are reset."""
+        values = self.values
+        for idx in self.written:
+            values[idx] = MISSING
+        self.written.clear()
+        self.grow()
+
+    def grow(self):
+        """Room for the slots interned since the buffer was made."""
+        missing = len(self._store._keys) - len(self.values)
+        if missing > 0:
+            self.values.extend([MISSING] * missing)
+
+    def __getitem__(self, key):
+        idx = self._store._slots.get(key)
+        if idx is not None and idx < len(self.values):
+            value = self.values[idx]
+            if value is not MISSING:
+                return value
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        idx = self._store.slot(key)
+        values = self.values
+        if idx >= len(values):  # a key new to the store
+            self.grow()
+        if values[idx] is MISSING:
+            self.written.append(idx)
+        values[idx] = value
+
+    def __delitem__(self, key):
+        raise TypeError("values of a read cannot be removed")
+
+    def __contains__(self, key):
+        idx = self._store._slots.get(key)
+        return idx is not None and idx < len(self.values) and self.values[idx] is not MISSING
+
+    def __iter__(self):
+        keys = self._store._keys
+        return (keys[idx] for idx in self.written)
+
+    def __len__(self):
+        return len(self.written)
+
+    def __repr__(self):
+        return f"ReadBuffer({dict(self.items())!r})"
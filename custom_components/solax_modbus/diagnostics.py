@@ -0,0 +1,38 @@
+"""Diagnostics support for the SolaX Modbus Integration."""
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST, CONF_NAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_HOST}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    hub = hass.data[DOMAIN][entry.options[CONF_NAME]]["hub"]
+    return {
+        "options": async_redact_data(dict(entry.options), TO_REDACT),
+        "plugin": hub.plugin.plugin_name,
+        "invertertype": hub.invertertype,
+        "scan_groups": {
+            interval: list(interval_group.device_groups.keys())
+            for interval, interval_group in hub.groups.items()
+        },
+        "statistics": hub.stats.as_dict(),
+        "proxy": {
+            "cached_reads": hub.proxyContext.cached,
+            "forwarded_reads": hub.proxyContext.forwarded,
+        }
+        if hub.proxyContext is not None
+        else None,
+        "tcp_pool": hub.pool.as_dict() if hub.pool is not None else None,
+        "archive": hub.archive.as_dict() if hub.archive is not None else None,
+        "battery_discovery": hub.batteryDiscovery,
+    }
@@ -0,0 +1,136 @@
+"""Modbus TCP server answering other modbus clients from the registers a hub has read.
+
+Reads are answered from the latest raw registers of the polling cycles when they are recent enough;
+other reads are passed to the inverter through the hub after the running polling cycle, and writes
+(when enabled; the proxy has no authentication) under the same lock as the hub's own requests, so
+the inverter only sees one master.
+"""
+
+import logging
+from time import time
+
+from pymodbus.datastore import ModbusServerContext
+from pymodbus.datastore.context import ModbusBaseSlaveContext
+from pymodbus.server import ModbusTcpServer
+
+_LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_MAX_BLOCKS = 256  # forwarded reads are kept too; drop the oldest beyond this
+
+FC_TYPES = {3: "holding", 4: "input", 6: "holding", 16: "holding"}
+FC_WRITES = (6, 16)
+
+
+def parse_ranges(text, hub_name=""):
+    """Per range staleness limits "0x0-0xff=5, 0x400-0x4ff=60" as [(start, end, max_age)]."""
+    ranges = []
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            span, max_age = part.split("=")
+            start, end = span.split("-")
+            ranges.append((int(start, 0), int(end, 0), float(max_age)))
+        except ValueError:
+            _LOGGER.warning(f"{hub_name}: ignoring invalid proxy staleness range '{part}'")
+    return ranges
+
+
+class RegisterSnapshot:
+    """Latest raw registers read by a hub, kept as the blocks that were read."""
+
+    def __init__(self):
+        self.blocks = {"holding": {}, "input": {}}  # (start, end) -> (timestamp, registers)
+
+    def store(self, typ, start, registers):
+        blocks = self.blocks[typ]
+        blocks[(start, start + len(registers))] = (time(), list(registers))
+        if len(blocks) > SNAPSHOT_MAX_BLOCKS:
+            del blocks[min(blocks, key=lambda key: blocks[key][0])]
+
+    def invalidate(self, typ, address, count):
+        blocks = self.blocks[typ]
+        for start, end in [key for key in blocks if key[0] < address + count and key[1] > address]:
+            del blocks[(start, end)]
+
+    def lookup(self, typ, address, count, max_age):
+        """The registers address..address+count-1 when all were read less than max_age seconds ago, else None."""
+        result = [None] * count
+        missing = count
+        oldest = time() - max_age
+        for (start, end), (timestamp, registers) in self.blocks[typ].items():
+            if timestamp < oldest or start >= address + count or end <= address:
+                continue
+            for reg in range(max(start, address), min(end, address + count)):
+                if result[reg - address] is None:
+                    missing -= 1
+                result[reg - address] = registers[reg - start]
+            if not missing:
+                return result
+        return None
+
+
+class ProxyContext(ModbusBaseSlaveContext):
+    """Server context of the proxy: every unit id maps to the hub."""
+
+    def __init__(self, hub, max_age, ranges, writes=False):
+        self.hub = hub
+        self.max_age = max_age
+        self.ranges = ranges
+        self.writes = writes  # pass writes to the inverter, else pymodbus answers them with IllegalAddress
+        self.cached = 0
+        self.forwarded = 0
+
+    def _max_age(self, address, count):
+        ages = [age for start, end, age in self.ranges if start < address + count and end >= address]
+        return min(ages) if ages else self.max_age
+
+    def validate(self, fc_as_hex, address, count=1):
+        return fc_as_hex in FC_TYPES and (self.writes or fc_as_hex not in FC_WRITES)
+
+    def getValues(self, fc_as_hex, address, count=1):
+        """Synchronous callers get the snapshot only; pymodbus answers the IOError with SlaveFailure."""
+        registers = self.hub.registerSnapshot.lookup(FC_TYPES[fc_as_hex], address, count, self._max_age(address, count))
+        if registers is None:
+            raise IOError(f"registers 0x{address:x}..0x{address + count - 1:x} not in the snapshot")
+        self.cached += 1
+        return registers
+
+    def setValues(self, fc_as_hex, address, values):
+        """A write cannot reach the inverter synchronously; pymodbus answers the IOError with SlaveFailure."""
+        raise IOError(f"write of registers 0x{address:x} needs the asynchronous server")
+
+    async def async_getValues(self, fc_as_hex, address, count=1):
+        typ = FC_TYPES[fc_as_hex]
+        registers = self.hub.registerSnapshot.lookup(typ, address, count, self._max_age(address, count))
+        if registers is not None:
+            self.cached += 1
+            return registers
+        self.forwarded += 1
+        resp = await self.hub.async_read_registers_queued(typ, address, count)
+        if resp.isError():
+            raise IOError(f"forwarded read of {typ} registers 0x{address:x} failed: {resp}")
+        self.hub.registerSnapshot.store(typ, address, resp.registers)
+        return resp.registers[:count]
+
+    async def async_setValues(self, fc_as_hex, address, values):
+        resp = await self.hub.async_write_raw_registers(self.hub._modbus_addr, address, values)
+        if resp is None or resp.isError():
+            raise IOError(f"forwarded write of registers 0x{address:x} failed: {resp}")
+        self.hub.registerSnapshot.invalidate("holding", address, len(values))
+
+
+async def async_run_proxy(hub, host, port, max_age, ranges, writes=False):
+    """Serve the proxy on host:port until cancelled."""
+    context = ProxyContext(hub, max_age, ranges, writes)
+    server = ModbusTcpServer(ModbusServerContext(slaves=context, single=True), address=(host, port))
+    hub.proxyContext = context
+    _LOGGER.info(
+        f"{hub.name}: modbus proxy listening on {host}:{port}, writes {'enabled' if writes else 'disabled'}"
+    )
+    try:
+        await server.serve_forever()
+    finally:
+        await server.shutdown()
+        hub.proxyContext = None
@@ -0,0 +1,257 @@
+"""Record the modbus traffic of a hub to a compact binary log, and replay it without an inverter.
+
+Log format: the MAGIC header, followed by one record per request:
+    RECORD header: time since start of recording (s), request latency (s), function code,
+    status, unit id, address, register count, number of registers that follow
+    the registers (unsigned 16 bit): the response for reads, the payload for writes; for read/write
+    (FC23) the write address, the number of written registers, the written registers, then the response
+    (address and count are those of the read)
+All values are little endian.
+"""
+
+import asyncio
+import logging
+import struct
+from time import perf_counter
+from types import SimpleNamespace
+
+from pymodbus.exceptions import ModbusIOException
+from pymodbus.pdu import ExceptionResponse
+from pymodbus.register_read_message import (
+    ReadHoldingRegistersResponse,
+    ReadInputRegistersResponse,
+    ReadWriteMultipleRegistersResponse,
+)
+from pymodbus.register_write_message import (
+    WriteMultipleRegistersResponse,
+    WriteSingleRegisterResponse,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"SXMODREC\x01"
+RECORD = struct.Struct("<dfBBBHHH")
+FLUSH_SIZE = 64 * 1024  # bytes buffered before they are appended to the log
+
+FC_READ_HOLDING = 3
+FC_READ_INPUT = 4
+FC_WRITE_SINGLE = 6
+FC_WRITE_MULTIPLE = 16
+FC_READ_WRITE = 23
+
+STATUS_OK = 0
+STATUS_ERROR = 1  # modbus exception response
+STATUS_EXCEPTION = 2  # no response, the client raised
+
+
+def encode_record(offset, latency, function, status, unit, address, count, registers):
+    return RECORD.pack(
+        offset, latency, function, status, unit, address, count, len(registers)
+    ) + struct.pack(f"<{len(registers)}H", *registers)
+
+
+def split_readwrite(registers):
+    """(write address, written registers, response) of the registers of a FC23 record."""
+    count = registers[1]
+    return registers[0], registers[2 : 2 + count], registers[2 + count :]
+
+
+def read_log(path):
+    """Return all records of a log as SimpleNamespaces; blocking."""
+    with open(path, "rb") as fp:
+        content = fp.read()
+    if not content.startswith(MAGIC):
+        raise ValueError(f"{path} is not a modbus recording")
+    records = []
+    pos = len(MAGIC)
+    while pos + RECORD.size <= len(content):
+        offset, latency, function, status, unit, address, count, n = RECORD.unpack_from(content, pos)
+        pos += RECORD.size
+        registers = list(struct.unpack_from(f"<{n}H", content, pos))
+        pos += 2 * n
+        records.append(
+            SimpleNamespace(
+                offset=offset, latency=latency, function=function, status=status,
+                unit=unit, address=address, count=count, registers=registers,
+            )
+        )
+    return records
+
+
+def append_log(path, data, create=False):
+    """Append encoded records to a log, writing the header first when create is set; blocking."""
+    with open(path, "wb" if create else "ab") as fp:
+        if create:
+            fp.write(MAGIC)
+        fp.write(data)
+
+
+class RecordingClient:
+    """Wraps a pymodbus client and records every request and response passing through it.
+
+    Records are buffered and appended to the log in the executor; call async_close to write the rest.
+    """
+
+    def __init__(self, hass, client, path):
+        self._hass = hass
+        self._client = client
+        self.path = path
+        self.records = 0
+        self._start = perf_counter()
+        self._buffer = bytearray()
+        self.dropped = 0  # chunks that could not be written
+        self._writing = asyncio.Lock()
+        self._flushes = set()
+        self._created = False
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    async def _request(self, function, unit, address, count, request, payload=(), written=()):
+        """written: recorded before the registers, also for failed requests (the write of FC23)."""
+        start = perf_counter()
+        try:
+            resp = await request
+        except Exception:
+            self._add(start, function, STATUS_EXCEPTION, unit, address, count, [*written, *payload])
+            raise
+        if resp.isError():
+            self._add(start, function, STATUS_ERROR, unit, address, count, [*written, *payload])
+        else:
+            registers = getattr(resp, "registers", None) or payload
+            self._add(start, function, STATUS_OK, unit, address, count, [*written, *registers])
+        return resp
+
+    def _add(self, start, function, status, unit, address, count, registers):
+        self._buffer += encode_record(
+            start - self._start, perf_counter() - start, function, status, unit or 0, address, count, registers
+        )
+        self.records += 1
+        if len(self._buffer) >= FLUSH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        data, self._buffer = bytes(self._buffer), bytearray()
+        task = self._hass.async_create_task(self._async_write(data))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _async_write(self, data):
+        async with self._writing:  # keep the chunks in order
+            try:
+                await self._hass.async_add_executor_job(append_log, self.path, data, not self._created)
+            except Exception:
+                self.dropped += 1
+                _LOGGER.exception("dropped %d bytes of modbus recording, cannot write %s", len(data), self.path)
+            else:
+                self._created = True
+
+    async def async_close(self):
+        """Write all buffered records; returns the wrapped client."""
+        self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes)
+        return self._client
+
+    def read_holding_registers(self, address, count=1, slave=0, **kwargs):
+        return self._request(FC_READ_HOLDING, slave, address, count,
+                             self._client.read_holding_registers(address, count, slave=slave, **kwargs))
+
+    def read_input_registers(self, address, count=1, slave=0, **kwargs):
+        return self._request(FC_READ_INPUT, slave, address, count,
+                             self._client.read_input_registers(address, count, slave=slave, **kwargs))
+
+    def write_register(self, address, value, slave=0, **kwargs):
+        return self._request(FC_WRITE_SINGLE, slave, address, 1,
+                             self._client.write_register(address, value, slave=slave, **kwargs), [value])
+
+    def write_registers(self, address, values, slave=0, **kwargs):
+        return self._request(FC_WRITE_MULTIPLE, slave, address, len(values),
+                             self._client.write_registers(address, values, slave=slave, **kwargs), values)
+
+    def readwrite_registers(self, read_address=0, read_count=0, write_address=0, values=0, slave=0, **kwargs):
+        values = [values] if isinstance(values, int) else list(values)
+        return self._request(
+            FC_READ_WRITE, slave, read_address, read_count,
+            self._client.readwrite_registers(
+                read_address=read_address, read_count=read_count, write_address=write_address,
+                values=values, slave=slave, **kwargs,
+            ),
+            written=[write_address, len(values), *values],
+        )
+
+
+class ReplayClient:
+    """Stands in for AsyncModbusTcpClient and answers requests from a recording.
+
+    Responses are looked up by function, unit, address and count, and for read/write also by the
+    written address and registers; when a request was recorded several times, the recorded
+    responses are served in turn. Each response is delayed by its
+    recorded latency multiplied by speed (0: no delay). Unknown requests fail like a timeout.
+    """
+
+    def __init__(self, records, speed=1.0, name="replay"):
+        self.speed = speed
+        self.connected = False
+        self.comm_params = SimpleNamespace(host=name, port=0)
+        self._responses = {}
+        self._served = {}
+        for record in records:
+            key = (record.function, record.unit, record.address, record.count)
+            if record.function == FC_READ_WRITE:
+                write_address, written, _ = split_readwrite(record.registers)
+                key += (write_address, tuple(written))
+            self._responses.setdefault(key, []).append(record)
+
+    @classmethod
+    def from_file(cls, path, speed=1.0):
+        return cls(read_log(path), speed, f"replay:{path}")
+
+    async def connect(self):
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    async def _serve(self, function, unit, address, count, *written):
+        key = (function, unit or 0, address, count, *written)
+        recorded = self._responses.get(key)
+        if not recorded:
+            raise ModbusIOException(f"no recorded response for {key}")
+        idx = self._served.get(key, 0)
+        self._served[key] = idx + 1
+        record = recorded[idx % len(recorded)]
+        if self.speed:
+            await asyncio.sleep(record.latency * self.speed)
+        if record.status == STATUS_EXCEPTION:
+            raise ModbusIOException(f"recorded request failure for {key}")
+        if record.status == STATUS_ERROR:
+            return ExceptionResponse(function, 2)
+        return record
+
+    async def read_holding_registers(self, address, count=1, slave=0, **kwargs):
+        record = await self._serve(FC_READ_HOLDING, slave, address, count)
+        if isinstance(record, ExceptionResponse):
+            return record
+        return ReadHoldingRegistersResponse(record.registers, slave=slave)
+
+    async def read_input_registers(self, address, count=1, slave=0, **kwargs):
+        record = await self._serve(FC_READ_INPUT, slave, address, count)
+        if isinstance(record, ExceptionResponse):
+            return record
+        return ReadInputRegistersResponse(record.registers, slave=slave)
+
+    async def write_register(self, address, value, slave=0, **kwargs):
+        # writes are acknowledged, even when this exact write was not recorded
+        return WriteSingleRegisterResponse(address, value, slave=slave)
+
+    async def write_registers(self, address, values, slave=0, **kwargs):
+        return WriteMultipleRegistersResponse(address, len(values), slave=slave)
+
+    async def readwrite_registers(self, read_address=0, read_count=0, write_address=0, values=0, slave=0, **kwargs):
+        values = (values,) if isinstance(values, int) else tuple(values)
+        record = await self._serve(FC_READ_WRITE, slave, read_address, read_count, write_address, values)
+        if isinstance(record, ExceptionResponse):
+            return record
+        return ReadWriteMultipleRegistersResponse(split_readwrite(record.registers)[2], slave=slave)
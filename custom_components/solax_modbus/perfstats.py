@@ -0,0 +1,202 @@
+"""Performance statistics of a SolaX Modbus hub, for the diagnostics download and the optional statistics sensors."""
+
+from types import SimpleNamespace
+
+# upper bounds of the latency histogram buckets, in seconds; the last bucket counts everything above
+LATENCY_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, plus count, sum and maximum."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        idx = 0
+        while idx < len(LATENCY_BUCKETS) and value > LATENCY_BUCKETS[idx]:
+            idx += 1
+        self.buckets[idx] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for idx, count in enumerate(other.buckets):
+            self.buckets[idx] += count
+        self.count += other.count
+        self.total += other.total
+        if other.max > self.max:
+            self.max = other.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self):
+        labels = [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 4),
+            "max": round(self.max, 4),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class HubStats:
+    """Counters and timings collected by the hub while polling."""
+
+    def __init__(self):
+        self.cycles = {}  # scan interval -> cycle statistics
+        self.blocks = {}  # "holding 0x1234" -> request latency histogram
+        self.requests = 0
+        self.registers = 0
+        self.bytes = 0  # register payload bytes, without modbus framing
+        self.errors = 0  # error responses from the device
+        self.exceptions = 0  # requests that raised, including timeouts
+        self.timeouts = 0
+        self.failed_cycles = 0  # cycles in which a block could not be read
+        self.lock_wait = Histogram()
+        self.decode_time = 0.0
+        self.notified = 0  # entity state notifications
+        self.autorepeat_writes = 0
+        self.autorepeat_misses = 0  # repeats later than the device's timeout
+        self.autorepeat_jitter = Histogram()  # deviation of the time between repeats from the period
+        self.control_latency = Histogram()  # power control: measurement decoded -> set point written
+        self.control_writes = 0
+        self.control_write_errors = 0
+        self.control_saturated = 0  # set points at an output limit
+        self.control_error = 0.0  # last control error, W
+        self.control_abs_error = 0.0  # sum of the absolute control errors, W
+        self.serial_requests = 0  # requests through the serial port thread, see serialthread.py
+        self.serial_frame_errors = 0  # failed attempts: no response, or none with a valid crc
+        self.serial_queue_wait = Histogram()  # request queued -> taken by the port thread
+        self.serial_loop_delay = Histogram()  # response complete -> handed to the waiting coroutine
+
+    def cycle(self, interval):
+        return self.cycles.setdefault(
+            interval, SimpleNamespace(count=0, last=0.0, max=0.0, total=0.0, notified=0)
+        )
+
+    def add_cycle(self, interval, duration, notified):
+        cycle = self.cycle(interval)
+        cycle.count += 1
+        cycle.last = duration
+        cycle.total += duration
+        cycle.notified = notified
+        if duration > cycle.max:
+            cycle.max = duration
+        self.notified += notified
+
+    def add_control(self, latency, error, saturated):
+        self.control_latency.add(latency)
+        self.control_writes += 1
+        self.control_error = error
+        self.control_abs_error += abs(error)
+        if saturated:
+            self.control_saturated += 1
+
+    def add_serial(self, queue_wait, loop_delay, frame_errors):
+        self.serial_requests += 1
+        self.serial_frame_errors += frame_errors
+        self.serial_queue_wait.add(queue_wait)
+        self.serial_loop_delay.add(loop_delay)
+
+    def add_block(self, typ, start, count, duration, ok):
+        self.requests += 1
+        self.blocks.setdefault(f"{typ} 0x{start:x}", Histogram()).add(duration)
+        if ok:
+            self.registers += count
+            self.bytes += 2 * count
+
+    # collected where the modbus requests are made; the polling worker sends them to the hub with every read
+    READ_COUNTERS = ("requests", "registers", "bytes", "errors", "exceptions", "timeouts", "decode_time", "serial_requests", "serial_frame_errors")
+    READ_HISTOGRAMS = ("lock_wait", "serial_queue_wait", "serial_loop_delay")
+
+    def take(self):
+        """The statistics collected so far, as a new HubStats; this one starts over, in place (the serial thread keeps it)."""
+        taken = HubStats()
+        taken.__dict__.update(self.__dict__)
+        self.__init__()
+        return taken
+
+    def merge(self, other):
+        """Add the request statistics of other, as taken in the polling worker."""
+        for name in self.READ_COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in self.READ_HISTOGRAMS:
+            getattr(self, name).merge(getattr(other, name))
+        for key, hist in other.blocks.items():
+            self.blocks.setdefault(key, Histogram()).merge(hist)
+
+    def as_dict(self):
+        return {
+            "cycles": {
+                interval: {
+                    "count": cycle.count,
+                    "last": round(cycle.last, 4),
+                    "mean": round(cycle.total / cycle.count, 4) if cycle.count else 0,
+                    "max": round(cycle.max, 4),
+                    "entities_notified": cycle.notified,
+                }
+                for interval, cycle in self.cycles.items()
+            },
+            "blocks": {key: hist.as_dict() for key, hist in self.blocks.items()},
+            "requests": self.requests,
+            "registers": self.registers,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "exceptions": self.exceptions,
+            "timeouts": self.timeouts,
+            "failed_cycles": self.failed_cycles,
+            "lock_wait": self.lock_wait.as_dict(),
+            "decode_time": round(self.decode_time, 4),
+            "entities_notified": self.notified,
+            "autorepeat_writes": self.autorepeat_writes,
+            "autorepeat_misses": self.autorepeat_misses,
+            "autorepeat_jitter": self.autorepeat_jitter.as_dict(),
+            "power_control": {
+                "writes": self.control_writes,
+                "write_errors": self.control_write_errors,
+                "saturated": self.control_saturated,
+                "last_error": round(self.control_error, 1),
+                "mean_abs_error": round(self.control_abs_error / self.control_writes, 1) if self.control_writes else 0,
+                "latency": self.control_latency.as_dict(),
+            },
+            "serial_thread": {
+                "requests": self.serial_requests,
+                "frame_errors": self.serial_frame_errors,
+                "frame_errors_per_request": round(self.serial_frame_errors / self.serial_requests, 4)
+                if self.serial_requests
+                else 0,
+                "queue_wait": self.serial_queue_wait.as_dict(),
+                "loop_delay": self.serial_loop_delay.as_dict(),
+            },
+        }
+
+
+# statistics exposed as diagnostic sensors: (key, name, unit, value function)
+STATS_SENSORS = (
+    ("stats_requests", "Modbus Requests", None, lambda stats: stats.requests),
+    ("stats_registers", "Modbus Registers Read", None, lambda stats: stats.registers),
+    ("stats_bytes", "Modbus Bytes Read", "B", lambda stats: stats.bytes),
+    ("stats_errors", "Modbus Errors", None, lambda stats: stats.errors),
+    ("stats_exceptions", "Modbus Exceptions", None, lambda stats: stats.exceptions),
+    ("stats_timeouts", "Modbus Timeouts", None, lambda stats: stats.timeouts),
+    ("stats_failed_cycles", "Failed Polling Cycles", None, lambda stats: stats.failed_cycles),
+    ("stats_lock_wait", "Mean Lock Wait", "ms", lambda stats: round(stats.lock_wait.mean * 1000, 1)),
+    ("stats_decode_time", "Decode Time", "s", lambda stats: round(stats.decode_time, 3)),
+    ("stats_notified", "Entities Notified", None, lambda stats: stats.notified),
+    ("stats_autorepeat_jitter", "Autorepeat Jitter", "ms", lambda stats: round(stats.autorepeat_jitter.max * 1000, 1)),
+    ("stats_autorepeat_misses", "Autorepeat Deadline Misses", None, lambda stats: stats.autorepeat_misses),
+    ("stats_serial_frame_errors", "Serial Frame Errors", None, lambda stats: stats.serial_frame_errors),
+    ("stats_serial_loop_delay", "Mean Serial Loop Delay", "ms", lambda stats: round(stats.serial_loop_delay.mean * 1000, 1)),
+    ("stats_control_latency", "Power Control Latency", "ms", lambda stats: round(stats.control_latency.mean * 1000, 1)),
+    ("stats_control_error", "Power Control Error", "W", lambda stats: round(stats.control_error)),
+)
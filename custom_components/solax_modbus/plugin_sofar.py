@@ -1,5 +1,6 @@
 import logging
 import asyncio
+from time import time
 from dataclasses import dataclass
 from homeassistant.components.number import NumberEntityDescription
 from homeassistant.components.select import SelectEntityDescription
@@ -3813,9 +3814,17 @@ class battery_config(base_battery_config):
     def __init__(
         self
     ):
+        super().__init__()
         self.battery_sensor_type = BATTERY_SENSOR_TYPES
         self.battery_sensor_name_prefix = "Battery {batt-nr}/{pack-nr} "
         self.battery_sensor_key_prefix = "battery_{batt-nr}_{pack-nr}_"
+        # selection state, per hub (see base_battery_config.for_hub)
+        self.number_cels_in_parallel: int = None # number of battery pack cells in parallel
+        self.number_strings: int = None # number of strings of all battery packs
+        self.batt_pack_serials = {}
+        self.selected_batt_nr: int = None
+        self.selected_batt_pack_nr: int = None
+        self.confirmed_selection: int = None # payload of a selection select_battery saw confirmed
 
     bapack_number_address = 0x900d
     bms_inquire_address = 0x9020
@@ -3824,12 +3833,9 @@ class battery_config(base_battery_config):
     batt_pack_serial_len = 9
     batt_pack_model_address = 0x9007
     batt_pack_model_len = 4
-
-    number_cels_in_parallel: int = None # number of battery pack cells in parallel
-    number_strings: int = None # number of strings of all battery packs
-    batt_pack_serials = {}
-    selected_batt_nr: int = None
-    selected_batt_pack_nr: int = None
+    select_timeout = 3.0 # seconds to wait for the bms to confirm a pack selection
+    select_poll_delay = 0.05 # first delay between two reads of bms_check_address, grows up to select_poll_delay_max
+    select_poll_delay_max = 0.5
 
     async def init_batt_pack(self, hub, serial_number):
         if not self.batt_pack_serials.__contains__(self.selected_batt_nr):
@@ -3850,11 +3856,35 @@ class battery_config(base_battery_config):
         faulty_nr = 0
         payload = faulty_nr << 12 | batt_pack_nr << 8 | batt_nr
         _LOGGER.debug(f"select batt-nr: {batt_nr} batt-pack: {batt_pack_nr} {hex(payload)}")
-        await hub.async_write_registers_single(unit=hub._modbus_addr, address=self.bms_inquire_address, payload=payload)
-        await asyncio.sleep(0.3)
+        # write the selection and read bms_check_address in one round trip where the inverter has FC23
+        inverter_data = await hub.async_write_read_registers(unit=hub._modbus_addr, write_address=self.bms_inquire_address, payload=payload,
+                                                             read_address=self.bms_check_address, read_count=1)
         self.selected_batt_nr = batt_nr
         self.selected_batt_pack_nr = batt_pack_nr
-        return True
+        if not inverter_data.isError() and inverter_data.registers[0] == payload:
+            confirmed = True # already confirmed by the bms
+        else:
+            confirmed = await self._wait_for_selection(hub, payload)
+        self.confirmed_selection = payload if confirmed else None
+        return confirmed
+
+    async def _wait_for_selection(self, hub, payload):
+        # poll bms_check_address at short, growing intervals until the bms confirms the selected pack
+        deadline = time() + self.select_timeout
+        delay = self.select_poll_delay
+        while True:
+            inverter_data = await hub.async_read_holding_registers(unit=hub._modbus_addr, address=self.bms_check_address, count=1)
+            if inverter_data.isError():
+                _LOGGER.error(f"can't read batt check register")
+                return False
+            decoder = BinaryPayloadDecoder.fromRegisters(inverter_data.registers, byteorder=Endian.BIG)
+            if decoder.decode_16bit_uint() == payload:
+                return True
+            if time() + delay > deadline:
+                _LOGGER.debug(f"batt pack selection {hex(payload)} not confirmed within {self.select_timeout}s")
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, self.select_poll_delay_max)
 
     async def get_batt_pack_serial(self, hub, batt_nr: int, batt_pack_nr: int):
         if not self.batt_pack_serials.__contains__(batt_nr):
@@ -3890,20 +3920,10 @@ class battery_config(base_battery_config):
 
         faulty_nr = 0
         payload = faulty_nr << 12 | batt_pack_nr << 8 | batt_nr
-        for retry in range(0,10):
-            inverter_data = await hub.async_read_holding_registers(unit=hub._modbus_addr, address=self.bms_check_address, count=1)
-            if not inverter_data.isError():
-                decoder = BinaryPayloadDecoder.fromRegisters(inverter_data.registers, byteorder=Endian.BIG)
-                readed = decoder.decode_16bit_uint()
-                ok = readed == payload
-                if not ok:
-                    await asyncio.sleep(0.3)
-                else:
-                    return True
-
-            else:
-                _LOGGER.error(f"can't read batt check register")
-                return False
+        confirmed, self.confirmed_selection = self.confirmed_selection, None
+        if confirmed == payload: # select_battery just saw it, no need to read bms_check_address again
+            return True
+        return await self._wait_for_selection(hub, payload)
 
     async def check_battery_on_end(self, hub, old_data, new_data, key_prefix, batt_nr: int, batt_pack_nr: int):
         # inverter_data = await hub.async_read_holding_registers(unit=hub._modbus_addr, address=0x9045, count=2)
@@ -4087,5 +4107,12 @@ plugin_instance = sofar_plugin(
     block_size = 100,
     order16 = Endian.BIG,
     order32 = Endian.BIG,
-    auto_block_ignore_readerror = True
+    auto_block_ignore_readerror = True,
+    POWER_CONTROL = power_control_config(
+        measurement = "active_power_pcc_total",
+        measurement_scale = 1000, # kW
+        button = "passive_mode_battery_charge_discharge",
+        setpoints = ("passive_mode_battery_power_min", "passive_mode_battery_power_max"), # positive is charge
+        battery_power = "battery_power_total",
+    ),
     )
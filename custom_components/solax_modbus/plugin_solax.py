@@ -251,7 +251,8 @@ BUTTON_TYPES = [
         write_method = WRITE_MULTI_MODBUS,
         icon = "mdi:battery-clock",
         value_function = value_function_remotecontrol_recompute,
-        autorepeat= "remotecontrol_autorepeat_duration"
+        autorepeat= "remotecontrol_autorepeat_duration",
+        autorepeat_timeout = "remotecontrol_duration",
     ),
     SolaxModbusButtonEntityDescription(
         name = "System On",
@@ -7827,5 +7828,13 @@ plugin_instance = solax_plugin(
     block_size = 100,
     order16 = Endian.BIG,
     order32 = Endian.LITTLE,
-    auto_block_ignore_readerror = True
+    auto_block_ignore_readerror = True,
+    POWER_CONTROL = power_control_config(
+        measurement = "measured_power",
+        button = "remotecontrol_trigger",
+        setpoints = ("remotecontrol_active_power",), # battery side: positive is charge
+        limit_keys = ("active_power_lower", "active_power_upper"),
+        battery_power = "battery_power_charge",
+        activate = {"remotecontrol_power_control": "Enabled Power Control", "remotecontrol_set_type": "Set"},
+    ),
     )
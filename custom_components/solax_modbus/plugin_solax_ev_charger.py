@@ -820,4 +820,15 @@ plugin_instance = solax_ev_charger_plugin(
     block_size = 100,
     order16 = Endian.BIG,
     order32 = Endian.LITTLE,
+    SURPLUS_CONTROL = surplus_control_config(
+        current_register = 0x628, # charge_current
+        current_scale = 0.01,
+        command_register = 0x627, # control_command
+        start_command = 4,
+        stop_command = 3,
+        power_key = "charge_power_total",
+        three_phase_mask = X3,
+        phase_key = "charge_phase",
+        three_phase_value = "Three Phase",
+    ),
     )
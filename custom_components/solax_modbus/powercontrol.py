@@ -0,0 +1,125 @@
+"""Closed loop grid power control inside the hub.
+
+Zero export or any other grid power target, without the detour poll -> HA state -> automation -> number
+entity -> modbus write. After every read that decoded the measured grid power, a PI controller computes
+a new set point and, when the rounded set point changed, writes the payload of the plugin's own button
+(e.g. the solax remote control trigger) through the priority lane of the modbus lock. The payload is
+built from the set point and the activation values laid over hub.data, so the select and number
+entities keep the values the user chose. An unchanged set point is written again only before the
+timeout of the button's mode (its autorepeat_timeout) runs out.
+The plugin declares what to measure and what to write in a power_control_config.
+"""
+
+import logging
+from collections import ChainMap
+from time import perf_counter, time
+
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import (
+    AUTOREPEAT_MARGIN,
+    CONF_POWER_CONTROL_KI,
+    CONF_POWER_CONTROL_KP,
+    CONF_POWER_CONTROL_RATE,
+    CONF_POWER_CONTROL_TARGET,
+    DEFAULT_POWER_CONTROL_KI,
+    DEFAULT_POWER_CONTROL_KP,
+    DEFAULT_POWER_CONTROL_RATE,
+    DEFAULT_POWER_CONTROL_TARGET,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PIController:
+    """PI controller with output clamps, a rate limit and integrator tracking against windup."""
+
+    __slots__ = ("integral", "output", "last_time")
+
+    def __init__(self, initial=0.0):
+        self.integral = initial  # the output starts where the set point is
+        self.output = None
+        self.last_time = None
+
+    def update(self, error, now, kp, ki, out_min, out_max, rate=None):
+        dt = now - self.last_time if self.last_time is not None else 0.0
+        self.last_time = now
+        integral = self.integral + ki * error * dt
+        # when clamped, keep the integrator where it yields the clamp instead of winding up
+        integral = min(max(integral, out_min - kp * error), out_max - kp * error)
+        output = kp * error + integral
+        if rate and self.output is not None:  # at most rate per second away from the previous output
+            limited = min(max(output, self.output - rate * dt), self.output + rate * dt)
+            if limited != output:  # ramping: the integrator waits for the output
+                integral = self.integral
+                output = limited
+        self.integral = integral
+        self.output = output
+        return output
+
+
+class PowerController:
+    """Runs the PI controller of a hub on its data updates; register async_data_updated as data listener."""
+
+    def __init__(self, hub, control):
+        self.hub = hub
+        self.control = control  # power_control_config of the plugin
+        self.pi = None  # created on the first measurement, starting from the current set point
+        self.written = None  # set point of the last successful write; None: not active yet
+        self.written_at = 0.0
+
+    def _limits(self):
+        out_min, out_max = self.control.output_limits
+        if self.control.limit_keys:  # dynamic limits reported by the inverter
+            low, high = (self.hub.data.get(key) for key in self.control.limit_keys)
+            if isinstance(low, (int, float)) and isinstance(high, (int, float)) and low < high:
+                out_min, out_max = max(out_min, low), min(out_max, high)
+        return out_min, out_max
+
+    async def async_data_updated(self, hub, group, data):
+        control = self.control
+        measurement = data.get(control.measurement)
+        if not isinstance(measurement, (int, float)):  # not read in this group, or not valid
+            return
+        start = perf_counter()
+        config = hub.config
+        target = config.get(CONF_POWER_CONTROL_TARGET, DEFAULT_POWER_CONTROL_TARGET)
+        error = target - measurement * control.measurement_scale
+        if self.pi is None:
+            self.pi = PIController(hub.data.get(control.setpoints[0]) or 0)
+        out_min, out_max = self._limits()
+        now = time()
+        output = round(
+            self.pi.update(
+                error * control.output_sign,
+                now,
+                config.get(CONF_POWER_CONTROL_KP, DEFAULT_POWER_CONTROL_KP),
+                config.get(CONF_POWER_CONTROL_KI, DEFAULT_POWER_CONTROL_KI),
+                out_min,
+                out_max,
+                config.get(CONF_POWER_CONTROL_RATE, DEFAULT_POWER_CONTROL_RATE),
+            )
+        )
+        descr = hub.computedButtons.get(control.button)
+        if descr is None:
+            return  # button platform not set up yet
+        if output == self.written:
+            timeout = hub.data.get(descr.autorepeat_timeout) if descr.autorepeat_timeout else None
+            if not timeout or now - self.written_at < timeout - AUTOREPEAT_MARGIN:
+                return
+        values = dict(control.activate or {})
+        values.update((key, output) for key in control.setpoints)
+        payload = descr.value_function(0, descr, ChainMap(values, hub.data))
+        stats = hub.stats
+        try:
+            await hub.async_write_registers_multi(
+                unit=hub._modbus_addr, address=descr.register, payload=payload, priority=True
+            )
+        except HomeAssistantError as ex:
+            stats.control_write_errors += 1
+            _LOGGER.warning(f"{hub.name}: power control write failed: {ex}")
+            return
+        self.written = output
+        self.written_at = now
+        stats.add_control(perf_counter() - start, error, output in (out_min, out_max))
+        _LOGGER.debug(f"{hub.name}: power control error {error:.0f} W, set point {output} W")
@@ -0,0 +1,62 @@
+"""Modbus lock of a hub with a priority lane for time critical writes."""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class PriorityLock:
+    """asyncio lock where priority waiters get the lock before all normal waiters.
+
+    "async with lock:" waits in the normal lane, "async with lock.priority():" in the priority lane.
+    Within a lane, waiters are served in order.
+    """
+
+    def __init__(self):
+        self._locked = False
+        self._waiters = (deque(), deque())  # priority lane, normal lane
+
+    def locked(self):
+        return self._locked
+
+    async def acquire(self, priority=False):
+        if not self._locked and not any(self._waiters):
+            self._locked = True
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        lane = self._waiters[0 if priority else 1]
+        lane.append(waiter)
+        try:
+            await waiter  # the lock is handed over by release
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # handed over, but cancelled before we got to run
+            else:
+                lane.remove(waiter)
+            raise
+        return True
+
+    def release(self):
+        if not self._locked:
+            raise RuntimeError("Lock is not acquired.")
+        for lane in self._waiters:
+            while lane:
+                waiter = lane.popleft()
+                if not waiter.done():
+                    waiter.set_result(True)  # stays locked, ownership moves to the waiter
+                    return
+        self._locked = False
+
+    @asynccontextmanager
+    async def priority(self):
+        await self.acquire(priority=True)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
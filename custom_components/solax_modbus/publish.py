@@ -0,0 +1,112 @@
+"""Publication policies: how often, and with which value, a polled sensor writes its state.
+
+hub.data is always updated at the polling rate; a PublishWindow only decides when the entity state is
+written and which value it shows: the last, mean, minimum, maximum or time weighted mean (integral basis,
+preserves the energy of a power value) of the polled values over the window. A Deadband then drops
+writes that only differ by measurement noise from the last written value.
+"""
+
+from numbers import Number
+
+PUBLISH_LAST = "last"
+PUBLISH_MEAN = "mean"
+PUBLISH_MIN = "min"
+PUBLISH_MAX = "max"
+PUBLISH_TIME_WEIGHTED = "time_weighted"
+
+
+class PublishWindow:
+    """Aggregates the polled values of one sensor and tells when to write its state."""
+
+    __slots__ = ("policy", "interval", "value", "_start", "_count", "_acc", "_last", "_last_time")
+
+    def __init__(self, policy, interval):
+        self.policy = policy
+        self.interval = interval
+        self.value = None  # value shown by the entity, the aggregate of the last completed window
+        self._start = None  # start of the current window
+        self._count = 0
+        self._acc = None
+        self._last = None
+        self._last_time = None
+
+    def add(self, value, now):
+        """Add a polled value; returns True when the state must be written, with self.value to show."""
+        if value is None:  # e.g. cleared in sleep mode: publish right away, start over with the next value
+            changed = self.value is not None
+            self.value = None
+            self._start = None
+            return changed
+        if not isinstance(value, Number) or isinstance(value, bool):
+            # texts and enumerations are not aggregated, but published as soon as they change
+            changed = value != self.value
+            self.value = value
+            self._start = None  # a numeric value after a text starts a new window
+            return changed
+        if self._start is None:  # first value: publish right away, so the entity has a state
+            self.value = value
+            self._restart(value, now)
+            return True
+        if self.policy == PUBLISH_TIME_WEIGHTED:
+            self._acc += self._last * (now - self._last_time)
+        elif self.policy == PUBLISH_MEAN:
+            self._acc += value
+        elif self.policy == PUBLISH_MIN:
+            self._acc = min(self._acc, value)
+        elif self.policy == PUBLISH_MAX:
+            self._acc = max(self._acc, value)
+        self._count += 1
+        self._last = value
+        self._last_time = now
+        if now - self._start < self.interval:
+            return False
+        if self.policy == PUBLISH_TIME_WEIGHTED:
+            self.value = self._acc / (now - self._start) if now > self._start else value
+        elif self.policy == PUBLISH_MEAN:
+            self.value = self._acc / self._count
+        elif self.policy in (PUBLISH_MIN, PUBLISH_MAX):
+            self.value = self._acc
+        else:
+            self.value = value
+        self._restart(value, now)
+        return True
+
+    def _restart(self, value, now):
+        self._start = now
+        self._count = 0
+        self._acc = 0 if self.policy in (PUBLISH_TIME_WEIGHTED, PUBLISH_MEAN) else value
+        self._last = value
+        self._last_time = now
+
+
+class Deadband:
+    """Suppresses state writes of values that differ less than the deadband from the last written value.
+
+    The deadband is the larger of the absolute deadband and the relative deadband times the last written
+    value. Comparing with the last written value (not the previous poll) gives hysteresis: a slow drift
+    is published once it adds up to the deadband. After max_silence seconds a value is written anyway.
+    """
+
+    __slots__ = ("absolute", "relative", "max_silence", "_value", "_time")
+
+    def __init__(self, absolute=None, relative=None, max_silence=None):
+        self.absolute = absolute or 0
+        self.relative = relative or 0
+        self.max_silence = max_silence
+        self._value = None  # last written value
+        self._time = None
+
+    def passes(self, value, now):
+        """True when value must be written; remembers it as the last written value then."""
+        last = self._value
+        if (
+            isinstance(value, Number)
+            and isinstance(last, Number)
+            and not isinstance(value, bool)
+            and (self.max_silence is None or now - self._time < self.max_silence)
+            and abs(value - last) < max(self.absolute, self.relative * abs(last))
+        ):
+            return False
+        self._value = value
+        self._time = now
+        return True
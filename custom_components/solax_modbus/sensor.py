@@ -8,16 +8,24 @@ from types  import SimpleNamespace
 from dataclasses import dataclass, replace
 from copy import copy
 import homeassistant.util.dt as dt_util
+from time import time
 
 from .const import ATTR_MANUFACTURER, DOMAIN, SLEEPMODE_NONE, SLEEPMODE_ZERO
 from .const import INVERTER_IDENT, REG_INPUT, REG_HOLDING, REGISTER_U32, REGISTER_S32, REGISTER_ULSB16MSB16, REGISTER_STR, REGISTER_WORDS, REGISTER_U8H, REGISTER_U8L, CONF_READ_BATTERY
-from .const import BaseModbusSensorEntityDescription
-from homeassistant.components.sensor import SensorEntityDescription
+from .const import BaseModbusSensorEntityDescription, CONF_PERF_SENSORS, DEFAULT_PERF_SENSORS
+from .const import SCAN_GROUP_DEFAULT, SCAN_GROUP_MEDIUM, SCAN_GROUP_FAST
+from .perfstats import STATS_SENSORS
+from .publish import Deadband, PublishWindow, PUBLISH_LAST, PUBLISH_TIME_WEIGHTED
+from .datastore import MISSING
+from homeassistant.components.sensor import SensorEntityDescription, SensorDeviceClass, SensorStateClass
+from homeassistant.const import UnitOfTime
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.device_registry import DeviceInfo
 
 _LOGGER = logging.getLogger(__name__)
 
 INVALID_START = 99999
+DEVICE_INFO_REFRESH = 3600 # seconds after which unchanged device versions are written to the device registry again
 
 
 # =================================== sorting and grouping of entities ================================================
@@ -28,31 +36,73 @@ class block():
     end: int = None # end address of the block
     #order16: int = None # byte endian for 16bit registers
     #order32: int = None # word endian for 32bit registers
-    descriptions: Any = None
+    descriptions: Any = None # register -> RegisterDescriptor, or a dict of them for byte values
     regs: Any = None # sorted list of registers used in this block
-
-
-def splitInBlocks( descriptions, block_size, auto_block_ignore_readerror ):
+    ignore_readerror: Any = False # of the first entity, or the plugin's auto_block_ignore_readerror for automatic blocks
+    slots: Any = None # register -> slot in hub.data of the reading hub (dict of them for byte values), set on the first read
+
+
+class RegisterDescriptor():
+    """ the part of an entity description that decoding needs, with slots instead of the 20+ field dataclass
+        one per entity description and hub, shared by all block plans; read-only
+    """
+    __slots__ = ("key", "register", "unit", "wordcount", "scale", "rounding", "sleepmode", "ignore_readerror", "description")
+
+    def __init__(self, descr):
+        for name in self.__slots__[:-1]: object.__setattr__(self, name, getattr(descr, name))
+        object.__setattr__(self, "description", descr) # the entity description, passed to scale functions
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"RegisterDescriptor is read-only, cannot set {name}")
+
+    def __repr__(self):
+        return f"RegisterDescriptor({self.key} 0x{self.register:x})"
+
+def registerDescriptor(descriptors, descr):
+    """ the RegisterDescriptor of descr from descriptors (key -> RegisterDescriptor), built on first use
+        a value series or battery pack copy has its own key, so its own descriptor; scale, unit etc. are the
+        same objects as those of the plugin description it was copied from
+    """
+    runtime = descriptors.get(descr.key)
+    if runtime is None or runtime.description is not descr: # new, or the entity got a new description
+        runtime = descriptors[descr.key] = RegisterDescriptor(descr)
+    return runtime
+
+def runtimeDescriptions(descriptions, descriptors):
+    """ register -> RegisterDescriptor, or a dict of them for byte values sharing a register """
+    return { reg: { unit: registerDescriptor(descriptors, d) for unit, d in descr.items() } if type(descr) is dict else registerDescriptor(descriptors, descr)
+             for reg, descr in descriptions.items() }
+
+def splitInBlocks( descriptions, block_size, auto_block_ignore_readerror, descriptors = None ):
+    """ descriptors: key -> RegisterDescriptor of the hub (hub.registerDescriptors), so that replanned and burst
+        plans reuse the descriptors of the first plan; a new dict when not given
+    """
     start = INVALID_START
     end = 0
     blocks = []
     curblockregs = []
+    runtime = runtimeDescriptions(descriptions, {} if descriptors is None else descriptors) # shared by the blocks, like descriptions before
+    ignore_readerror = auto_ignore = None
     for reg in descriptions:
         descr = descriptions[reg]
         if (not type(descr) is dict) and (descr.newblock or ((reg - start) > block_size)):
             if ((end - start) > 0):
                 _LOGGER.debug(f"Starting new block at 0x{reg:x} ")
                 if  ( (auto_block_ignore_readerror == True) or (auto_block_ignore_readerror == False) ) and not descr.newblock: # automatically created block
-                    descr.ignore_readerror = auto_block_ignore_readerror
+                    auto_ignore = auto_block_ignore_readerror
                 #newblock = block(start = start, end = end, order16 = descriptions[start].order16, order32 = descriptions[start].order32, descriptions = descriptions, regs = curblockregs)
-                newblock = block(start = start, end = end, descriptions = descriptions, regs = curblockregs)
+                newblock = block(start = start, end = end, descriptions = runtime, regs = curblockregs, ignore_readerror = ignore_readerror)
                 blocks.append(newblock)
                 start = INVALID_START
                 end = 0
                 curblockregs = []
             else: _LOGGER.info(f"newblock declaration found for empty block")
 
-        if start == INVALID_START: start = reg
+        if start == INVALID_START:
+            start = reg
+            firstdescr = next(iter(descr.values())) if type(descr) is dict else descr
+            ignore_readerror = firstdescr.ignore_readerror if auto_ignore is None else auto_ignore
+            auto_ignore = None
         if type(descr) is dict: end = reg+1 # couple of byte values
         else:
             _LOGGER.debug(f"adding register 0x{reg:x} {descr.key} to block with start 0x{start:x}")
@@ -64,10 +114,21 @@ def splitInBlocks( descriptions, block_size, auto_block_ignore_readerror ):
         curblockregs.append(reg)
     if ((end-start)>0): # close last block
         #newblock = block(start = start, end = end, order16 = descriptions[start].order16, order32 = descriptions[start].order32, descriptions = descriptions, regs = curblockregs)
-        newblock = block(start = start, end = end, descriptions = descriptions, regs = curblockregs)
+        newblock = block(start = start, end = end, descriptions = runtime, regs = curblockregs, ignore_readerror = ignore_readerror)
         blocks.append(newblock)
     return blocks
 
+def newDeviceGroup(roundRobin = False, ageKey = None, readLock = None):
+    return SimpleNamespace(
+        holdingRegs  = {},
+        inputRegs    = {},
+        readPreparation = None,
+        readFollowUp = None,
+        roundRobin = roundRobin, # battery pack group, read by the round robin pack scheduler of the hub
+        ageKey = ageKey, # key of the data age sensor of a round robin group
+        readLock = readLock, # lock held during the whole prepare/read/follow up sequence
+        )
+
 # ========================================================================================================================
 
 async def async_setup_entry(hass, entry, async_add_entities):
@@ -77,28 +138,16 @@ async def async_setup_entry(hass, entry, async_add_entities):
 
     entities = []
     groups = {}
-    newgrp = lambda: SimpleNamespace(
-        holdingRegs  = {},
-        inputRegs    = {},
-        readPreparation = None,
-        readFollowUp = None,
-        )
+    newgrp = newDeviceGroup
     computedRegs = {}
 
     plugin = hub.plugin #getPlugin(hub_name)
 
     async def readFollowUp(old_data, new_data):
-        dev_registry = dr.async_get(hass)
-        device = dev_registry.async_get_device(identifiers={(DOMAIN, hub_name, INVERTER_IDENT)})
-        if device is not None:
-            sw_version = plugin.getSoftwareVersion(new_data)
-            hw_version = plugin.getHardwareVersion(new_data)
-
-            if sw_version is not None or hw_version is not None:
-                dev_registry.async_update_device(
-                    device.id,
-                    sw_version=sw_version,
-                    hw_version=hw_version)
+        sw_version = plugin.getSoftwareVersion(new_data)
+        hw_version = plugin.getHardwareVersion(new_data)
+        if sw_version is not None or hw_version is not None:
+            updateDeviceRegistry(hass, hub, (DOMAIN, hub_name, INVERTER_IDENT), sw_version=sw_version, hw_version=hw_version)
         return True
 
     inverter_name_suffix = ""
@@ -108,33 +157,57 @@ async def async_setup_entry(hass, entry, async_add_entities):
     entityToList(hub, hub_name, entities, groups, newgrp, computedRegs, hub.device_info,
                  plugin.SENSOR_TYPES, inverter_name_suffix, "", None, readFollowUp)
 
+    async_add_entities(entities)
+    planGroups(hub, hub_name, groups, computedRegs)
+
+    if entry.options.get(CONF_PERF_SENSORS, DEFAULT_PERF_SENSORS):
+        hub.statsSensors = statsSensors(hub, hub_name)
+        async_add_entities(hub.statsSensors)
+
     readBattery = entry.options.get(CONF_READ_BATTERY, False)
-    if readBattery and plugin.BATTERY_CONFIG is not None:
-        battery_config = plugin.BATTERY_CONFIG
+    if readBattery and hub.battery_config is not None:
+        # battery packs are discovered in the background, inverter entities are available right away
+        entry.async_create_background_task(hass,
+            async_discover_battery_packs(hass, hub, hub_name, hub.battery_config, async_add_entities),
+            f"{hub_name} battery pack discovery")
+    return True
+
+async def async_discover_battery_packs(hass, hub, hub_name, battery_config, async_add_entities):
+    """ find the battery packs and add their devices and entities as soon as each pack is confirmed
+        progress and duration are kept in hub.batteryDiscovery for the diagnostics
+    """
+    discovery = hub.batteryDiscovery
+    discovery.update(state = "running", started = time(), duration = None, packs_expected = None, packs_found = 0, packs_failed = [])
+    try:
         batt_pack_quantity = await battery_config.get_batt_pack_quantity(hub)
         batt_quantity = await battery_config.get_batt_quantity(hub)
         _LOGGER.info(f"batt_pack_quantity: {batt_pack_quantity}, batt_quantity: {batt_quantity}")
+        discovery["packs_expected"] = batt_pack_quantity
 
         batt_nr = 0
-        for batt_pack_nr in range(0, batt_pack_quantity, 1):
-            if not await battery_config.select_battery(hub, batt_nr, batt_pack_nr):
-                _LOGGER.warning(f"cannot select batt_nr: {batt_nr}, batt_pack_nr: {batt_pack_nr}")
-                continue
-
-            batt_pack_id = f"battery_1_{batt_pack_nr+1}"
-            dev_registry = dr.async_get(hass)
-            device = dev_registry.async_get_device(identifiers={(DOMAIN, hub_name, batt_pack_id)})
-            if device is not None:
-                _LOGGER.debug(f"batt pack serial: {device.serial_number}")
-                await battery_config.init_batt_pack(hub, device.serial_number)
-
-            batt_pack_serial = await battery_config.get_batt_pack_serial(hub, batt_nr, batt_pack_nr)
-            if batt_pack_serial is None:
-                _LOGGER.warning(f"cannot get serial for batt_nr: {batt_nr}, batt_pack_nr: {batt_pack_nr}")
-                await battery_config.init_batt_pack_serials(hub)
+        for batt_pack_nr in range(0, batt_pack_quantity or 0, 1):
+            # no pack reads of the hub in between: they select packs too
+            async with battery_config.lock:
+                if not await battery_config.select_battery(hub, batt_nr, batt_pack_nr):
+                    _LOGGER.warning(f"cannot select batt_nr: {batt_nr}, batt_pack_nr: {batt_pack_nr}")
+                    discovery["packs_failed"].append(batt_pack_nr + 1)
+                    continue
+
+                batt_pack_id = f"battery_1_{batt_pack_nr+1}"
+                dev_registry = dr.async_get(hass)
+                device = dev_registry.async_get_device(identifiers={(DOMAIN, hub_name, batt_pack_id)})
+                if device is not None:
+                    _LOGGER.debug(f"batt pack serial: {device.serial_number}")
+                    await battery_config.init_batt_pack(hub, device.serial_number)
+
                 batt_pack_serial = await battery_config.get_batt_pack_serial(hub, batt_nr, batt_pack_nr)
                 if batt_pack_serial is None:
-                    continue
+                    _LOGGER.warning(f"cannot get serial for batt_nr: {batt_nr}, batt_pack_nr: {batt_pack_nr}")
+                    await battery_config.init_batt_pack_serials(hub)
+                    batt_pack_serial = await battery_config.get_batt_pack_serial(hub, batt_nr, batt_pack_nr)
+                    if batt_pack_serial is None:
+                        discovery["packs_failed"].append(batt_pack_nr + 1)
+                        continue
 
             device_info_battery = DeviceInfo(
                 identifiers = {(DOMAIN, hub_name, batt_pack_id)},
@@ -152,21 +225,60 @@ async def async_setup_entry(hass, entry, async_add_entities):
                 return await battery_config.check_battery_on_start(hub, old_data, key_prefix, batt_nr, batt_pack_nr)
 
             async def readFollowUp(old_data, new_data, key_prefix=key_prefix, hub_name=hub_name, batt_pack_id=batt_pack_id, batt_nr=batt_nr, batt_pack_nr=batt_pack_nr):
-                dev_registry = dr.async_get(hass)
-                device = dev_registry.async_get_device(identifiers={(DOMAIN, hub_name, batt_pack_id)})
-                if device is not None:
-                    batt_pack_model = await battery_config.get_batt_pack_model(hub)
-                    batt_pack_sw_version = await battery_config.get_batt_pack_sw_version(hub, new_data, key_prefix)
-                    dev_registry.async_update_device(
-                        device.id,
-                        sw_version=batt_pack_sw_version,
-                        model=batt_pack_model)
+                identifier = (DOMAIN, hub_name, batt_pack_id)
+                published = hub.deviceInfoPublished.get(identifier)
+                if published is None or (time() - published.timestamp) >= DEVICE_INFO_REFRESH:
+                    batt_pack_model = await battery_config.get_batt_pack_model(hub) # extra modbus read, only when refreshing
+                else: batt_pack_model = published.info.get("model")
+                batt_pack_sw_version = await battery_config.get_batt_pack_sw_version(hub, new_data, key_prefix)
+                updateDeviceRegistry(hass, hub, identifier, sw_version=batt_pack_sw_version, model=batt_pack_model)
                 return await battery_config.check_battery_on_end(hub, old_data, new_data, key_prefix, batt_nr, batt_pack_nr)
 
+            entities = []
+            groups = {}
+            computedRegs = {}
+            age_key = key_prefix + "data_age"
+            newgrp = lambda age_key=age_key: newDeviceGroup(roundRobin = True, ageKey = age_key, readLock = battery_config.lock)
             entityToList(hub, hub_name, entities, groups, newgrp, computedRegs, device_info_battery,
                          battery_config.battery_sensor_type, name_prefix, key_prefix, readPreparation, readFollowUp)
-
-    async_add_entities(entities)
+            # refreshed by the pack scheduler of the hub in every cycle
+            age_sensor = SolaXModbusSensor(hub_name, hub, device_info_battery, BaseModbusSensorEntityDescription(
+                name = name_prefix + "Data Age",
+                key = age_key,
+                native_unit_of_measurement = UnitOfTime.SECONDS,
+                device_class = SensorDeviceClass.DURATION,
+                state_class = SensorStateClass.MEASUREMENT,
+                entity_category = EntityCategory.DIAGNOSTIC,
+            ))
+            hub.sensorEntities[age_key] = age_sensor
+            entities.append(age_sensor)
+            planGroups(hub, hub_name, groups, computedRegs)
+            async_add_entities(entities)
+            discovery["packs_found"] += 1
+            _LOGGER.info(f"{hub_name} battery pack {batt_nr + 1}/{batt_pack_nr + 1} added ({discovery['packs_found']}/{batt_pack_quantity})")
+    except Exception:
+        _LOGGER.exception(f"{hub_name} battery pack discovery failed")
+        discovery["state"] = "failed"
+    else:
+        discovery["state"] = "done"
+    finally:
+        discovery["duration"] = round(time() - discovery["started"], 2)
+        _LOGGER.info(f"{hub_name} battery pack discovery {discovery['state']} after {discovery['duration']}s: {discovery['packs_found']} packs found")
+
+def updateDeviceRegistry(hass, hub, identifier, **info):
+    """ write device versions to the device registry, but only when they changed or DEVICE_INFO_REFRESH seconds have passed
+        registry updates are sent to the whole HA instance, so they should not happen in every polling cycle
+    """
+    now = time()
+    published = hub.deviceInfoPublished.get(identifier)
+    if published is not None and published.info == info and (now - published.timestamp) < DEVICE_INFO_REFRESH: return
+    dev_registry = dr.async_get(hass)
+    device = dev_registry.async_get_device(identifiers={identifier})
+    if device is None: return
+    dev_registry.async_update_device(device.id, **info)
+    hub.deviceInfoPublished[identifier] = SimpleNamespace(info = info, timestamp = now)
+
+def planGroups(hub, hub_name, groups, computedRegs):  # noqa: D103
     _LOGGER.info(f"{hub_name} sensor groups: {len(groups)}")
     #now the groups are available
     for interval, interval_group in groups.items():
@@ -183,17 +295,66 @@ async def async_setup_entry(hass, entry, async_add_entities):
             hub_device_group = hub_interval_group.device_groups.setdefault(device_name, hub.empty_device_group())
             hub_device_group.readPreparation = device_group.readPreparation
             hub_device_group.readFollowUp = device_group.readFollowUp
-            hub_device_group.holdingBlocks = splitInBlocks(holdingRegs, hub.plugin.block_size, hub.plugin.auto_block_ignore_readerror)
-            hub_device_group.inputBlocks = splitInBlocks(inputRegs, hub.plugin.block_size, hub.plugin.auto_block_ignore_readerror)
-            hub.computedSensors = computedRegs
+            hub_device_group.roundRobin = device_group.roundRobin
+            hub_device_group.ageKey = device_group.ageKey
+            hub_device_group.readLock = device_group.readLock
+            hub_device_group.holdingBlocks = splitInBlocks(holdingRegs, hub.plugin.block_size, hub.plugin.auto_block_ignore_readerror, hub.registerDescriptors)
+            hub_device_group.inputBlocks = splitInBlocks(inputRegs, hub.plugin.block_size, hub.plugin.auto_block_ignore_readerror, hub.registerDescriptors)
 
             for i in hub_device_group.holdingBlocks: _LOGGER.info(f"{hub_name} returning holding block: 0x{i.start:x} 0x{i.end:x} {i.regs}")
             for i in hub_device_group.inputBlocks: _LOGGER.info(f"{hub_name} returning input block: 0x{i.start:x} 0x{i.end:x} {i.regs}")
             _LOGGER.debug(f"holdingBlocks: {hub_device_group.holdingBlocks}")
             _LOGGER.debug(f"inputBlocks: {hub_device_group.inputBlocks}")
+    hub.computedSensors.update(computedRegs)
 
     _LOGGER.info(f"computedRegs: {hub.computedSensors}")
-    return True
+
+def replanGroups(hub, hub_name, previous):
+    """ rebuild the block plan of all polled sensor entities after a scan interval change
+        previous maps a device group key to its former hub device group, holding the read hooks
+    """
+    groups = {}
+    for sensor in hub.sensorEntities.values():
+        descr = sensor.entity_description
+        if descr.register < 0: continue # computed entities are not part of any block
+        device_group_key = hub.device_group_key(sensor.device_info)
+        old = previous.get(device_group_key)
+        device_group = groups.setdefault(hub.entity_group(sensor), {}).setdefault(device_group_key, newDeviceGroup())
+        if old is not None:
+            device_group.readPreparation = old.readPreparation
+            device_group.readFollowUp = old.readFollowUp
+            device_group.roundRobin = old.roundRobin
+            device_group.ageKey = old.ageKey
+            device_group.readLock = old.readLock
+        registerDescription(device_group, descr)
+    planGroups(hub, hub_name, groups, {})
+
+def planBurst(hub, sensors):
+    """ hub device groups holding only the blocks needed for sensors, for a burst of fast polling
+        the read hooks and lock of the regular device group are reused, so battery packs get selected as usual
+    """
+    groups = {}
+    for sensor in sensors:
+        device_group_key = hub.device_group_key(sensor.device_info)
+        device_group = groups.setdefault(device_group_key, newDeviceGroup())
+        device_group.sensors = getattr(device_group, "sensors", [])
+        device_group.sensors.append(sensor)
+        if sensor.entity_description.register >= 0: registerDescription(device_group, sensor.entity_description)
+    burst = []
+    for device_group_key, device_group in groups.items():
+        hub_device_group = hub.empty_device_group()
+        for interval_group in hub.groups.values():
+            current = interval_group.device_groups.get(device_group_key)
+            if current is not None:
+                hub_device_group.readPreparation = current.readPreparation
+                hub_device_group.readFollowUp = current.readFollowUp
+                hub_device_group.readLock = current.readLock
+                break
+        hub_device_group.sensors = device_group.sensors
+        hub_device_group.holdingBlocks = splitInBlocks(dict(sorted(device_group.holdingRegs.items())), hub.plugin.block_size, hub.plugin.auto_block_ignore_readerror, hub.registerDescriptors)
+        hub_device_group.inputBlocks = splitInBlocks(dict(sorted(device_group.inputRegs.items())), hub.plugin.block_size, hub.plugin.auto_block_ignore_readerror, hub.registerDescriptors)
+        burst.append(hub_device_group)
+    return burst
 
 def entityToList(hub, hub_name, entities, groups, newgrp, computedRegs, device_info: DeviceInfo,
                  sensor_types, name_prefix, key_prefix, readPreparation, readFollowUp):  # noqa: D103
@@ -243,27 +404,58 @@ def entityToListSingle(hub, hub_name, entities, groups, newgrp, computedRegs, de
         interval_group = groups.setdefault(hub.entity_group(sensor), {})
         device_group_key = hub.device_group_key(device_info)
         device_group = interval_group.setdefault(device_group_key, newgrp())
-        holdingRegs  = device_group.holdingRegs
-        inputRegs    = device_group.inputRegs
         device_group.readPreparation = readPreparation
         device_group.readFollowUp = readFollowUp
+        registerDescription(device_group, newdescr)
+
+def registerDescription(device_group, newdescr):  # noqa: D103
+    holdingRegs  = device_group.holdingRegs
+    inputRegs    = device_group.inputRegs
+    if newdescr.register_type == REG_HOLDING:
+        if newdescr.register in holdingRegs: # duplicate or 2 bytes in one register ?
+            if newdescr.unit in (REGISTER_U8H, REGISTER_U8L,) and holdingRegs[newdescr.register].unit in (REGISTER_U8H, REGISTER_U8L,) :
+                first = holdingRegs[newdescr.register]
+                holdingRegs[newdescr.register] = { first.unit: first, newdescr.unit: newdescr }
+            else: _LOGGER.warning(f"holding register already used: 0x{newdescr.register:x} {newdescr.key}")
+        else:
+            holdingRegs[newdescr.register] = newdescr
+    elif newdescr.register_type == REG_INPUT:
+        if newdescr.register in inputRegs: # duplicate or 2 bytes in one register ?
+            first = inputRegs[newdescr.register]
+            inputRegs[newdescr.register] = { first.unit: first, newdescr.unit: newdescr }
+            _LOGGER.warning(f"input register already declared: 0x{newdescr.register:x} {newdescr.key}")
+        else:
+            inputRegs[newdescr.register] = newdescr
+    else: _LOGGER.warning(f"entity declaration without register_type found: {newdescr.key}")
+
+def statsSensors(hub, hub_name):
+    """ diagnostic sensors for the polling statistics of the hub, written by the hub after every cycle """
+    sensors = [ SolaXModbusStatsSensor(hub_name, hub, key, name, unit, value)
+                for key, name, unit, value in STATS_SENSORS ]
+    for scan_group, label in ((SCAN_GROUP_DEFAULT, "Default"), (SCAN_GROUP_MEDIUM, "Medium"), (SCAN_GROUP_FAST, "Fast")):
+        sensors.append(SolaXModbusStatsSensor(hub_name, hub, f"stats_cycle_time_{scan_group}", f"{label} Cycle Time", UnitOfTime.SECONDS,
+            lambda stats, scan_group=scan_group: round(stats.cycle(hub.scan_group_interval(scan_group)).last, 3)))
+    return sensors
+
+class SolaXModbusStatsSensor(SensorEntity):
+    """Polling statistics of a hub, not backed by any register."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_should_poll = False
+
+    def __init__(self, platform_name, hub, key, name, unit, value):
+        self._hub = hub
+        self._value = value
+        self._attr_name = f"{platform_name} {name}"
+        self._attr_unique_id = f"{platform_name}_{key}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_device_info = hub.device_info
+        self.entity_id = "sensor." + platform_name + "_" + key
 
-        if newdescr.register_type == REG_HOLDING:
-            if newdescr.register in holdingRegs: # duplicate or 2 bytes in one register ?
-                if newdescr.unit in (REGISTER_U8H, REGISTER_U8L,) and holdingRegs[newdescr.register].unit in (REGISTER_U8H, REGISTER_U8L,) :
-                    first = holdingRegs[newdescr.register]
-                    holdingRegs[newdescr.register] = { first.unit: first, newdescr.unit: newdescr }
-                else: _LOGGER.warning(f"holding register already used: 0x{newdescr.register:x} {newdescr.key}")
-            else:
-                holdingRegs[newdescr.register] = newdescr
-        elif newdescr.register_type == REG_INPUT:
-            if newdescr.register in inputRegs: # duplicate or 2 bytes in one register ?
-                first = inputRegs[newdescr.register]
-                inputRegs[newdescr.register] = { first.unit: first, newdescr.unit: newdescr }
-                _LOGGER.warning(f"input register already declared: 0x{newdescr.register:x} {newdescr.key}")
-            else:
-                inputRegs[newdescr.register] = newdescr
-        else: _LOGGER.warning(f"entity declaration without register_type found: {newdescr.key}")
+    @property
+    def native_value(self):
+        return self._value(self._hub.stats)
 
 class SolaXModbusSensor(SensorEntity):
     """Representation of an SolaX Modbus sensor."""
@@ -281,6 +473,22 @@ class SolaXModbusSensor(SensorEntity):
         self._hub = hub
         self.entity_id = "sensor." + platform_name + "_" + description.key
         self.entity_description: BaseModbusSensorEntityDescription = description
+        self._slot = hub.data.slot(description.key) # interned at setup, see datastore.py
+        self.setup_publication()
+
+    def setup_publication(self):
+        """ (re)create the publication window, from the description or the publish interval option of the scan group """
+        descr = self.entity_description
+        if descr.deadband or descr.deadband_relative: self._deadband = Deadband(descr.deadband, descr.deadband_relative, descr.max_silence)
+        else: self._deadband = None
+        interval = descr.publish_interval
+        if interval is None: interval = self._hub.publish_interval(descr.scan_group)
+        if not interval:
+            self._publisher = None # write the state after every poll
+            return
+        policy = descr.publish_policy
+        if policy is None: policy = PUBLISH_TIME_WEIGHTED if descr.state_class == SensorStateClass.MEASUREMENT else PUBLISH_LAST
+        self._publisher = PublishWindow(policy, interval)
 
     async def async_added_to_hass(self):
         """Register callbacks."""
@@ -291,7 +499,14 @@ class SolaXModbusSensor(SensorEntity):
 
     @callback
     def modbus_data_updated(self):
+        """ called after every poll; returns True when the state was written """
+        now = time()
+        if self._publisher is not None:
+            if not self._publisher.add(self._hub.data.value(self._slot), now): return False
+        if self._deadband is not None:
+            if not self._deadband.passes(self.native_value, now): return False
         self.async_write_ha_state()
+        return True
 
     @callback
     def _update_state(self): # never called ?????
@@ -311,7 +526,12 @@ class SolaXModbusSensor(SensorEntity):
     @property
     def native_value(self):
         """Return the state of the sensor."""
-        if self.entity_description.key in self._hub.data:
-            try:    val = self._hub.data[self.entity_description.key]*self.entity_description.read_scale # a bit ugly as we might multiply strings or other types with 1
-            except: val = self._hub.data[self.entity_description.key] # not a number
-            return val
+        if self._publisher is not None: # aggregate of the last publication window
+            val = self._publisher.value
+            if isinstance(val, float): val = round(val, self.entity_description.rounding)
+            try:    return val*self.entity_description.read_scale
+            except: return val # not a number or None
+        val = self._hub.data.value(self._slot, MISSING)
+        if val is not MISSING:
+            try:    return val*self.entity_description.read_scale # a bit ugly as we might multiply strings or other types with 1
+            except: return val # not a number
@@ -0,0 +1,181 @@
+"""Modbus RTU over a serial port in a thread of its own, one thread per physical port.
+
+With AsyncModbusSerialClient, the frame timing of the RS485 bus depends on the event loop: a busy loop
+(recorder commits, template rendering) stretches the silent interval inside a frame or lets the
+response sit in the buffer, corrupted frames and retries follow. Here a thread per port runs the
+request/response loop with the blocking pymodbus client and keeps the t3.5 gap between frames itself.
+The hubs on the same port share the thread and queue their requests; the asyncio side awaits a future
+that the thread resolves through call_soon_threadsafe.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+from time import perf_counter, sleep
+from types import SimpleNamespace
+
+from pymodbus.client import ModbusSerialClient
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+_LOGGER = logging.getLogger(__name__)
+
+SERIAL_TIMEOUT = 3  # seconds per attempt
+SERIAL_RETRIES = 3  # attempts after the first; each failed attempt is counted as frame error
+BITS_PER_CHAR = 11  # start, 8 data, parity or second stop, stop
+MIN_FRAME_GAP = 0.00175  # the modbus spec fixes t3.5 at 1.75 ms above 19200 baud
+
+_buses = {}  # port -> SerialBus
+_buses_lock = threading.Lock()
+
+
+def _sleep_until(deadline):
+    """Sleep to deadline (perf_counter); t3.5 is a lower bound, oversleeping a little does no harm."""
+    remaining = deadline - perf_counter()
+    if remaining > 0:
+        sleep(remaining)
+
+
+class SerialBus:
+    """The thread, blocking client and request queue of one serial port."""
+
+    def __init__(self, port, baudrate):
+        self.port = port
+        self.baudrate = baudrate
+        self.users = 0
+        self.frame_gap = max(3.5 * BITS_PER_CHAR / baudrate, MIN_FRAME_GAP)
+        self.client = ModbusSerialClient(
+            port=port,
+            baudrate=baudrate,
+            parity="N",
+            stopbits=1,
+            bytesize=8,
+            timeout=SERIAL_TIMEOUT,
+            retries=0,  # retried here, to count the failed frames
+        )
+        self.requests = queue.SimpleQueue()
+        self.last_frame_end = 0.0
+        self.thread = threading.Thread(target=self._run, name=f"solax modbus {port}", daemon=True)
+        self.thread.start()
+
+    def _execute(self, method, args, kwargs):
+        """Returns (response, exception, failed attempts)."""
+        if method == "connect":
+            return self.client.connect(), None, 0
+        failed = 0
+        while True:
+            _sleep_until(self.last_frame_end + self.frame_gap)
+            try:
+                if not self.client.connected and not self.client.connect():
+                    raise ConnectionException(f"cannot open {self.port}")
+                resp = getattr(self.client, method)(*args, **kwargs)
+                if not isinstance(resp, ModbusIOException):
+                    return resp, None, failed
+                error = resp
+            except ModbusIOException as ex:  # no response, or none with a valid crc
+                error = ex
+            except Exception as ex:
+                return None, ex, failed
+            finally:
+                self.last_frame_end = perf_counter()
+            failed += 1
+            if failed > SERIAL_RETRIES:
+                return None, error, failed
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            loop, future, method, args, kwargs, stats, queued = request
+            started = perf_counter()
+            resp, error, failed = self._execute(method, args, kwargs)
+            try:
+                loop.call_soon_threadsafe(_resolve, future, resp, error, perf_counter(), stats, started - queued, failed)
+            except RuntimeError:  # event loop closed
+                pass
+        self.client.close()
+
+
+def _resolve(future, resp, error, done, stats, queue_wait, failed):
+    """Runs in the event loop."""
+    if stats is not None:
+        stats.add_serial(queue_wait, perf_counter() - done, failed)
+    if future.done():  # cancelled by the caller
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(resp)
+
+
+def acquire_bus(port, baudrate):
+    with _buses_lock:
+        bus = _buses.get(port)
+        if bus is None:
+            bus = _buses[port] = SerialBus(port, baudrate)
+        elif bus.baudrate != baudrate:
+            _LOGGER.warning(f"serial port {port} already used with baudrate {bus.baudrate}, ignoring {baudrate}")
+        bus.users += 1
+        return bus
+
+
+def release_bus(bus):
+    with _buses_lock:
+        bus.users -= 1
+        if bus.users > 0:
+            return
+        if _buses.get(bus.port) is bus:
+            del _buses[bus.port]
+    bus.requests.put(None)  # the thread closes the port after the queued requests
+
+
+class SerialThreadClient:
+    """Stands in for AsyncModbusSerialClient; the requests are executed by the thread of the port."""
+
+    def __init__(self, port, baudrate, stats=None):
+        self.comm_params = SimpleNamespace(host=port, port=baudrate)
+        self._port = port
+        self._baudrate = baudrate
+        self._stats = stats
+        self._bus = None
+
+    @property
+    def connected(self):
+        return self._bus is not None and self._bus.client.connected
+
+    async def connect(self):
+        if self._bus is None:
+            self._bus = acquire_bus(self._port, self._baudrate)
+        connected = await self._submit("connect")
+        if not connected:
+            self.close()
+        return connected
+
+    def close(self):
+        if self._bus is not None:
+            release_bus(self._bus)
+            self._bus = None
+
+    def _submit(self, method, *args, **kwargs):
+        if self._bus is None:
+            raise ConnectionException(f"serial port {self._port} not connected")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._bus.requests.put((loop, future, method, args, kwargs, self._stats, perf_counter()))
+        return future
+
+    async def read_holding_registers(self, address, count=1, **kwargs):
+        return await self._submit("read_holding_registers", address, count, **kwargs)
+
+    async def read_input_registers(self, address, count=1, **kwargs):
+        return await self._submit("read_input_registers", address, count, **kwargs)
+
+    async def write_register(self, address, value, **kwargs):
+        return await self._submit("write_register", address, value, **kwargs)
+
+    async def write_registers(self, address, values, **kwargs):
+        return await self._submit("write_registers", address, values, **kwargs)
+
+    async def readwrite_registers(self, **kwargs):
+        return await self._submit("readwrite_registers", **kwargs)
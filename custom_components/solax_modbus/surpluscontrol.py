@@ -0,0 +1,129 @@
+"""PV surplus charging: an EV charger hub follows the surplus measured by an inverter hub.
+
+The controller of the charger hub is a data listener of the inverter hub, so it steps right after
+every inverter read of the grid power, without Home Assistant states or automations in between.
+The surplus is grid export plus battery charge power (as declared by the inverter plugin's
+power_control_config) plus what the charger draws now. Charging starts and stops with hysteresis and
+minimum on and off times; in between, the charge current follows the surplus.
+"""
+
+import logging
+from time import perf_counter, time
+
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import (
+    CONF_SURPLUS_HYSTERESIS,
+    CONF_SURPLUS_MIN_OFF,
+    CONF_SURPLUS_MIN_ON,
+    DEFAULT_SURPLUS_HYSTERESIS,
+    DEFAULT_SURPLUS_MIN_OFF,
+    DEFAULT_SURPLUS_MIN_ON,
+    DOMAIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SurplusController:
+    """Runs on the data updates of the source (inverter) hub and writes to the charger hub."""
+
+    def __init__(self, hub, control, source_name):
+        self.hub = hub  # the charger hub
+        self.control = control  # surplus_control_config of the charger plugin
+        self.source_name = source_name
+        self.source = None  # inverter hub we listen to
+        self.charging = None  # unknown until the first decision
+        self.last_switch = 0.0
+        self.current = None  # last written charge current, A
+        self.writing = None  # task of the write in progress
+
+    def attach(self):
+        """Listen to the source hub; again after it was reloaded. Called on every charger read."""
+        entry = self.hub._hass.data[DOMAIN].get(self.source_name)
+        source = entry["hub"] if entry else None
+        if source is self.source:
+            return
+        self.detach()
+        if source is None:
+            return
+        if source.plugin.POWER_CONTROL is None:
+            _LOGGER.warning(f"{self.hub.name}: hub {self.source_name} does not declare its grid power, no surplus control")
+            return
+        self.source = source
+        source.dataListeners.append(self.async_source_updated)
+        _LOGGER.info(f"{self.hub.name}: surplus charging follows hub {self.source_name}")
+
+    def detach(self):
+        if self.source is not None and self.async_source_updated in self.source.dataListeners:
+            self.source.dataListeners.remove(self.async_source_updated)
+        self.source = None
+
+    async def async_charger_updated(self, hub, group, data):
+        self.attach()
+
+    def phases(self):
+        control = self.control
+        three_phase = (self.hub.invertertype or 0) & control.three_phase_mask
+        if three_phase and self.hub.data.get(control.phase_key, control.three_phase_value) == control.three_phase_value:
+            return 3
+        return 1
+
+    async def async_source_updated(self, source, group, data):
+        power = source.plugin.POWER_CONTROL
+        export = data.get(power.measurement)
+        if not isinstance(export, (int, float)):  # grid power not read in this group
+            return
+        if self.writing is not None and not self.writing.done():
+            return  # the next read decides again
+        start = perf_counter()
+        control = self.control
+        charger = self.hub.data
+        battery = source.data.get(power.battery_power, 0) if power.battery_power else 0
+        surplus = (export + (battery if isinstance(battery, (int, float)) else 0)) * power.measurement_scale
+        surplus += charger.get(control.power_key) or 0
+        watt_per_amp = control.voltage * self.phases()
+        config = self.hub.config
+        hysteresis = config.get(CONF_SURPLUS_HYSTERESIS, DEFAULT_SURPLUS_HYSTERESIS)
+        now = time()
+        since_switch = now - self.last_switch
+        minimum = control.min_current * watt_per_amp
+        charging = self.charging
+        if not charging and surplus >= minimum + hysteresis:
+            if charging is None or since_switch >= config.get(CONF_SURPLUS_MIN_OFF, DEFAULT_SURPLUS_MIN_OFF):
+                charging = True
+        elif charging is not False and surplus < minimum - hysteresis:
+            if charging is None or since_switch >= config.get(CONF_SURPLUS_MIN_ON, DEFAULT_SURPLUS_MIN_ON):
+                charging = False
+        current = round(min(max(surplus / watt_per_amp, control.min_current), control.max_current), 1)
+        if charging == self.charging and (
+            not charging or (self.current is not None and abs(current - self.current) < control.current_step)
+        ):
+            return
+        self.writing = self.hub.entry.async_create_background_task(
+            self.hub._hass,
+            self._async_write(charging, current, surplus - current * watt_per_amp if charging else surplus, start),
+            f"{self.hub.name} surplus charging",
+        )
+
+    async def _async_write(self, charging, current, error, start):
+        hub = self.hub
+        control = self.control
+        try:
+            if charging:
+                await hub.async_write_register(
+                    unit=hub._modbus_addr, address=control.current_register, payload=int(current / control.current_scale)
+                )
+            if charging != self.charging:
+                command = control.start_command if charging else control.stop_command
+                await hub.async_write_register(unit=hub._modbus_addr, address=control.command_register, payload=command)
+                _LOGGER.info(f"{hub.name}: surplus charging {'started' if charging else 'stopped'}")
+        except HomeAssistantError as ex:
+            hub.stats.control_write_errors += 1
+            _LOGGER.warning(f"{hub.name}: surplus charging write failed: {ex}")
+            return
+        if charging != self.charging:
+            self.last_switch = time()
+        self.charging = charging
+        self.current = current if charging else None
+        hub.stats.add_control(perf_counter() - start, error, charging and current in (control.min_current, control.max_current))
@@ -0,0 +1,197 @@
+"""Pool of parallel TCP sessions to one gateway, for the block reads of a hub.
+
+Some gateways (EW11 in multi connection mode, the LAN ports of newer inverters) serve several TCP
+sessions in parallel. With a pool, the blocks of a device group are read concurrently, each request on
+the least busy healthy session. The first session is the hub's own client and lock, so writes,
+recordings and everything else keep using it as before; the other sessions only read.
+A session that fails is closed and reconnected at most every RECONNECT_INTERVAL seconds. Every
+HEALTH_CHECK_INTERVAL seconds, idle sessions are checked with a one register read of the last
+successfully read address, so a dead session is found before a polling cycle picks it; failed
+sessions are reconnected there too. When the device misbehaves under parallel load, the pool shrinks
+to the hub's own session for SHRINK_DURATION.
+"""
+
+import asyncio
+import logging
+from time import perf_counter, time
+
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+from .const import MAX_TCP_SESSIONS
+from .perfstats import Histogram
+
+_LOGGER = logging.getLogger(__name__)
+
+RECONNECT_INTERVAL = 30  # seconds between connection attempts of a failed session
+SHRINK_AFTER = 3  # consecutive failures of parallel requests
+SHRINK_DURATION = 3600  # seconds on one session before trying the pool again
+HEALTH_CHECK_INTERVAL = 60  # seconds between the checks of the idle sessions
+HEALTH_CHECK_TIMEOUT = 5  # seconds a check read may take
+
+
+class PoolSession:
+    """One TCP session: client, lock and statistics."""
+
+    def __init__(self, index, client=None, lock=None):
+        self.index = index
+        self.client = client
+        self.lock = lock or asyncio.Lock()
+        self.pending = 0  # requests waiting for or holding the lock
+        self.latency = Histogram()
+        self.requests = 0
+        self.failures = 0
+        self.failed_at = 0.0  # time of the last failure
+        self.checks = 0
+        self.checked_at = 0.0  # time of the last passed health check
+
+    def as_dict(self):
+        return {
+            "connected": bool(self.client is not None and self.client.connected),
+            "requests": self.requests,
+            "failures": self.failures,
+            "checks": self.checks,
+            "latency": self.latency.as_dict(),
+        }
+
+
+class ConnectionPool:
+    """Extra read sessions of a TCP hub, see the module docstring."""
+
+    def __init__(self, hub, size, make_client):
+        self.hub = hub
+        self.size = min(size, MAX_TCP_SESSIONS)
+        self._make_client = make_client  # () -> new AsyncModbusTcpClient, same settings as the hub's
+        self.sessions = [PoolSession(idx) for idx in range(1, self.size)]
+        self.main = PoolSession(0)  # statistics of the hub's own session
+        self.parallel_failures = 0
+        self.shrunk_until = 0.0
+        self.shrinks = 0
+        self._probe = None  # (method, address, kwargs) of the last successful read, for the health check
+
+    @property
+    def active(self):
+        return self.shrunk_until < time()
+
+    def _available(self):
+        now = time()
+        return [
+            session
+            for session in self.sessions
+            if (session.client is not None and session.client.connected) or now - session.failed_at >= RECONNECT_INTERVAL
+        ]
+
+    async def read(self, method, address, count, **kwargs):
+        """Read on the least busy session; the hub's own session when that is the one."""
+        hub = self.hub
+        candidates = [self.main] + self._available()
+        session = min(candidates, key=lambda session: (session.pending, session.latency.mean))
+        parallel = sum(candidate.pending for candidate in candidates) > 0
+        session.pending += 1
+        try:
+            if session is self.main:
+                wait_start = perf_counter()
+                async with hub._lock:
+                    hub.stats.lock_wait.add(perf_counter() - wait_start)
+                    await hub._check_connection()
+                    return await self._request(session, hub._client, method, address, count, parallel, **kwargs)
+            async with session.lock:
+                if session.client is None:
+                    session.client = self._make_client()
+                if not session.client.connected and not await session.client.connect():
+                    self._failed(session, parallel, "cannot connect")
+                    raise ConnectionException(f"{hub.name}: pool session {session.index} cannot connect")
+                return await self._request(session, session.client, method, address, count, parallel, **kwargs)
+        finally:
+            session.pending -= 1
+
+    async def _request(self, session, client, method, address, count, parallel, **kwargs):
+        start = perf_counter()
+        try:
+            resp = await getattr(client, method)(address, count, **kwargs)
+        except (TimeoutError, ModbusIOException, ConnectionException) as ex:
+            self._failed(session, parallel, str(ex))
+            raise
+        session.requests += 1
+        session.latency.add(perf_counter() - start)
+        if resp.isError():
+            self._failed(session, parallel, str(resp))
+        else:
+            self._probe = (method, address, kwargs)
+            if parallel:
+                self.parallel_failures = 0
+        return resp
+
+    async def async_check_health(self, _now=None):
+        """Check the idle sessions (see the module docstring); failures do not count as parallel."""
+        if not self.active or self._probe is None:
+            return
+        method, address, kwargs = self._probe
+        now = time()
+        for session in self.sessions:
+            if session.pending or session.lock.locked():
+                continue  # busy, its requests tell
+            if session.client is None or not session.client.connected:
+                if now - session.failed_at < RECONNECT_INTERVAL:
+                    continue
+            session.pending += 1
+            try:
+                async with session.lock:
+                    if session.client is None:
+                        session.client = self._make_client()
+                    if not session.client.connected and not await session.client.connect():
+                        self._failed(session, False, "cannot connect")
+                        continue
+                    try:
+                        resp = await asyncio.wait_for(
+                            getattr(session.client, method)(address, 1, **kwargs), HEALTH_CHECK_TIMEOUT
+                        )
+                    except (TimeoutError, ModbusIOException, ConnectionException) as ex:
+                        self._failed(session, False, f"health check: {ex}")
+                        continue
+                    if resp.isError():
+                        self._failed(session, False, f"health check: {resp}")
+                        continue
+                    session.checks += 1
+                    session.checked_at = time()
+            finally:
+                session.pending -= 1
+
+    def _failed(self, session, parallel, reason):
+        session.failures += 1
+        session.failed_at = time()
+        if session is not self.main and session.client is not None:
+            session.client.close()  # reconnected after RECONNECT_INTERVAL
+        if not parallel:
+            return
+        self.parallel_failures += 1
+        if self.parallel_failures >= SHRINK_AFTER and self.active:
+            self.shrink(f"{self.parallel_failures} failed parallel requests, last on session {session.index}: {reason}")
+
+    def shrink(self, reason):
+        _LOGGER.warning(f"{self.hub.name}: reading on one session for {SHRINK_DURATION}s, {reason}")
+        self.shrinks += 1
+        self.parallel_failures = 0
+        self.shrunk_until = time() + SHRINK_DURATION
+        self.close()
+
+    def close(self):
+        for session in self.sessions:
+            if session.client is not None and session.client.connected:
+                session.client.close()
+
+    def as_dict(self):
+        return {
+            "size": self.size,
+            "active": self.active,
+            "shrinks": self.shrinks,
+            "sessions": [dict(self.main.as_dict(), connected=self.hub._client.connected)]
+            + [session.as_dict() for session in self.sessions],
+        }
+
+
+def make_tcp_client(host, port, framer=None):
+    """Client factory for the pool sessions; the same settings as the hub's own client."""
+    if framer is not None:
+        return lambda: AsyncModbusTcpClient(host=host, port=port, timeout=5, framer=framer, retries=6)
+    return lambda: AsyncModbusTcpClient(host=host, port=port, timeout=5, retries=6)
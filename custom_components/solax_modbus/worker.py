@@ -0,0 +1,383 @@
+"""Polling worker process: modbus, decoding and computed sensors of a hub outside the event loop.
+
+The worker owns the only modbus connection of the hub. For the regular device groups (no battery pack
+selection, no read preparation), the hub sends a read request and gets back the change set of that
+read, see workerdata.py, and applies only the changes. With it come the raw registers of the blocks
+(for the modbus proxy, when enabled), the request statistics and the trace spans of the read. All
+other modbus requests of the hub - writes, battery pack reads, bursts, type detection - are passed
+through to the worker's client by a WorkerClient standing in for the pymodbus client. Entities,
+scheduling and the statistics of the cycles stay in Home Assistant.
+"""
+
+import asyncio
+import functools
+import importlib
+import itertools
+import logging
+import multiprocessing
+from types import SimpleNamespace
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+from homeassistant.const import CONF_HOST, CONF_NAME, CONF_PORT
+
+from .const import (
+    CONF_PERF_SENSORS,
+    CONF_PLUGIN,
+    CONF_PROXY_PORT,
+    CONF_READ_BATTERY,
+    DEFAULT_PROXY_PORT,
+    DOMAIN,
+    INVERTER_IDENT,
+)
+from .datastore import MISSING
+from .workerdata import ChangeDecoder, ChangeEncoder
+
+_LOGGER = logging.getLogger(__name__)
+
+WORKER_TIMEOUT = 60  # seconds to wait for an answer of the worker
+
+
+class WorkerResponse:
+    """Stands in for a pymodbus response."""
+
+    def __init__(self, registers=None, error=None, exception_code=None):
+        self.registers = registers or []
+        self.error = error
+        self.exception_code = exception_code
+
+    def isError(self):
+        return self.error is not None
+
+    def __str__(self):
+        return self.error or f"WorkerResponse({self.registers})"
+
+
+class Pipe:
+    """Request/response over a multiprocessing connection, read by the event loop."""
+
+    def __init__(self, conn, handle, on_close=None):
+        self.conn = conn
+        self.handle = handle  # called with every message that is not a response
+        self.on_close = on_close
+        self.pending = {}
+        self.ids = itertools.count()
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(conn.fileno(), self._readable)
+
+    def _readable(self):
+        try:
+            while self.conn.poll():
+                message = self.conn.recv()
+                if message[0] == "response":
+                    future = self.pending.pop(message[1], None)
+                    if future is not None and not future.done():
+                        future.set_result(message[2:])
+                else:
+                    self.handle(message)
+        except (EOFError, OSError):
+            self.close()
+
+    def send(self, *message):
+        self.conn.send(message)
+
+    async def request(self, *message):
+        req_id = next(self.ids)
+        future = self.loop.create_future()
+        self.pending[req_id] = future
+        try:
+            self.conn.send((message[0], req_id) + message[1:])
+            return await asyncio.wait_for(future, WORKER_TIMEOUT)
+        except asyncio.TimeoutError as ex:  # a failed request, like a modbus timeout
+            raise ModbusIOException(f"no answer of the polling worker within {WORKER_TIMEOUT}s") from ex
+        except (EOFError, OSError, BrokenPipeError) as ex:
+            self.close()
+            raise ConnectionException(f"polling worker gone: {ex}") from ex
+        finally:
+            self.pending.pop(req_id, None)
+
+    def close(self):
+        if self.conn.closed:
+            return
+        self.loop.remove_reader(self.conn.fileno())
+        self.conn.close()
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionException("polling worker gone"))
+        self.pending.clear()
+        if self.on_close is not None:
+            self.on_close()
+
+
+# ===================================== main process side =========================================
+
+
+class WorkerClient:
+    """pymodbus client of the hub in worker mode: every request is executed by the worker."""
+
+    def __init__(self, worker, host, port):
+        self._worker = worker
+        self.comm_params = SimpleNamespace(host=host, port=port)
+        self.connected = False
+
+    async def connect(self):
+        pipe = await self._worker.async_start()
+        (self.connected,) = await pipe.request("connect")
+        return self.connected
+
+    def close(self):
+        self.connected = False
+        self._worker.stop()
+
+    async def _call(self, method, *args, **kwargs):
+        if self._worker.pipe is None:
+            self.connected = False
+            raise ConnectionException("polling worker not running")
+        registers, error, exception, exception_code = await self._worker.pipe.request("call", method, args, kwargs)
+        if exception is not None:
+            raise ModbusIOException(exception)
+        return WorkerResponse(registers, error, exception_code)
+
+    def read_holding_registers(self, address, count=1, **kwargs):
+        return self._call("read_holding_registers", address, count, **kwargs)
+
+    def read_input_registers(self, address, count=1, **kwargs):
+        return self._call("read_input_registers", address, count, **kwargs)
+
+    def write_register(self, address, value, **kwargs):
+        return self._call("write_register", address, value, **kwargs)
+
+    def write_registers(self, address, values, **kwargs):
+        return self._call("write_registers", address, values, **kwargs)
+
+    def readwrite_registers(self, **kwargs):
+        return self._call("readwrite_registers", **kwargs)
+
+
+class PollingWorker:
+    """Runs the polling of a hub in a separate process; hub._client is replaced by self.client."""
+
+    def __init__(self, hub, plugin_name):
+        self.hub = hub
+        self.plugin_name = plugin_name
+        self.process = None
+        self.pipe = None
+        self.planned = False
+        self.decoder = ChangeDecoder(hub.data)
+        self.applied = {}  # device group -> store version when its last applied change set was requested
+        self.sent_locals = {}  # local data values the worker has
+        config = hub.config
+        self.client = WorkerClient(self, config.get(CONF_HOST), config.get(CONF_PORT))
+        self._starting = asyncio.Lock()
+
+    async def async_start(self):
+        async with self._starting:
+            if self.pipe is None or self.pipe.conn.closed:
+                parent, child = multiprocessing.Pipe()
+                context = multiprocessing.get_context("spawn")  # no copy of the event loop and threads of HA
+                options = dict(self.hub.config)
+                options[CONF_PLUGIN] = self.plugin_name
+                self.process = context.Process(
+                    target=worker_main, args=(child, options), name=f"{self.hub.name} polling worker", daemon=True
+                )
+                await self.hub._hass.async_add_executor_job(self.process.start)
+                child.close()
+                self.pipe = Pipe(parent, self._message, on_close=self._closed)
+                self.planned = False
+                self.decoder = ChangeDecoder(self.hub.data)
+                self.applied = {}
+                self.sent_locals = {}
+                _LOGGER.info(f"{self.hub.name}: polling worker started, pid {self.process.pid}")
+            return self.pipe
+
+    def stop(self):
+        if self.pipe is not None:
+            try:
+                self.pipe.send("stop")
+            except (OSError, BrokenPipeError):
+                pass
+            self.pipe.close()
+
+    async def async_stop(self):
+        self.stop()
+        if self.process is not None:
+            await self.hub._hass.async_add_executor_job(self.process.join, 5)
+            if self.process.is_alive():
+                self.process.kill()
+            self.process = None
+
+    def _closed(self):
+        self.pipe = None
+        self.client.connected = False  # the hub restarts the worker on its next connection check
+
+    def _message(self, message):
+        _LOGGER.warning(f"{self.hub.name}: unexpected message from the polling worker: {message[0]}")
+
+    def owns(self, group):
+        """Regular device groups are read by the worker; battery packs and bursts through the client."""
+        return group.readPreparation is None and not group.roundRobin
+
+    def _group_key(self, group):
+        for interval, interval_group in self.hub.groups.items():
+            for device_key, device_group in interval_group.device_groups.items():
+                if device_group is group:
+                    return interval, device_key
+        return None
+
+    def _locals_delta(self):
+        hub = self.hub
+        delta = {}
+        for key in itertools.chain(hub.writeLocals, ("_repeatUntil",)):
+            value = hub.data.get(key, MISSING)
+            if value is not MISSING and self.sent_locals.get(key, MISSING) != value:
+                delta[key] = value if not isinstance(value, dict) else dict(value)
+        self.sent_locals.update(delta)
+        return delta
+
+    async def async_read_group(self, group):
+        """Read group in the worker and apply its change set; None when the worker does not know group."""
+        key = self._group_key(group)
+        if key is None:
+            return None
+        hub = self.hub
+        pipe = self.pipe
+        if pipe is None:
+            raise ConnectionException("polling worker not running")
+        if not self.planned:
+            await pipe.request("plan", hub.invertertype, hub.seriesnumber, dict(hub.config))
+            self.planned = True
+            self.applied.clear()  # the worker starts over with new groups
+        data = hub.data
+        applied = self.applied.pop(key, None)  # until this change set is applied
+        # the hub changed values of the group itself (sleep mode, number and select entities): the worker
+        # would not send them again while they do not change in the inverter
+        resend = applied is None or data.set_directly(self.decoder.groups.get(key, ()), applied)
+        requested = data.version
+        try:
+            ok, changes, blocks, stats, spans = await pipe.request("read", key[0], key[1], self._locals_delta(), resend)
+        except ModbusIOException:  # no answer in time: a failed read
+            hub.stats.exceptions += 1
+            hub.stats.timeouts += 1
+            raise
+        hub.stats.merge(stats)
+        hub.trace.import_spans(spans)
+        if hub.registerSnapshot is not None:
+            for typ, start, registers in blocks:
+                hub.registerSnapshot.store(typ, start, registers)
+        if changes is None:  # the read failed before it was followed up
+            return ok
+        if resend:
+            self.decoder.forget(key)
+        with data.buffer() as buffer:
+            read = self.decoder.decode(key, *changes, buffer)
+            read["_repeatUntil"] = data["_repeatUntil"]
+            res = await hub.async_apply_group_read(group, read, ok)
+        self.applied[key] = requested  # changes of the hub after the request are sent again
+        return res
+
+
+class BlockLog(list):
+    """Stands in for the RegisterSnapshot of the modbus proxy in the worker: the blocks read, for the hub."""
+
+    def store(self, typ, start, registers):
+        self.append((typ, start, list(registers)))
+
+    def invalidate(self, typ, address, count):
+        pass  # writes invalidate the snapshot of the hub
+
+    def take(self):
+        blocks = list(self)
+        self.clear()
+        return blocks
+
+
+# ======================================= worker process ==========================================
+
+
+def worker_main(conn, options):
+    """Entry point of the worker process."""
+    logging.basicConfig(level=logging.WARNING, format=f"{options.get(CONF_NAME)} worker %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_async_serve(conn, options))
+
+
+async def _async_serve(conn, options):
+    from . import SolaXModbusHub, sensor  # the package, with Home Assistant, only in the worker
+
+    module = importlib.import_module(f".plugin_{options[CONF_PLUGIN]}", __package__)
+    options = {**options, CONF_READ_BATTERY: False, CONF_PERF_SENSORS: False}
+    entry = SimpleNamespace(options=options, data={})
+    hub = SolaXModbusHub(None, module, entry)
+    hub.localsLoaded = True  # local data is owned by the main process and sent with the reads
+    stopped = asyncio.Event()
+    encoder = ChangeEncoder()
+
+    async def follow_up(group, key, hub_data, data):  # the change set of the read, for the response
+        group.readValues = encoder.encode(key, data)
+        return True
+
+    async def plan(req_id, invertertype, serialnumber, config):
+        entry.options = hub.config = {**config, CONF_READ_BATTERY: False, CONF_PERF_SENSORS: False}
+        hub.groups = {}  # planned again after a scan interval change
+        hub._invertertype = invertertype
+        hub.seriesnumber = serialnumber
+        hub.device_info = {"identifiers": {(DOMAIN, hub.name, INVERTER_IDENT)}, "name": hub.name}
+        hub.registerSnapshot = BlockLog() if config.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT) else None
+        hass = SimpleNamespace(data={DOMAIN: {hub.name: {"hub": hub}}})
+        await sensor.async_setup_entry(hass, entry, lambda entities: None)
+        encoder.forget()
+        for interval, interval_group in hub.groups.items():
+            for device_key, group in interval_group.device_groups.items():
+                # the real one runs in the main process
+                group.readFollowUp = functools.partial(follow_up, group, (interval, device_key))
+        pipe.send("response", req_id)
+
+    async def read_group(req_id, interval, device_key, local_data, resend):
+        hub.data.update(local_data)
+        interval_group = hub.groups.get(interval)
+        group = interval_group.device_groups.get(device_key) if interval_group is not None else None
+        if group is None:
+            _LOGGER.warning(f"{hub.name}: unknown device group {device_key} with interval {interval}")
+            pipe.send("response", req_id, False, None, [], hub.stats.take(), [])
+            return
+        if resend:  # the hub did not get the previous change set
+            encoder.forget((interval, device_key))
+        group.readValues = None
+        with hub.trace.cycle(interval) as cycle:
+            ok = await hub.async_read_modbus_data(group)
+        blocks = hub.registerSnapshot.take() if hub.registerSnapshot is not None else []
+        # statistics and blocks of reads running at the same time may come with this response, none get lost
+        pipe.send("response", req_id, ok, group.readValues, blocks, hub.stats.take(), hub.trace.export_spans(cycle))
+
+    async def connect(req_id):
+        async with hub._lock:
+            connected = hub._client.connected or await hub._client.connect()
+        pipe.send("response", req_id, bool(connected))
+
+    async def call(req_id, method, args, kwargs):
+        registers = error = exception = exception_code = None
+        try:
+            async with hub._lock:
+                if not hub._client.connected:
+                    await hub._client.connect()
+                resp = await getattr(hub._client, method)(*args, **kwargs)
+            if resp.isError():
+                error = str(resp)
+                exception_code = getattr(resp, "exception_code", None)
+            else:
+                registers = list(getattr(resp, "registers", None) or [])
+        except Exception as ex:  # passed to the main process, raised there
+            exception = f"{type(ex).__name__}: {ex}"
+        pipe.send("response", req_id, registers, error, exception, exception_code)
+
+    handlers = {"plan": plan, "read": read_group, "connect": connect, "call": call}
+
+    def handle(message):
+        if message[0] == "stop":
+            stopped.set()
+            return
+        asyncio.create_task(handlers[message[0]](*message[1:]))
+
+    pipe = Pipe(conn, handle, on_close=stopped.set)  # the main process is gone
+    await stopped.wait()
+    if hub._client.connected:
+        hub._client.close()
@@ -0,0 +1,150 @@
+"""Change sets of device group reads, as the polling worker sends them to the hub.
+
+The worker numbers the keys of its reads and remembers, per device group, the values it sent last. A
+read goes over the pipe as a change set: the names of new keys as (key id, key) pairs (the responses
+of concurrent reads may arrive in any order), the (key id, value) pairs of the values that changed
+since the previous read of the group, and the ids of the keys the group's read no longer has. Keys
+starting with an underscore (_repeatUntil) belong to the hub and stay out.
+
+The hub maps the key ids to slots of its data store once and writes only the changes into the read
+buffer, so commit() touches only those. readFollowUp and the data listeners still get the values of
+the whole read, as a GroupRead: the changes of the read, and the store for the other slots of the group.
+"""
+
+from collections.abc import MutableMapping
+
+from .datastore import MISSING
+
+
+class ChangeEncoder:
+    """Worker side."""
+
+    __slots__ = ("ids", "sent")
+
+    def __init__(self):
+        self.ids = {}  # key -> key id
+        self.sent = {}  # device group -> {key id: value} of its last change set
+
+    def encode(self, group, data):
+        """([(key id, new key)], [(key id, value)], [dropped key id]) of the read data of group."""
+        ids = self.ids
+        previous = self.sent.get(group, {})
+        current = {}
+        new_keys = []
+        changed = []
+        for key, value in data.items():
+            if key.startswith("_"):
+                continue
+            key_id = ids.get(key)
+            if key_id is None:
+                key_id = ids[key] = len(ids)
+                new_keys.append((key_id, key))
+            current[key_id] = value
+            old = previous.get(key_id, MISSING)
+            if old is MISSING or old is not value and old != value:  # as DataStore.commit compares
+                changed.append((key_id, value))
+        dropped = [key_id for key_id in previous if key_id not in current]
+        self.sent[group] = current
+        return new_keys, changed, dropped
+
+    def forget(self, group=None):
+        """The next change set of group (default: of all groups) holds all of its values."""
+        if group is None:
+            self.sent.clear()
+        else:
+            self.sent.pop(group, None)
+
+
+class ChangeDecoder:
+    """Hub side; one per worker process, the ids start over with a new process."""
+
+    __slots__ = ("store", "slots", "groups")
+
+    def __init__(self, store):
+        self.store = store  # hub.data
+        self.slots = {}  # key id -> slot in the store
+        self.groups = {}  # device group -> slots its read holds
+
+    def decode(self, group, new_keys, changed, dropped, buffer):
+        """Write the changes into buffer, a ReadBuffer of the store; returns the GroupRead of the read."""
+        slot = self.store.slot
+        slots = self.slots
+        for key_id, key in new_keys:
+            slots[key_id] = slot(key)
+        buffer.grow()
+        read = self.groups.setdefault(group, set())
+        values = buffer.values
+        written = buffer.written
+        for key_id, value in changed:
+            idx = slots[key_id]
+            read.add(idx)
+            if values[idx] is MISSING:
+                written.append(idx)
+            values[idx] = value
+        for key_id in dropped:
+            read.discard(slots[key_id])
+        return GroupRead(buffer, read)
+
+    def forget(self, group=None):
+        if group is None:
+            self.groups.clear()
+        else:
+            self.groups.pop(group, None)
+
+
+class GroupRead(MutableMapping):
+    """The values of a worker read of a device group: the changes in a ReadBuffer, the store for the rest.
+
+    DataStore.commit takes it like the ReadBuffer (values, written): only the changes are stored.
+    """
+
+    __slots__ = ("_buffer", "_slots", "values", "written")
+
+    def __init__(self, buffer, slots):
+        self._buffer = buffer
+        self._slots = slots  # slots of the group's read
+        self.values = buffer.values
+        self.written = buffer.written
+
+    def __getitem__(self, key):
+        store = self._buffer._store
+        idx = store._slots.get(key)
+        if idx is not None:
+            if idx < len(self.values) and self.values[idx] is not MISSING:
+                return self.values[idx]
+            if idx in self._slots and store._values[idx] is not MISSING:
+                return store._values[idx]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):  # the keys of the hub, e.g. _repeatUntil
+        self._buffer[key] = value
+
+    def __delitem__(self, key):
+        raise TypeError("values of a read cannot be removed")
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def _indices(self):
+        values = self.values
+        store = self._buffer._store._values
+        for idx in self._slots:
+            if values[idx] is not MISSING or store[idx] is not MISSING:
+                yield idx
+        for idx in self.written:
+            if idx not in self._slots:
+                yield idx
+
+    def __iter__(self):
+        keys = self._buffer._store._keys
+        return (keys[idx] for idx in self._indices())
+
+    def __len__(self):
+        return sum(1 for _ in self._indices())
+
+    def __repr__(self):
+        return f"GroupRead({dict(self.items())!r})"
@@ -0,0 +1,18 @@
+"""Imports of the integration's modules without Home Assistant.
+
+custom_components/solax_modbus/__init__.py needs Home Assistant; the modules tested here do not. The
+packages are registered with their directories as path but without running __init__, so
+"from custom_components.solax_modbus.datastore import DataStore" imports just that module.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parents[1] / "custom_components" / "solax_modbus"
+
+for name, path in (("custom_components", PACKAGE_DIR.parent), ("custom_components.solax_modbus", PACKAGE_DIR)):
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [str(path)]
+        sys.modules[name] = package
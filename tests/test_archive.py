@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+from custom_components.solax_modbus.archive import CHUNK_HEADER, SampleArchive, decode_chunk, encode_chunk
+
+DAY = 1_700_006_400  # midnight UTC
+
+
+class ExecutorHass:
+    """The two hass methods the archive uses."""
+
+    async def async_add_executor_job(self, target, *args):
+        return await asyncio.to_thread(target, *args)
+
+    def async_create_task(self, coro):
+        return asyncio.ensure_future(coro)
+
+
+def test_chunk_round_trip():
+    rows = [
+        (DAY + 0.5, {"power": 1200, "voltage": 230.1}),
+        (DAY + 1.5, {"power": -300, "soc": 55}),
+        (DAY + 2.5, {"power": 0, "voltage": 229.875}),
+    ]
+    chunk = encode_chunk(rows)
+    columns = dict(decode_chunk(chunk[CHUNK_HEADER.size :]))
+    assert columns == {
+        "power": [(DAY + 0.5, 1200), (DAY + 1.5, -300), (DAY + 2.5, 0)],
+        "voltage": [(DAY + 0.5, 230.1), (DAY + 2.5, 229.875)],
+        "soc": [(DAY + 1.5, 55)],
+    }
+    assert dict(decode_chunk(chunk[CHUNK_HEADER.size :], keys={"soc"})) == {"soc": [(DAY + 1.5, 55)]}
+
+
+def test_archive_files_round_trip(tmp_path):
+    archive = SampleArchive(None, str(tmp_path))
+    archive._write([(DAY + 10, {"power": 100}), (DAY + 20, {"power": 300})])
+    archive._write([(DAY + 30, {"power": 500, "soc": 60})])  # a second chunk of the same day
+    archive._write([(DAY + 86400 + 10, {"power": 700})])  # next day, next file
+    assert len(list(tmp_path.iterdir())) == 2
+
+    result = archive.query(DAY, DAY + 86400 + 20)
+    assert result == {
+        "power": [(DAY + 10, 100), (DAY + 20, 300), (DAY + 30, 500), (DAY + 86410, 700)],
+        "soc": [(DAY + 30, 60)],
+    }
+    assert archive.query(DAY, DAY + 40, keys={"power"}, step=20) == {"power": [(DAY, 100), (DAY + 20, 400)]}
+
+    path = tmp_path / "export.csv"
+    assert archive.export_csv(str(path), DAY, DAY + 40) == 3
+    assert path.read_text().splitlines()[0] == "time,power,soc"
+
+    path = tmp_path / "export.json"
+    assert archive.export_json(str(path), DAY, DAY + 40, keys={"soc"}) == 1
+    assert json.loads(path.read_text())["columns"] == {"soc": {"time": [DAY + 30], "value": [60]}}
+
+
+def test_only_finite_numbers_are_archived(tmp_path):
+    archive = SampleArchive(ExecutorHass(), str(tmp_path))
+    data = {"power": 100, "ratio": float("nan"), "peak": float("inf"), "mode": "Normal", "on": True, "_repeatUntil": {}}
+    asyncio.run(archive.async_data_updated(None, None, data))
+    assert archive._buffer[0][1] == {"power": 100}
+
+
+def test_a_failed_write_drops_its_chunk_only(tmp_path):
+    archive = SampleArchive(ExecutorHass(), str(tmp_path))
+    write = archive._write
+
+    def failing_write(rows):
+        if rows[0][1]["power"] == 2:
+            raise OSError("disk full")
+        write(rows)
+
+    archive._write = failing_write
+
+    async def run():
+        for power in (1, 2, 3):
+            archive.add(DAY + power, {"power": power})
+            archive._flush()
+        await archive.async_close()  # does not raise
+
+    asyncio.run(run())
+    assert (archive.chunks, archive.dropped) == (2, 1)
+    assert archive.query(DAY, DAY + 10) == {"power": [(DAY + 1, 1), (DAY + 3, 3)]}
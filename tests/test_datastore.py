@@ -0,0 +1,86 @@
+from custom_components.solax_modbus.datastore import MISSING, DataStore
+
+
+def read(store, values):
+    """A group read as async_read_modbus_block does it: by slot into the read buffer, then commit."""
+    with store.buffer() as data:
+        slots = [store.slot(key) for key in values]  # block.slots, interned on the first read
+        data.grow()
+        buffered = data.values
+        for slot, value in zip(slots, values.values()):
+            if buffered[slot] is MISSING:
+                data.written.append(slot)
+            buffered[slot] = value
+        before = dict(store)
+        assert dict(data) == values  # the data of the read, for readFollowUp and the listeners
+        assert dict(store) == before  # committed only now
+        store.commit(data)
+        return dict(data)
+
+
+def test_behaves_like_a_dict():
+    store = DataStore({"a": 1})
+    store["b"] = None
+    assert store == {"a": 1, "b": None}
+    assert len(store) == 2
+    del store["a"]
+    assert "a" not in store and len(store) == 1
+    assert store.get("a", 5) == 5
+    store["a"] = 2
+    assert list(store) == ["a", "b"] and len(store) == 2
+
+
+def test_stamps_only_change_with_the_value():
+    store = DataStore()
+    store["power"] = 100
+    stamp = store.stamp("power")
+    store["power"] = 100
+    assert store.stamp("power") == stamp
+    version = store.version
+    read(store, {"power": 100, "voltage": 230.5})
+    assert store.stamp("power") == stamp
+    assert store.changed_since(version) == ["voltage"]
+    read(store, {"power": 120, "voltage": 230.5})
+    assert store.stamp("power") > stamp
+    assert store.stamp("unknown") == 0
+
+
+def test_read_buffer_holds_only_the_keys_of_its_read():
+    store = DataStore({"_repeatUntil": {}})
+    assert read(store, {"a": 1, "b": 2}) == {"a": 1, "b": 2}
+    assert read(store, {"b": 3}) == {"b": 3}
+    assert store == {"_repeatUntil": {}, "a": 1, "b": 3}
+    assert len(store) == 3
+
+
+def test_read_buffer_is_reused():
+    store = DataStore()
+    with store.buffer() as first:
+        first["a"] = 1
+    with store.buffer() as second:
+        assert second is first
+        assert "a" not in second and len(second) == 0
+        with store.buffer() as nested:  # concurrent reads of two groups
+            assert nested is not second
+
+
+def test_snapshot_keeps_its_values():
+    store = DataStore({"a": 1})
+    snapshot = store.snapshot()
+    store["a"] = 2
+    store["b"] = 3
+    assert snapshot == {"a": 1} and len(snapshot) == 1
+    assert store.snapshot() == {"a": 2, "b": 3}
+
+
+def test_changes_outside_commit_are_stamped_apart():
+    store = DataStore()
+    version = store.version
+    read(store, {"power": 100, "mode": "Normal"})
+    slots = [store.slot("power"), store.slot("mode")]
+    assert not store.set_directly(slots, version)  # a read
+    store["mode"] = "Manual"  # e.g. a select entity
+    assert store.set_directly(slots, version)
+    version = store.version
+    store["other"] = 1
+    assert not store.set_directly(slots, version)
@@ -0,0 +1,18 @@
+from custom_components.solax_modbus.modbusproxy import ProxyContext, RegisterSnapshot
+
+
+def test_writes_are_refused_unless_enabled():
+    read_only = ProxyContext(None, 30, [])
+    assert read_only.validate(3, 0x0) and read_only.validate(4, 0x0)
+    assert not read_only.validate(6, 0x7C) and not read_only.validate(16, 0x7C, 2)
+    writable = ProxyContext(None, 30, [], writes=True)
+    assert writable.validate(6, 0x7C) and writable.validate(16, 0x7C, 2)
+
+
+def test_snapshot_lookup_spans_blocks():
+    snapshot = RegisterSnapshot()
+    snapshot.store("input", 0x00, [1, 2, 3])
+    snapshot.store("input", 0x03, [4, 5])
+    assert snapshot.lookup("input", 0x02, 3, 10) == [3, 4, 5]
+    snapshot.invalidate("input", 0x04, 1)
+    assert snapshot.lookup("input", 0x02, 3, 10) is None
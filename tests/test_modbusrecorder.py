@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymodbus.exceptions import ModbusIOException
+
+from custom_components.solax_modbus.modbusrecorder import (
+    FC_READ_HOLDING,
+    FC_READ_INPUT,
+    FC_READ_WRITE,
+    FC_WRITE_SINGLE,
+    STATUS_ERROR,
+    STATUS_EXCEPTION,
+    STATUS_OK,
+    RecordingClient,
+    ReplayClient,
+    read_log,
+)
+
+
+class ExecutorHass:
+    """The two hass methods the recorder uses."""
+
+    async def async_add_executor_job(self, target, *args):
+        return await asyncio.to_thread(target, *args)
+
+    def async_create_task(self, coro):
+        return asyncio.ensure_future(coro)
+
+
+def record(function, address, count, registers, status=STATUS_OK):
+    return SimpleNamespace(
+        offset=0.0, latency=0.0, function=function, status=status, unit=1,
+        address=address, count=count, registers=registers,
+    )
+
+
+def test_record_and_replay_round_trip(tmp_path):
+    inverter = ReplayClient(
+        [
+            record(FC_READ_INPUT, 0x00, 3, [2301, 65436, 17]),
+            record(FC_READ_INPUT, 0x00, 3, [2302, 65435, 18]),
+            record(FC_READ_HOLDING, 0x20, 2, [], STATUS_ERROR),
+            # select battery pack 1, then 2, reading the pack data back (FC23)
+            record(FC_READ_WRITE, 0x1300, 2, [0x1234, 1, 1, 11, 12]),
+            record(FC_READ_WRITE, 0x1300, 2, [0x1234, 1, 2, 21, 22]),
+        ],
+        speed=0,
+    )
+    path = tmp_path / "traffic.rec"
+
+    async def session(client):
+        await client.connect()
+        first = await client.read_input_registers(0x00, 3, slave=1)
+        second = await client.read_input_registers(0x00, 3, slave=1)
+        error = await client.read_holding_registers(0x20, 2, slave=1)
+        with pytest.raises(ModbusIOException):
+            await client.read_input_registers(0x40, 1, slave=1)  # never recorded
+        written = await client.write_register(0x7C, 5, slave=1)
+        packs = [
+            (await client.readwrite_registers(read_address=0x1300, read_count=2, write_address=0x1234, values=[pack], slave=1)).registers
+            for pack in (2, 1)
+        ]
+        return first.registers, second.registers, error.isError(), written.isError(), packs
+
+    async def record_session():
+        recorder = RecordingClient(ExecutorHass(), inverter, str(path))
+        result = await session(recorder)
+        assert await recorder.async_close() is inverter
+        return result
+
+    recorded = asyncio.run(record_session())
+    assert recorded == ([2301, 65436, 17], [2302, 65435, 18], True, False, [[21, 22], [11, 12]])
+    assert [(r.function, r.status, r.address) for r in read_log(path)] == [
+        (FC_READ_INPUT, STATUS_OK, 0x00),
+        (FC_READ_INPUT, STATUS_OK, 0x00),
+        (FC_READ_HOLDING, STATUS_ERROR, 0x20),
+        (FC_READ_INPUT, STATUS_EXCEPTION, 0x40),
+        (FC_WRITE_SINGLE, STATUS_OK, 0x7C),
+        (FC_READ_WRITE, STATUS_OK, 0x1300),
+        (FC_READ_WRITE, STATUS_OK, 0x1300),
+    ]
+    assert read_log(path)[-1].registers == [0x1234, 1, 1, 11, 12]
+
+    replayed = asyncio.run(session(ReplayClient.from_file(path, speed=0)))
+    assert replayed == recorded
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"something else")
+    with pytest.raises(ValueError):
+        read_log(path)
+
+
+def test_a_failed_write_drops_its_chunk_only(tmp_path, monkeypatch):
+    from custom_components.solax_modbus import modbusrecorder
+
+    path = tmp_path / "traffic.rec"
+    append = modbusrecorder.append_log
+    calls = []
+
+    def failing_append(path, data, create=False):
+        calls.append(create)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        append(path, data, create)
+
+    monkeypatch.setattr(modbusrecorder, "append_log", failing_append)
+    inverter = ReplayClient([record(FC_READ_INPUT, 0x00, 1, [n]) for n in range(3)], speed=0)
+
+    async def session():
+        recorder = RecordingClient(ExecutorHass(), inverter, str(path))
+        for _ in range(3):
+            await recorder.read_input_registers(0x00, 1, slave=1)
+            recorder._flush()
+        await recorder.async_close()  # does not raise
+        return recorder
+
+    recorder = asyncio.run(session())
+    assert recorder.dropped == 1
+    assert calls == [True, True, False, False]  # the log is created by the first chunk written
+    assert [r.registers for r in read_log(path)] == [[1], [2]]
@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("homeassistant")  # powercontrol.py raises HomeAssistantError
+
+from custom_components.solax_modbus.powercontrol import PIController  # noqa: E402
+
+
+def test_proportional_and_integral_part():
+    controller = PIController()
+    assert controller.update(100, 0, kp=0.5, ki=0.1, out_min=-5000, out_max=5000) == 50  # no dt yet
+    assert controller.update(100, 1, kp=0.5, ki=0.1, out_min=-5000, out_max=5000) == pytest.approx(60)
+    assert controller.update(0, 2, kp=0.5, ki=0.1, out_min=-5000, out_max=5000) == pytest.approx(10)
+
+
+def test_starts_at_the_initial_set_point():
+    controller = PIController(initial=800)
+    assert controller.update(0, 0, kp=0.5, ki=0.1, out_min=-5000, out_max=5000) == 800
+
+
+def test_clamped_output_does_not_wind_up():
+    controller = PIController()
+    for now in range(100):
+        output = controller.update(1000, now, kp=0.5, ki=1, out_min=-2000, out_max=2000)
+    assert output == 2000
+    # the error changes sign: the output leaves the clamp at once instead of unwinding 100 s of integral
+    assert controller.update(-1000, 100, kp=0.5, ki=1, out_min=-2000, out_max=2000) == pytest.approx(0)
+
+
+def test_rate_limit():
+    controller = PIController()
+    controller.update(0, 0, kp=1, ki=0, out_min=-5000, out_max=5000, rate=100)
+    assert controller.update(3000, 2, kp=1, ki=0, out_min=-5000, out_max=5000, rate=100) == 200
+    assert controller.update(3000, 3, kp=1, ki=0, out_min=-5000, out_max=5000, rate=100) == 300
+    assert controller.update(300, 4, kp=1, ki=0, out_min=-5000, out_max=5000, rate=100) == 300
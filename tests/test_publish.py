@@ -0,0 +1,69 @@
+from custom_components.solax_modbus.publish import (
+    PUBLISH_LAST,
+    PUBLISH_MAX,
+    PUBLISH_MEAN,
+    PUBLISH_TIME_WEIGHTED,
+    Deadband,
+    PublishWindow,
+)
+
+
+def test_first_value_is_published_right_away():
+    window = PublishWindow(PUBLISH_LAST, 10)
+    assert window.add(100, 0) and window.value == 100
+    assert not window.add(200, 5)
+    assert window.value == 100  # until the window is complete
+    assert window.add(300, 10) and window.value == 300
+
+
+def test_mean_and_max_of_a_window():
+    mean = PublishWindow(PUBLISH_MEAN, 10)
+    maximum = PublishWindow(PUBLISH_MAX, 10)
+    for now, value in ((0, 100), (5, 200), (10, 300)):
+        mean_written = mean.add(value, now)
+        max_written = maximum.add(value, now)
+    assert mean_written and mean.value == 250
+    assert max_written and maximum.value == 300
+
+
+def test_time_weighted_mean_keeps_the_energy():
+    window = PublishWindow(PUBLISH_TIME_WEIGHTED, 10)
+    window.add(0, 0)
+    assert not window.add(1000, 8)  # 0 W for 8 s
+    assert window.add(1000, 10)  # 1000 W for 2 s
+    assert window.value == 200
+
+
+def test_text_is_published_when_it_changes_and_restarts_the_window():
+    window = PublishWindow(PUBLISH_MEAN, 10)
+    window.add(1, 0)
+    assert window.add("Fault", 1) and window.value == "Fault"
+    assert not window.add("Fault", 2)
+    assert window.add(5, 3) and window.value == 5  # a new window starts with the number
+    assert not window.add(7, 4)
+
+
+def test_none_is_published_once():
+    window = PublishWindow(PUBLISH_MEAN, 10)
+    window.add(1, 0)
+    assert window.add(None, 1) and window.value is None
+    assert not window.add(None, 2)
+    assert window.add(3, 3) and window.value == 3
+
+
+def test_deadband_compares_with_the_last_written_value():
+    deadband = Deadband(absolute=10)
+    assert deadband.passes(100, 0)
+    assert not deadband.passes(106, 1)
+    assert not deadband.passes(94, 2)
+    assert deadband.passes(110, 3)  # a slow drift adds up
+    assert deadband.passes("Fault", 4)
+
+
+def test_relative_deadband_and_max_silence():
+    deadband = Deadband(relative=0.1, max_silence=60)
+    assert deadband.passes(1000, 0)
+    assert not deadband.passes(1050, 10)
+    assert deadband.passes(1150, 20)
+    assert not deadband.passes(1150, 30)
+    assert deadband.passes(1150, 80)  # written again after max_silence
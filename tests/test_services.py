@@ -0,0 +1,47 @@
+import importlib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")  # the services are in the package __init__, which needs Home Assistant
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.util.dt as dt_util
+
+hub_module = importlib.import_module("custom_components.solax_modbus.__init__")
+
+
+def fake_hass(config_dir, allowed):
+    return SimpleNamespace(
+        config=SimpleNamespace(
+            config_dir=str(config_dir),
+            path=lambda *parts: str(config_dir.joinpath(*parts)),
+            is_allowed_path=lambda path: path.startswith(str(allowed)),
+        )
+    )
+
+
+def test_service_files_stay_in_allowed_directories(tmp_path):
+    config_dir = tmp_path / "config"
+    allowed = tmp_path / "media"
+    hass = fake_hass(config_dir, allowed)
+    assert hub_module._service_path(hass, "trace.modbus") == str(config_dir / "trace.modbus")
+    assert hub_module._service_path(hass, "sub/trace.modbus") == str(config_dir / "sub" / "trace.modbus")
+    assert hub_module._service_path(hass, str(allowed / "trace.modbus")) == str(allowed / "trace.modbus")
+    for filename in ("../trace.modbus", "sub/../../trace.modbus", "/etc/trace.modbus", str(tmp_path / "trace.modbus")):
+        with pytest.raises(HomeAssistantError):
+            hub_module._service_path(hass, filename)
+
+
+def test_service_times_are_local():
+    default = dt_util.DEFAULT_TIME_ZONE
+    dt_util.set_default_time_zone(dt_util.get_time_zone("Europe/Berlin"))
+    try:
+        noon = datetime(2024, 1, 15, 12, 0)  # as the datetime selector gives it, without time zone
+        assert hub_module._service_timestamp(noon) == datetime(2024, 1, 15, 11, 0, tzinfo=timezone.utc).timestamp()
+        summer = datetime(2024, 7, 15, 12, 0)
+        assert hub_module._service_timestamp(summer) == datetime(2024, 7, 15, 10, 0, tzinfo=timezone.utc).timestamp()
+        aware = datetime(2024, 1, 15, 12, 0, tzinfo=timezone.utc)
+        assert hub_module._service_timestamp(aware) == aware.timestamp()
+    finally:
+        dt_util.set_default_time_zone(default)
@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+from pymodbus.exceptions import ModbusIOException
+
+from custom_components.solax_modbus.tcppool import ConnectionPool
+
+
+class FakeClient:
+    def __init__(self, healthy):
+        self.healthy = healthy
+        self.connected = True
+        self.reads = []
+
+    async def connect(self):
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    async def read_input_registers(self, address, count, **kwargs):
+        self.reads.append((address, count))
+        if not self.healthy:
+            raise ModbusIOException("no response")
+        return SimpleNamespace(registers=[0] * count, isError=lambda: False)
+
+
+def test_health_check_closes_dead_sessions():
+    pool = ConnectionPool(SimpleNamespace(name="test"), 3, None)
+    healthy, dead = pool.sessions
+    healthy.client, dead.client = FakeClient(True), FakeClient(False)
+
+    asyncio.run(pool.async_check_health())
+    assert healthy.client.reads == dead.client.reads == []  # nothing read yet, nothing to check with
+
+    pool._probe = ("read_input_registers", 0x100, {"slave": 1})
+    asyncio.run(pool.async_check_health())
+    assert healthy.client.reads == dead.client.reads == [(0x100, 1)]
+    assert (healthy.checks, healthy.failures) == (1, 0)
+    assert (dead.checks, dead.failures) == (0, 1)
+    assert not dead.client.connected and dead not in pool._available()
+    assert pool.parallel_failures == 0
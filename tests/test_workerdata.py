@@ -0,0 +1,74 @@
+import pickle
+
+from custom_components.solax_modbus.datastore import DataStore
+from custom_components.solax_modbus.workerdata import ChangeDecoder, ChangeEncoder
+
+GROUP = (10, "solax_inverter")
+
+
+def test_worker_read_gives_the_in_process_payload():
+    """readFollowUp and the listeners get the data of an in-process read, unchanged values included."""
+    encoder = ChangeEncoder()  # worker
+    worker_data = DataStore({"_repeatUntil": {}})  # the hub in the worker process
+    hub_data = DataStore({"_repeatUntil": {"remotecontrol_trigger": 0}})  # the hub's own
+    in_process_data = DataStore({"_repeatUntil": {"remotecontrol_trigger": 0}})  # without a worker
+    decoder = ChangeDecoder(hub_data)  # hub
+    reads = [
+        {"measured_power": 120, "run_mode": "Normal Mode", "pv_power_1": None},
+        {"measured_power": 120, "run_mode": "Normal Mode", "pv_power_1": 800, "battery_capacity": 55},
+        {"measured_power": 120, "run_mode": "Normal Mode", "pv_power_1": 800, "battery_capacity": 55},
+        {"measured_power": 130, "pv_power_1": 800, "battery_capacity": 55},  # run_mode not stored
+    ]
+    for values in reads:
+        with in_process_data.buffer() as in_process:
+            in_process["_repeatUntil"] = in_process_data["_repeatUntil"]
+            in_process.update(values)
+            expected = dict(in_process)
+            in_process_data.commit(in_process)
+        with worker_data.buffer() as read:
+            read["_repeatUntil"] = worker_data["_repeatUntil"]
+            read.update(values)
+            message = pickle.loads(pickle.dumps(encoder.encode(GROUP, read)))  # over the pipe
+            worker_data.commit(read)
+        with hub_data.buffer() as buffer:
+            received = decoder.decode(GROUP, *message, buffer)
+            received["_repeatUntil"] = hub_data["_repeatUntil"]
+            assert dict(received) == expected
+            hub_data.commit(received)
+        assert dict(hub_data) == dict(in_process_data)
+
+
+def test_only_changes_go_over_the_pipe():
+    encoder = ChangeEncoder()
+    assert encoder.encode(GROUP, {"a": 1, "b": 2}) == ([(0, "a"), (1, "b")], [(0, 1), (1, 2)], [])
+    assert encoder.encode(GROUP, {"a": 1, "b": 3, "c": 4}) == ([(2, "c")], [(1, 3), (2, 4)], [])
+    assert encoder.encode(GROUP, {"a": 1, "c": 4}) == ([], [], [1])
+    assert encoder.encode((5, "other"), {"a": 1}) == ([], [(0, 1)], [])  # per group
+    encoder.forget(GROUP)
+    assert encoder.encode(GROUP, {"a": 1, "c": 4}) == ([], [(0, 1), (2, 4)], [])
+
+
+def test_the_hub_commits_only_the_changes():
+    encoder = ChangeEncoder()
+    store = DataStore()
+    decoder = ChangeDecoder(store)
+    for values in ({"a": 1, "b": 2}, {"a": 1, "b": 3}):
+        with store.buffer() as buffer:
+            read = decoder.decode(GROUP, *encoder.encode(GROUP, values), buffer)
+            assert dict(read) == values
+            changed = [store._keys[idx] for idx in read.written]
+            store.commit(read)
+    assert changed == ["b"]
+    assert store == {"a": 1, "b": 3}
+
+
+def test_responses_may_arrive_out_of_order():
+    encoder = ChangeEncoder()
+    store = DataStore()
+    decoder = ChangeDecoder(store)
+    first = encoder.encode(GROUP, {"a": 1})
+    second = encoder.encode((5, "other"), {"b": 2})
+    with store.buffer() as buffer:
+        assert dict(decoder.decode((5, "other"), *second, buffer)) == {"b": 2}
+    with store.buffer() as buffer:
+        assert dict(decoder.decode(GROUP, *first, buffer)) == {"a": 1}
@@ -0,0 +1,80 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+from pymodbus.constants import Endian
+from pymodbus.exceptions import ModbusIOException
+
+pytest.importorskip("homeassistant")  # the hub is in the package __init__, which needs Home Assistant
+hub_module = importlib.import_module("custom_components.solax_modbus.__init__")
+
+
+def response(registers=(), error=False):
+    return SimpleNamespace(registers=list(registers), isError=lambda: error)
+
+
+class FakeHub:
+    """What SolaXModbusHub.async_write_read_registers uses of the hub."""
+
+    name = "test"
+    plugin = SimpleNamespace(order16=Endian.BIG, order32=Endian.BIG)
+    async_write_read_registers = hub_module.SolaXModbusHub.async_write_read_registers
+
+    def __init__(self, readwrite):
+        self.fc23Supported = None
+        self.calls = []
+        self._client = SimpleNamespace(readwrite_registers=readwrite)
+        self._lock = asyncio.Lock()
+
+    async def _check_connection(self):
+        pass
+
+    def _invalidate_snapshot(self, address, count):
+        pass
+
+    async def async_write_registers_single(self, unit, address, payload):
+        self.calls.append(("write", address, payload))
+
+    async def async_read_holding_registers(self, unit, address, count):
+        self.calls.append(("read", address, count))
+        return response([7] * count)
+
+
+def test_fc23_timeout_falls_back_to_write_and_read():
+    attempts = []
+
+    async def readwrite(**kwargs):
+        attempts.append(kwargs)
+        raise ModbusIOException("no response")  # a logger dropping the unknown function code
+
+    hub = FakeHub(readwrite)
+
+    async def run():
+        first = await hub.async_write_read_registers(1, 0x1234, 2, 0x1300, 4)
+        second = await hub.async_write_read_registers(1, 0x1234, 3, 0x1300, 4)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.registers == second.registers == [7, 7, 7, 7]
+    assert hub.fc23Supported is False
+    assert len(attempts) == 1  # not tried again
+    assert hub.calls == [("write", 0x1234, 2), ("read", 0x1300, 4), ("write", 0x1234, 3), ("read", 0x1300, 4)]
+
+
+def test_fc23_exception_response_falls_back():
+    async def readwrite(**kwargs):
+        return response(error=True)  # e.g. SlaveFailure instead of IllegalFunction
+
+    hub = FakeHub(readwrite)
+    assert asyncio.run(hub.async_write_read_registers(1, 0x1234, 2, 0x1300, 1)).registers == [7]
+    assert hub.fc23Supported is False and hub.calls[0] == ("write", 0x1234, 2)
+
+
+def test_fc23_supported():
+    async def readwrite(**kwargs):
+        return response([5] * kwargs["read_count"])
+
+    hub = FakeHub(readwrite)
+    assert asyncio.run(hub.async_write_read_registers(1, 0x1234, 2, 0x1300, 2)).registers == [5, 5]
+    assert hub.fc23Supported is True and hub.calls == []
@@ -0,0 +1,203 @@
+"""Benchmark of block planning and decoding for every plugin and invertertype.
+
+For each invertertype the type detection of a plugin can return, the register map is built as
+sensor.entityToList does and split in blocks with sensor.splitInBlocks. A real SolaXModbusHub then
+reads synthetic responses (generated as by the simulator) through a ReplayClient without delay, so
+every cycle runs async_read_modbus_registers_all: async_read_modbus_block, treat_address and the
+computed sensors.
+
+    python tools/benchmark.py --save tools/benchmark_baseline.json
+    python tools/benchmark.py --compare tools/benchmark_baseline.json --tolerance 0.25
+
+--compare exits with status 1 when the time per entity of any case got worse than the tolerance,
+or when blocks per cycle changed. Timings depend on the machine: compare against a baseline made
+on the same machine.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import tracemalloc
+from time import perf_counter
+from types import SimpleNamespace
+
+import pluginmap  # also sets up the import path of the integration
+
+from homeassistant.const import CONF_HOST, CONF_NAME
+
+from custom_components.solax_modbus import SolaXModbusHub
+from custom_components.solax_modbus.const import REG_HOLDING, REG_INPUT
+from custom_components.solax_modbus.modbusrecorder import (
+    FC_READ_HOLDING,
+    FC_READ_INPUT,
+    STATUS_OK,
+    ReplayClient,
+)
+from custom_components.solax_modbus.sensor import splitInBlocks
+from simulator import build_signals, encode
+
+TABLES = ((REG_HOLDING, "h", FC_READ_HOLDING), (REG_INPUT, "i", FC_READ_INPUT))
+
+
+def register_image(plugin, invertertype, serialnumber):
+    """Synthetic content of the holding and input registers, as served by the simulator."""
+    image = {"h": [0] * 0x10000, "i": [0] * 0x10000}
+    for table, register, descr, signal in build_signals(plugin, invertertype, serialnumber):
+        if isinstance(descr, dict):
+            image[table][register] = 0x0101
+        else:
+            registers = encode(descr, signal.update(0), plugin.order16, plugin.order32, serialnumber)
+            image[table][register : register + len(registers)] = registers
+    return image
+
+
+def plan(plugin, invertertype, serialnumber):
+    regs = pluginmap.register_map(plugin, invertertype, serialnumber)
+    start = perf_counter()
+    blocks = {
+        register_type: splitInBlocks(dict(sorted(regs[register_type].items())), plugin.block_size, plugin.auto_block_ignore_readerror)
+        for register_type, _, _ in TABLES
+    }
+    return regs, blocks, perf_counter() - start
+
+
+def bench_hub(module, invertertype, serialnumber, blocks, image, computed):
+    """A SolaXModbusHub reading the synthetic image through a ReplayClient, and its device group."""
+    entry = SimpleNamespace(options={CONF_NAME: "benchmark", CONF_HOST: "127.0.0.1"})
+    hub = SolaXModbusHub(None, module, entry)
+    records = []
+    for register_type, table, function in TABLES:
+        for block in blocks[register_type]:
+            records.append(
+                SimpleNamespace(
+                    offset=0.0, latency=0.0, function=function, status=STATUS_OK, unit=hub._modbus_addr,
+                    address=block.start, count=block.end - block.start, registers=image[table][block.start : block.end],
+                )
+            )
+    hub._client = ReplayClient(records, speed=0)
+    hub._invertertype = invertertype
+    hub.seriesnumber = serialnumber
+    hub.cyclecount = 10  # past the verbose first cycles
+    hub.localsLoaded = True
+    hub.computedSensors = {descr.key: descr for descr in computed}
+    group = hub.empty_device_group()
+    group.holdingBlocks = blocks[REG_HOLDING]
+    group.inputBlocks = blocks[REG_INPUT]
+    return hub, group
+
+
+async def run_cycles(hub, group, cycles, alloc_cycles):
+    await hub._client.connect()
+    durations = []
+    for _ in range(cycles):
+        start = perf_counter()
+        await hub.async_read_modbus_registers_all(group)
+        durations.append(perf_counter() - start)
+    return durations, await measure_allocations(hub, group, alloc_cycles)
+
+
+async def measure_allocations(hub, group, cycles):
+    """Peak traced memory and net allocated blocks per cycle."""
+    tracemalloc.start()
+    try:
+        peaks, blocks = [], []
+        for _ in range(cycles):
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            await hub.async_read_modbus_registers_all(group)
+            after = tracemalloc.take_snapshot()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            blocks.append(sum(stat.count_diff for stat in after.compare_to(before, "filename")))
+        return statistics.median(peaks), statistics.median(blocks)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_case(module, invertertype, args):
+    plugin = module.plugin_instance
+    regs, blocks, plan_time = plan(plugin, invertertype, args.serial)
+    computed = pluginmap.computed_descriptions(plugin, invertertype, args.serial)
+    image = register_image(plugin, invertertype, args.serial)
+
+    async def measure():  # the hub creates its pymodbus client, which needs a running event loop
+        hub, group = bench_hub(module, invertertype, args.serial, blocks, image, computed)
+        return await run_cycles(hub, group, args.cycles, args.alloc_cycles)
+
+    durations, (peak, net_blocks) = asyncio.run(measure())
+    cycle = statistics.median(durations)
+    registers = sum(block.end - block.start for register_type in blocks for block in blocks[register_type])
+    entities = sum(len(descr) if isinstance(descr, dict) else 1 for table in regs.values() for descr in table.values())
+    entities += len(computed)
+    return {
+        "entities": entities,
+        "computed": len(computed),
+        "blocks_per_cycle": sum(len(b) for b in blocks.values()),
+        "registers_per_cycle": registers,
+        "plan_ms": round(plan_time * 1000, 3),
+        "cycle_ms": round(cycle * 1000, 3),
+        "us_per_entity": round(cycle * 1e6 / max(entities, 1), 3),
+        "registers_per_s": round(registers / cycle) if cycle else 0,
+        "alloc_peak_kib": round(peak / 1024, 1),
+        "alloc_net_blocks": net_blocks,
+    }
+
+
+def run(args):
+    results = {}
+    for name in args.plugins or pluginmap.plugin_names():
+        module = pluginmap.load_plugin(name)
+        masks = pluginmap.invertertypes(module) or [0]
+        for invertertype in masks:
+            case = f"{name} 0x{invertertype:x}"
+            try:
+                results[case] = bench_case(module, invertertype, args)
+            except Exception as ex:  # a broken case should not hide the others
+                results[case] = {"error": repr(ex)}
+            print(f"{case:40} {results[case]}", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for case, base in baseline["results"].items():
+        current = results.get(case)
+        if current is None or "error" in current or "error" in base:
+            continue
+        if current["us_per_entity"] > base["us_per_entity"] * (1 + tolerance):
+            regressions.append(f"{case}: {base['us_per_entity']} -> {current['us_per_entity']} us/entity")
+        if current["blocks_per_cycle"] != base["blocks_per_cycle"]:
+            regressions.append(f"{case}: {base['blocks_per_cycle']} -> {current['blocks_per_cycle']} blocks/cycle")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plugins", nargs="*", help="plugin names, default all")
+    parser.add_argument("--serial", default="unknown", help="serial number for blacklists and string registers")
+    parser.add_argument("--cycles", type=int, default=200, help="timed cycles per case")
+    parser.add_argument("--alloc-cycles", type=int, default=5, help="cycles per case traced for allocations")
+    parser.add_argument("--save", help="write the results as json baseline")
+    parser.add_argument("--compare", help="json baseline to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    results = run(args)
+    if args.save:
+        with open(args.save, "w") as fp:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, fp, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as fp:
+            regressions = compare(results, json.load(fp), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Shared helpers for the development tools: load plugins and build their register maps.
+
+The tools import the integration itself, so they need the same environment as the integration
+(Home Assistant and pymodbus installed). Run them from the repository root, e.g.
+    python tools/simulator.py --plugin solax --invertertype 0x1208
+"""
+
+import ast
+import glob
+import importlib
+import inspect
+import os
+import sys
+from copy import copy
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+PACKAGE = "custom_components.solax_modbus"
+
+
+def plugin_names():
+    """Names of all plugins, as used in the plugin option (plugin_<name>.py)."""
+    pattern = str(REPO_ROOT / "custom_components" / "solax_modbus" / "plugin_*.py")
+    return sorted(os.path.basename(path)[len("plugin_"):-3] for path in glob.glob(pattern))
+
+
+def load_plugin(name):
+    """Import plugin_<name> and return the module; its plugin_instance holds the declarations."""
+    return importlib.import_module(f"{PACKAGE}.plugin_{name}")
+
+
+def invertertypes(module):
+    """Invertertype bitmasks assigned by the type detection of a plugin, taken from its source."""
+    masks = set()
+    for node in ast.walk(ast.parse(inspect.getsource(module))):
+        if not isinstance(node, ast.Assign):
+            continue
+        if not any(isinstance(target, ast.Name) and target.id == "invertertype" for target in node.targets):
+            continue
+        try:  # constant expressions of the plugin bitmasks only, e.g. HYBRID | GEN4 | X3
+            value = eval(compile(ast.Expression(node.value), module.__file__, "eval"), vars(module))
+        except Exception:
+            continue
+        if isinstance(value, int) and value:
+            masks.add(value)
+    return sorted(masks)
+
+
+def parse_mask(text):
+    """Invertertype bitmask from the command line, decimal or 0x hex."""
+    return int(text, 0)
+
+
+def expand(plugin, descriptions, invertertype, serialnumber):
+    """The descriptions that apply to invertertype, with value series expanded, as sensor.entityToList does."""
+    result = []
+    for descr in descriptions:
+        if not plugin.matchInverterWithMask(invertertype, descr.allowedtypes, serialnumber, descr.blacklist):
+            continue
+        if getattr(descr, "value_series", None) is not None:
+            for serie_value in range(descr.value_series):
+                newdescr = copy(descr)
+                newdescr.key = descr.key.replace("{}", str(serie_value + 1))
+                newdescr.register = descr.register + serie_value
+                result.append(newdescr)
+        else:
+            result.append(copy(descr))
+    return result
+
+
+def register_map(plugin, invertertype, serialnumber="unknown"):
+    """Sensor descriptions with a modbus register, by register type: {REG_HOLDING: {reg: descr}, REG_INPUT: {...}}.
+
+    Two U8 values in one register are returned as a dict {unit: descr}, as sensor.registerDescription does.
+    """
+    from custom_components.solax_modbus.const import REG_HOLDING, REG_INPUT
+
+    regs = {REG_HOLDING: {}, REG_INPUT: {}}
+    for descr in expand(plugin, plugin.SENSOR_TYPES, invertertype, serialnumber):
+        if descr.register is None or descr.register < 0 or descr.register_type not in regs:
+            continue
+        table = regs[descr.register_type]
+        first = table.get(descr.register)
+        if first is None:
+            table[descr.register] = descr
+        elif not isinstance(first, dict):
+            table[descr.register] = {first.unit: first, descr.unit: descr}
+    return regs
+
+
+def computed_descriptions(plugin, invertertype, serialnumber="unknown"):
+    """Sensor descriptions without a register, evaluated by value_function after every cycle."""
+    return [
+        descr
+        for descr in expand(plugin, plugin.SENSOR_TYPES, invertertype, serialnumber)
+        if (descr.register is None or descr.register < 0) and descr.value_function
+    ]
@@ -0,0 +1,260 @@
+"""Modbus inverter simulator for load testing the integration without hardware.
+
+The register space of every simulated inverter is built from the sensor declarations of a plugin
+for one invertertype; values change plausibly while the simulator runs. Latency, jitter and
+faults can be injected. Example, 20 inverters on ports 5020..5039 with unit id 1:
+
+    python tools/simulator.py --plugin solax --invertertype 0x1208 --serial H34A10XXXXXXXX \\
+        --instances 20 --port 5020 --latency 0.03 --jitter 0.02 --exceptions 0.01
+
+Add each one as a hub (tcp, host of this machine, port 5020 + n). Enable the polling statistics
+sensors or download the diagnostics of a hub to see its cycle latency; use the dump_trace service
+for a timeline of the cycles.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import time
+
+import pluginmap  # also sets up the import path of the integration
+
+from pymodbus.datastore import (
+    ModbusSequentialDataBlock,
+    ModbusServerContext,
+    ModbusSlaveContext,
+)
+from pymodbus.payload import BinaryPayloadBuilder
+from pymodbus.server import StartAsyncTcpServer
+from pymodbus.transaction import ModbusRtuFramer, ModbusSocketFramer
+
+from custom_components.solax_modbus.const import (
+    REG_HOLDING,
+    REG_INPUT,
+    REGISTER_S16,
+    REGISTER_S32,
+    REGISTER_STR,
+    REGISTER_U8H,
+    REGISTER_U8L,
+    REGISTER_U16,
+    REGISTER_U32,
+    REGISTER_ULSB16MSB16,
+    REGISTER_WORDS,
+)
+
+_LOGGER = logging.getLogger("simulator")
+
+FC_TABLE = {REG_HOLDING: "h", REG_INPUT: "i"}  # pymodbus datastore tables
+UPDATE_INTERVAL = 1.0  # seconds between value updates
+
+
+class Signal:
+    """Plausible, slowly changing raw value of one register, derived from the unit of measurement."""
+
+    def __init__(self, descr):
+        self.descr = descr
+        unit = str(getattr(descr, "native_unit_of_measurement", "") or "")
+        scale = descr.scale if isinstance(descr.scale, (int, float)) and descr.scale else 1
+        self.counter = False
+        if isinstance(descr.scale, dict):  # enumeration, pick one of the known raw values
+            self.low = self.high = next(iter(descr.scale), 0)
+        elif unit in ("kWh", "Wh", "MWh"):
+            self.low, self.high, self.counter = 1000 / scale, 1000 / scale, True
+        elif unit in ("W", "VA", "var"):
+            self.low, self.high = 0, 5000 / scale
+        elif unit == "kW":
+            self.low, self.high = 0, 5 / scale
+        elif unit == "V":
+            self.low, self.high = 200 / scale, 250 / scale
+        elif unit == "A":
+            self.low, self.high = 0, 20 / scale
+        elif unit == "%":
+            self.low, self.high = 10 / scale, 100 / scale
+        elif unit in ("°C", "C"):
+            self.low, self.high = 20 / scale, 45 / scale
+        elif unit == "Hz":
+            self.low, self.high = 49.9 / scale, 50.1 / scale
+        else:
+            self.low, self.high = 0, 100
+        if descr.unit in (REGISTER_U16, REGISTER_U8H, REGISTER_U8L, REGISTER_S16):
+            limit = 255 if descr.unit in (REGISTER_U8H, REGISTER_U8L) else 32767
+            self.low, self.high = min(self.low, limit), min(self.high, limit)
+        self.value = self.low
+        self.phase = random.random() * 2 * math.pi
+
+    def update(self, now):
+        if self.counter:  # energy counters only increase
+            self.value += random.random() * (self.high / 1000)
+        else:  # slow sine over a few minutes plus noise
+            mid = (self.low + self.high) / 2
+            amplitude = (self.high - self.low) / 2
+            self.value = mid + amplitude * math.sin(now / 300 + self.phase) * (0.9 + 0.1 * random.random())
+        return int(self.value)
+
+
+def encode(descr, value, order16, order32, serialnumber):
+    """Registers holding value as the hub decodes descr (see SolaXModbusHub.treat_address)."""
+    builder = BinaryPayloadBuilder(byteorder=order16, wordorder=order32)
+    if descr.unit == REGISTER_S16:
+        builder.add_16bit_int(value)
+    elif descr.unit in (REGISTER_U32,):
+        builder.add_32bit_uint(value)
+    elif descr.unit == REGISTER_S32:
+        builder.add_32bit_int(value)
+    elif descr.unit == REGISTER_ULSB16MSB16:
+        builder.add_16bit_uint(value & 0xFFFF)
+        builder.add_16bit_uint(value >> 16)
+    elif descr.unit == REGISTER_STR:
+        builder.add_string(serialnumber[: descr.wordcount * 2].ljust(descr.wordcount * 2))
+    elif descr.unit == REGISTER_WORDS:
+        for _ in range(descr.wordcount):
+            builder.add_16bit_uint(value & 0xFFFF)
+    else:
+        builder.add_16bit_uint(value & 0xFFFF)
+    return builder.to_registers()
+
+
+class FaultInjector:
+    """Latency, jitter and faults shared by the units of one simulated inverter."""
+
+    def __init__(self, args):
+        self.latency = args.latency
+        self.jitter = args.jitter
+        self.exceptions = args.exceptions
+        self.timeouts = args.timeouts
+        self.timeout_delay = args.timeout_delay
+        self.holes = [tuple(int(x, 0) for x in hole.split("-")) for hole in args.holes]
+        self.sleep_every = args.sleep_every
+        self.sleep_for = args.sleep_for
+        self.requests = 0
+
+    def asleep(self):
+        return self.sleep_every > 0 and time.time() % self.sleep_every < self.sleep_for
+
+    def illegal(self, address, count):
+        if self.exceptions and random.random() < self.exceptions:
+            return True
+        return any(address <= end and address + count > start for start, end in self.holes)
+
+    async def delay(self):
+        self.requests += 1
+        if self.asleep() or (self.timeouts and random.random() < self.timeouts):
+            await asyncio.sleep(self.timeout_delay)  # longer than the client timeout
+        elif self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+
+class SimulatedUnit(ModbusSlaveContext):
+    """Register space of one unit id, answering after the injected latency."""
+
+    def __init__(self, faults):
+        super().__init__(
+            hr=ModbusSequentialDataBlock(0, [0] * 0x10000),
+            ir=ModbusSequentialDataBlock(0, [0] * 0x10000),
+            zero_mode=True,
+        )
+        self.faults = faults
+
+    def validate(self, fc_as_hex, address, count=1):
+        if self.faults.illegal(address, count):
+            return False  # answered with an illegal data address exception
+        return super().validate(fc_as_hex, address, count)
+
+    async def async_getValues(self, fc_as_hex, address, count=1):
+        await self.faults.delay()
+        return self.getValues(fc_as_hex, address, count)
+
+
+def build_signals(plugin, invertertype, serialnumber):
+    """[(table, register, descr or {unit: descr}, signal(s))] for every declared register."""
+    signals = []
+    for register_type, regs in pluginmap.register_map(plugin, invertertype, serialnumber).items():
+        for register, descr in regs.items():
+            if isinstance(descr, dict):  # two bytes in one register
+                signals.append((FC_TABLE[register_type], register, descr, {unit: Signal(d) for unit, d in descr.items()}))
+            else:
+                signals.append((FC_TABLE[register_type], register, descr, Signal(descr)))
+    return signals
+
+
+def write_values(unit_ctx, plugin, signals, serialnumber, now):
+    for table, register, descr, signal in signals:
+        if isinstance(descr, dict):
+            high = signal[REGISTER_U8H].update(now) if REGISTER_U8H in signal else 0
+            low = signal[REGISTER_U8L].update(now) if REGISTER_U8L in signal else 0
+            registers = [((high & 0xFF) << 8) | (low & 0xFF)]
+        else:
+            registers = encode(descr, signal.update(now), plugin.order16, plugin.order32, serialnumber)
+        unit_ctx.store[table].setValues(register, registers)
+
+
+async def run_instance(args, plugin, port):
+    faults = FaultInjector(args)
+    units = {unit: SimulatedUnit(faults) for unit in args.units}
+    signals = build_signals(plugin, args.invertertype, args.serial)
+    context = ModbusServerContext(slaves=units, single=False)
+    for unit_ctx in units.values():
+        unit_ctx.store["h"].setValues(args.serial_register, encode_serial(args.serial))
+        write_values(unit_ctx, plugin, signals, args.serial, time.time())
+
+    async def update():
+        while True:
+            await asyncio.sleep(UPDATE_INTERVAL)
+            now = time.time()
+            for unit_ctx in units.values():
+                write_values(unit_ctx, plugin, signals, args.serial, now)
+
+    updater = asyncio.create_task(update())
+    _LOGGER.info(f"port {port}: {len(signals)} registers, units {args.units}")
+    try:
+        await StartAsyncTcpServer(
+            context,
+            address=(args.host, port),
+            framer=ModbusRtuFramer if args.rtu_over_tcp else ModbusSocketFramer,
+        )
+    finally:
+        updater.cancel()
+
+
+def encode_serial(serialnumber):
+    """Serial number as ascii in 7 holding registers, as most plugins read it for type detection."""
+    builder = BinaryPayloadBuilder()
+    builder.add_string(serialnumber[:14].ljust(14))
+    return builder.to_registers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plugin", default="solax", choices=pluginmap.plugin_names())
+    parser.add_argument("--invertertype", type=pluginmap.parse_mask, required=True, help="bitmask as in the plugin, e.g. 0x1208")
+    parser.add_argument("--serial", default="H34A10SIMULATE", help="serial number used by the type detection")
+    parser.add_argument("--serial-register", type=lambda x: int(x, 0), default=0x0, help="holding register of the serial number")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--instances", type=int, default=1, help="number of inverters, on consecutive ports")
+    parser.add_argument("--units", type=int, nargs="+", default=[1], help="unit ids served by every inverter")
+    parser.add_argument("--rtu-over-tcp", action="store_true", help="rtu framing over tcp")
+    parser.add_argument("--latency", type=float, default=0.0, help="response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform latency jitter in seconds")
+    parser.add_argument("--exceptions", type=float, default=0.0, help="probability of an illegal address exception")
+    parser.add_argument("--timeouts", type=float, default=0.0, help="probability of a request timing out")
+    parser.add_argument("--timeout-delay", type=float, default=10.0, help="delay of a timed out response")
+    parser.add_argument("--holes", nargs="*", default=[], help="address ranges answered with exceptions, e.g. 0x100-0x10f")
+    parser.add_argument("--sleep-every", type=float, default=0.0, help="period of the sleep mode in seconds")
+    parser.add_argument("--sleep-for", type=float, default=0.0, help="time per period the inverter does not respond")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    plugin = pluginmap.load_plugin(args.plugin).plugin_instance
+
+    async def run():
+        await asyncio.gather(*(run_instance(args, plugin, args.port + n) for n in range(args.instances)))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Startup time and memory of the integration, per plugin and invertertype.
+
+Measures
+  - the import time of the package and of every plugin module, each in a fresh interpreter
+  - time and traced allocations of the sensor, number, select and button async_setup_entry
+  - the time to first data: setup plus the first read of all device groups, without network
+    (synthetic responses through the replay client, as in benchmark.py)
+  - the steady state memory of a hub after the first data, split in entity description copies,
+    hub.data, entity objects and the total traced by tracemalloc
+
+    python tools/startup.py --plugins solax sofar --hubs 3 --save startup.json
+
+The setup functions only need hass.data here, so entities are created but not added to
+Home Assistant; their registration cost is not included.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+import traceback
+import tracemalloc
+from time import perf_counter
+from types import SimpleNamespace
+
+import pluginmap  # also sets up the import path of the integration
+
+from homeassistant.const import CONF_HOST, CONF_NAME, CONF_PORT, CONF_SCAN_INTERVAL
+from homeassistant.helpers.device_registry import DATA_REGISTRY
+
+from custom_components.solax_modbus import SolaXModbusHub
+from custom_components.solax_modbus import button, number, select, sensor
+from custom_components.solax_modbus.const import (
+    CONF_INTERFACE,
+    CONF_MODBUS_ADDR,
+    CONF_READ_BATTERY,
+    CONF_READ_DCB,
+    CONF_READ_EPS,
+    CONF_READ_PM,
+    CONF_SCAN_INTERVAL_FAST,
+    CONF_SCAN_INTERVAL_MEDIUM,
+    CONF_TCP_TYPE,
+    DEFAULT_INTERFACE,
+    DEFAULT_MODBUS_ADDR,
+    DEFAULT_PORT,
+    DEFAULT_READ_BATTERY,
+    DEFAULT_READ_DCB,
+    DEFAULT_READ_EPS,
+    DEFAULT_READ_PM,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_TCP_TYPE,
+    DOMAIN,
+    INVERTER_IDENT,
+)
+from custom_components.solax_modbus.modbusrecorder import STATUS_OK, ReplayClient
+from benchmark import TABLES, register_image
+
+PLATFORMS = (("sensor", sensor), ("number", number), ("select", select), ("button", button))
+
+# options of a new TCP hub as the config flow stores them with its defaults
+OPTIONS = {
+    CONF_INTERFACE: DEFAULT_INTERFACE,
+    CONF_HOST: "127.0.0.1",
+    CONF_PORT: DEFAULT_PORT,
+    CONF_TCP_TYPE: DEFAULT_TCP_TYPE,
+    CONF_MODBUS_ADDR: DEFAULT_MODBUS_ADDR,
+    CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL,
+    CONF_SCAN_INTERVAL_MEDIUM: DEFAULT_SCAN_INTERVAL,
+    CONF_SCAN_INTERVAL_FAST: DEFAULT_SCAN_INTERVAL,
+    CONF_READ_EPS: DEFAULT_READ_EPS,
+    CONF_READ_DCB: DEFAULT_READ_DCB,
+    CONF_READ_PM: DEFAULT_READ_PM,
+    CONF_READ_BATTERY: DEFAULT_READ_BATTERY,
+}
+
+IMPORT_PROBE = """
+import importlib, json, sys
+from time import perf_counter
+sys.path.insert(0, {root!r})
+start = perf_counter()
+importlib.import_module("custom_components.solax_modbus")
+package = perf_counter()
+importlib.import_module("custom_components.solax_modbus.plugin_{name}")
+print(json.dumps({{"package_ms": (package - start) * 1000, "plugin_ms": (perf_counter() - package) * 1000}}))
+"""
+
+
+def import_times(name):
+    """Import time of the package and of one plugin, in a fresh interpreter."""
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE.format(root=str(pluginmap.REPO_ROOT), name=name)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return {key: round(value, 1) for key, value in json.loads(out.splitlines()[-1]).items()}
+
+
+def deep_size(obj, seen):
+    """Size of obj and everything it references that is not in seen (ids); adds what it counts to seen."""
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, type(sys), type(deep_size))):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        if hasattr(item, "__dict__"):
+            stack.append(vars(item))
+        for slot in getattr(type(item), "__slots__", ()):
+            if hasattr(item, slot):
+                stack.append(getattr(item, slot))
+    return size
+
+
+def shared_ids(module):
+    """Ids of everything reachable from the plugin module: shared by all hubs, not counted per hub."""
+    seen = set()
+    deep_size(vars(module), seen)
+    return seen
+
+
+def new_hub(module, hub_name, invertertype, serialnumber):
+    entry = SimpleNamespace(options={**OPTIONS, CONF_NAME: hub_name}, data={})
+    hub = SolaXModbusHub(None, module, entry)
+    hub._invertertype = invertertype
+    hub.seriesnumber = serialnumber
+    hub.localsLoaded = True
+    hub.device_info = {"identifiers": {(DOMAIN, hub_name, INVERTER_IDENT)}, "name": hub_name}
+    return hub, entry
+
+
+async def first_data(hub, plugin, invertertype, serialnumber):
+    """Read every planned device group once from a synthetic register image."""
+    image = register_image(plugin, invertertype, serialnumber)
+    records = []
+    groups = [group for interval_group in hub.groups.values() for group in interval_group.device_groups.values()]
+    for group in groups:
+        for register_type, table, function in TABLES:
+            blocks = group.holdingBlocks if table == "h" else group.inputBlocks
+            for block in blocks:
+                records.append(
+                    SimpleNamespace(
+                        offset=0.0, latency=0.0, function=function, status=STATUS_OK, unit=hub._modbus_addr,
+                        address=block.start, count=block.end - block.start, registers=image[table][block.start : block.end],
+                    )
+                )
+    hub._client = ReplayClient(records, speed=0)
+    await hub._client.connect()
+    for group in groups:
+        await hub.async_read_modbus_registers_all(group)
+
+
+async def setup_hub(module, hub_name, invertertype, serialnumber, result):
+    hub, entry = new_hub(module, hub_name, invertertype, serialnumber)
+    # no devices are registered, so the device info updates of readFollowUp find nothing to update
+    registry = SimpleNamespace(async_get_device=lambda **kwargs: None)
+    hass = SimpleNamespace(data={DOMAIN: {hub_name: {"hub": hub}}, DATA_REGISTRY: registry})
+    entities = {}
+    for platform, platform_module in PLATFORMS:
+        added = entities.setdefault(platform, [])
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        start = perf_counter()
+        await platform_module.async_setup_entry(hass, entry, added.extend)
+        result.setdefault(f"{platform}_setup_ms", []).append((perf_counter() - start) * 1000)
+        result.setdefault(f"{platform}_setup_kib", []).append((tracemalloc.get_traced_memory()[0] - before) / 1024)
+        result.setdefault(f"{platform}_entities", []).append(len(added))
+    await first_data(hub, module.plugin_instance, invertertype, serialnumber)
+    return hub, entities
+
+
+def measure(module, invertertype, args):
+    shared = shared_ids(module)
+    result = {}
+    hubs = []
+    tracemalloc.start()
+    try:
+        for n in range(args.hubs):
+            start_traced = tracemalloc.get_traced_memory()[0]
+            start = perf_counter()
+            hub, entities = asyncio.run(setup_hub(module, f"bench{n}", invertertype, args.serial, result))
+            result.setdefault("first_data_ms", []).append((perf_counter() - start) * 1000)
+            result.setdefault("hub_traced_kib", []).append((tracemalloc.get_traced_memory()[0] - start_traced) / 1024)
+            hubs.append((hub, entities))
+    finally:
+        tracemalloc.stop()
+    for hub, entities in hubs:
+        seen = set(shared)
+        seen.add(id(hub.plugin))
+        descriptions = [entity.entity_description for platform in entities.values() for entity in platform if hasattr(entity, "entity_description")]
+        descriptions += list(hub.computedSensors.values())
+        result.setdefault("descriptions_kib", []).append(deep_size(descriptions, seen) / 1024)
+        result.setdefault("data_kib", []).append(deep_size(hub.data, seen) / 1024)
+        seen.add(id(hub))
+        result.setdefault("entities_kib", []).append(deep_size(entities, seen) / 1024)
+    # first hub pays for lazy imports and caches; report it and the mean of the others
+    summary = {}
+    for key, values in result.items():
+        summary[key] = round(values[0], 1)
+        if len(values) > 1:
+            summary[f"{key}_next_hubs"] = round(sum(values[1:]) / (len(values) - 1), 1)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plugins", nargs="*", help="plugin names, default all")
+    parser.add_argument("--invertertype", type=pluginmap.parse_mask, help="only this invertertype, default all the plugin detects")
+    parser.add_argument("--serial", default="unknown")
+    parser.add_argument("--hubs", type=int, default=1, help="hubs set up per case, to see the cost of additional hubs")
+    parser.add_argument("--save", help="write the results as json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    results = {}
+    failed = 0
+    for name in args.plugins or pluginmap.plugin_names():
+        results[name] = {"import": import_times(name), "invertertypes": {}}
+        print(f"{name:30} import {results[name]['import']}", flush=True)
+        module = pluginmap.load_plugin(name)
+        masks = [args.invertertype] if args.invertertype is not None else (pluginmap.invertertypes(module) or [0])
+        for invertertype in masks:
+            try:
+                case = measure(module, invertertype, args)
+            except Exception as ex:  # a broken case should not hide the others, but fails the run
+                traceback.print_exc()
+                case = {"error": repr(ex)}
+                failed += 1
+            results[name]["invertertypes"][f"0x{invertertype:x}"] = case
+            print(f"{name:20} 0x{invertertype:<8x} {case}", flush=True)
+    if args.save:
+        with open(args.save, "w") as fp:
+            json.dump(results, fp, indent=1, sort_keys=True)
+    if failed:
+        print(f"{failed} cases failed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
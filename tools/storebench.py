@@ -0,0 +1,123 @@
+"""Micro benchmark of storing a group read in hub.data, without modbus and decoding.
+
+Every read writes the values of a group, a part of which changed since the previous read, and stores
+them in hub.data:
+
+    dict      a dict per read and dict.update into a plain dict: hub.data before datastore.py
+    changes   the same, and the keys that changed, which the stamps of the store give for free
+    update    a dict per read and DataStore.update, one __setitem__ call per key
+    buffer    the slots of a ReadBuffer and DataStore.commit: the decode of the hub now
+
+Besides the time, the allocations of a read (tracemalloc) are counted: the buffer is reused.
+
+    python tools/storebench.py --values 300 --changed 0.1
+
+Only datastore.py is loaded, so this runs without Home Assistant and pymodbus.
+"""
+
+import argparse
+import importlib.util
+import random
+import timeit
+import tracemalloc
+from pathlib import Path
+
+DATASTORE = Path(__file__).resolve().parents[1] / "custom_components" / "solax_modbus" / "datastore.py"
+
+
+def load_datastore():
+    spec = importlib.util.spec_from_file_location("datastore", DATASTORE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reads(count, changed, cycles):
+    """Values of count keys for cycles reads; about changed of the numbers change from read to read."""
+    rnd = random.Random(1)
+    current = [rnd.choice((0, 1, 230.5, 49.98, "Normal Mode", None)) for _ in range(count)]
+    result = []
+    for _ in range(cycles):
+        current = [
+            value + 1 if isinstance(value, (int, float)) and rnd.random() < changed else value for value in current
+        ]
+        result.append(current)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--values", type=int, default=300, help="values per group read")
+    parser.add_argument("--changed", type=float, default=0.1, help="part of the numbers changing per read")
+    parser.add_argument("--cycles", type=int, default=50, help="reads per timed run")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs, the fastest counts")
+    args = parser.parse_args()
+
+    datastore = load_datastore()
+    MISSING = datastore.MISSING
+    keys = [f"sensor_key_{idx}" for idx in range(args.values)]
+    cycles = reads(args.values, args.changed, args.cycles)
+
+    plain = {"_repeatUntil": {}}
+
+    def run_dict():
+        for values in cycles:
+            data = {"_repeatUntil": plain["_repeatUntil"]}
+            for key, value in zip(keys, values):
+                data[key] = value
+            plain.update(data)
+
+    tracked = {"_repeatUntil": {}}
+
+    def run_changes():
+        for values in cycles:
+            data = {"_repeatUntil": tracked["_repeatUntil"]}
+            for key, value in zip(keys, values):
+                data[key] = value
+            changed = [key for key, value in data.items() if tracked.get(key, MISSING) != value]
+            tracked.update(data)
+
+    store = datastore.DataStore({"_repeatUntil": {}})
+
+    def run_update():
+        for values in cycles:
+            data = {"_repeatUntil": store["_repeatUntil"]}
+            for key, value in zip(keys, values):
+                data[key] = value
+            store.update(data)
+
+    slotted = datastore.DataStore({"_repeatUntil": {}})
+    slots = [slotted.slot(key) for key in keys]  # the block plan knows them
+
+    def run_buffer():
+        for values in cycles:
+            with slotted.buffer() as data:
+                data["_repeatUntil"] = slotted["_repeatUntil"]
+                buffered = data.values
+                written = data.written
+                for slot, value in zip(slots, values):  # as async_read_modbus_block
+                    if value is not MISSING:
+                        if buffered[slot] is MISSING:
+                            written.append(slot)
+                        buffered[slot] = value
+                slotted.commit(data)
+
+    results = {}
+    for name, run in (("dict", run_dict), ("changes", run_changes), ("update", run_update), ("buffer", run_buffer)):
+        run()  # warm up, and the first read of the stores
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = best / args.cycles, peak
+    assert dict(slotted) == dict(store) == plain == tracked
+    for name, (seconds, peak) in results.items():
+        print(
+            f"{name:8} {seconds * 1e6:8.1f} us per read   {seconds / results['dict'][0]:5.2f} x dict"
+            f"   peak allocation {peak / 1024:6.1f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()